@@ -1,15 +1,28 @@
 import os
+import time
+import asyncio
 import logging
 import aiohttp
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Set, Tuple
+from balance_cache import BalanceCache
+from coalescer import BalanceCoalescer
+from log_sampling import HotLogger
+from rate_limiter import RateLimitScheduler, RateLimitExceeded, parse_retry_after
+from resilience import (CircuitBreaker, CircuitOpenError, IdempotencyGuard, OutcomeUnknownError, RetryPolicy,
+                        IDEMPOTENT_METHODS, RETRYABLE_STATUSES)
 
 logger = logging.getLogger('BotAutomation.APIClient')
+hot_logger = HotLogger('BotAutomation.APIClient')
 
 class UnbelievaBoatAPI:
     BASE_URL = "https://unbelievaboat.com/api"
     API_VERSION = "v1"
 
-    def __init__(self):
+    def __init__(self, pool_size: int = 20, request_timeout: float = 10.0,
+                 scheduler: Optional[RateLimitScheduler] = None, coalesce: bool = True,
+                 balance_cache: Optional[BalanceCache] = None, retry_policy: Optional[RetryPolicy] = None,
+                 circuit_breaker: Optional[CircuitBreaker] = None, base_url: Optional[str] = None,
+                 metrics=None):
         self.api_token = os.getenv('UNBELIEVABOAT_API_TOKEN')
         if not self.api_token:
             raise ValueError("UNBELIEVABOAT_API_TOKEN environment variable is required")
@@ -19,6 +32,79 @@ class UnbelievaBoatAPI:
             "Accept": "application/json"
         }
 
+        # Override to point the client at a local stand-in (see fake_unbelievaboat.py)
+        self.base_url = (base_url or os.getenv('UNBELIEVABOAT_API_URL') or self.BASE_URL).rstrip('/')
+        self.pool_size = pool_size
+        self.request_timeout = request_timeout
+        self._session: Optional[aiohttp.ClientSession] = None
+        self.scheduler = scheduler or RateLimitScheduler()
+        self.coalescer = BalanceCoalescer(self._update_cash, enabled=coalesce)
+        self.balances = balance_cache or BalanceCache()
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.circuit = circuit_breaker or CircuitBreaker()
+        self.idempotency = IdempotencyGuard()
+        # Users with a PATCH in flight, and those that had two at once; see _reconcile
+        self._mutating: Dict[Tuple[str, str], int] = {}
+        self._contended: Set[Tuple[str, str]] = set()
+        # Optional BotMetrics; every HTTP attempt is recorded with its status
+        self.metrics = metrics
+
+    async def start(self, warm_connections: int = 0):
+        """
+        Open the shared HTTP session used for every API call
+
+        Args:
+            warm_connections (int): Number of keep-alive connections to open up front
+        """
+        session = self._get_session()
+        if warm_connections > 0:
+            await self.warm_pool(warm_connections)
+        return session
+
+    async def close(self):
+        """Flush pending balance updates, then close the shared HTTP session and its connection pool"""
+        await self.coalescer.drain()
+        if self._session and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def warm_pool(self, count: int):
+        """
+        Pre-open connections so the first robberies skip the TCP/TLS handshake
+
+        Args:
+            count (int): Number of connections to establish concurrently
+        """
+        session = self._get_session()
+
+        async def _touch():
+            try:
+                async with session.head(self.base_url) as response:
+                    await response.read()
+            except aiohttp.ClientError as e:
+                logger.warning(f"Connection pool warm-up request failed: {str(e)}")
+
+        count = min(count, self.pool_size)
+        await asyncio.gather(*(_touch() for _ in range(count)))
+        logger.info(f"Warmed UnbelievaBoat connection pool with {count} connection(s)")
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Return the shared session, creating it on first use"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.pool_size,
+                limit_per_host=self.pool_size,
+                ttl_dns_cache=300,
+                keepalive_timeout=60,
+                enable_cleanup_closed=True
+            )
+            self._session = aiohttp.ClientSession(
+                headers=self.headers,
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.request_timeout)
+            )
+        return self._session
+
     async def remove_money(self, guild_id: str, user_id: str, amount: int) -> Optional[Dict[str, Any]]:
         """
         Remove money from a user's balance using UnbelievaBoat API
@@ -31,41 +117,8 @@ class UnbelievaBoatAPI:
         Returns:
             Optional[Dict[str, Any]]: API response data or None if failed
         """
-        try:
-            endpoint = f"{self.BASE_URL}/{self.API_VERSION}/guilds/{guild_id}/users/{user_id}"
-
-            logger.info(f"Making API request to endpoint: {endpoint}")
-            logger.info(f"Attempting to remove {amount} from user {user_id} in guild {guild_id}")
-
-            async with aiohttp.ClientSession(headers=self.headers) as session:
-                async with session.patch(endpoint, json={"cash": -abs(amount)}) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        logger.info(f"Successfully removed {amount} from user {user_id}")
-                        logger.info(f"New balance: {data.get('cash', 'unknown')}")
-                        return data
-                    elif response.status == 429:  # Rate limit
-                        retry_after = response.headers.get('Retry-After', 60)
-                        logger.warning(f"Rate limited. Retry after {retry_after} seconds")
-                        return None
-                    elif response.status == 401:
-                        logger.error("Unauthorized. Please check your API token")
-                        return None
-                    elif response.status == 403:
-                        logger.error("Forbidden. Bot lacks necessary permissions")
-                        return None
-                    else:
-                        error_data = await response.text()
-                        logger.error(f"API request failed with status {response.status}: {error_data}")
-                        return None
-
-        except aiohttp.ClientError as e:
-            logger.error(f"Network error in remove_money API call: {str(e)}")
-            return None
-        except Exception as e:
-            logger.error(f"Unexpected error in remove_money API call: {str(e)}")
-            return None
-            
+        return await self.coalescer.submit(guild_id, user_id, -abs(amount))
+
     async def add_money(self, guild_id: str, user_id: str, amount: int) -> Optional[Dict[str, Any]]:
         """
         Add money to a user's balance using UnbelievaBoat API
@@ -78,37 +131,253 @@ class UnbelievaBoatAPI:
         Returns:
             Optional[Dict[str, Any]]: API response data or None if failed
         """
+        return await self.coalescer.submit(guild_id, user_id, abs(amount))
+
+    async def update_balance(self, guild_id: str, user_id: str, delta: int,
+                             idempotency_key: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Apply a signed change to a user's cash balance
+
+        Args:
+            guild_id (str): Discord guild ID
+            user_id (str): Discord user ID
+            delta (int): Amount to add (positive) or remove (negative)
+            idempotency_key (Optional[str]): Key that makes repeated calls apply the change only once
+
+        Returns:
+            Optional[Dict[str, Any]]: API response data or None if failed
+
+        Raises:
+            OutcomeUnknownError: If the change may or may not have been applied and a
+                balance check could not tell which
+        """
+        return await self.idempotency.run(
+            idempotency_key,
+            lambda: self.coalescer.submit(guild_id, user_id, delta)
+        )
+
+    @property
+    def economy_down(self) -> bool:
+        """True while the circuit breaker is failing calls fast"""
+        return self.circuit.is_open
+
+    async def get_balance(self, guild_id: str, user_id: str, max_age: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """
+        Get a user's balance, served from the cache when a fresh copy is available
+
+        Args:
+            guild_id (str): Discord guild ID
+            user_id (str): Discord user ID
+            max_age (Optional[float]): Maximum acceptable age in seconds of a cached balance
+
+        Returns:
+            Optional[Dict[str, Any]]: Balance data (cash, bank, total) or None if failed
+        """
+        cached = self.balances.get_balance(guild_id, user_id, max_age)
+        if cached is not None:
+            return cached
+        return await self._request("GET", guild_id, user_id, "get_balance")
+
+    def cached_cash(self, guild_id: str, user_id: str) -> Optional[int]:
+        """Cash balance from the cache only (None if unknown); never makes a request"""
+        return self.balances.cash(guild_id, user_id)
+
+    async def _update_cash(self, guild_id: str, user_id: str, delta: int) -> Optional[Dict[str, Any]]:
+        """
+        PATCH a user's cash balance
+
+        When the PATCH fails in a way that doesn't say whether it was applied, the
+        balance is read back and compared with the cached balance from before it.
+
+        Args:
+            guild_id (str): Discord guild ID
+            user_id (str): Discord user ID
+            delta (int): Signed change to the cash balance
+
+        Returns:
+            Optional[Dict[str, Any]]: API response data, or None if the change was not applied
+
+        Raises:
+            OutcomeUnknownError: If the change may have been applied and the balance check can't tell
+        """
+        action = "add_money" if delta > 0 else "remove_money"
+        key = (guild_id, user_id)
+        before = self.balances.cash(guild_id, user_id)
+        if self._mutating.get(key):
+            self._contended.add(key)
+        self._mutating[key] = self._mutating.get(key, 0) + 1
+        try:
+            try:
+                data = await self._request("PATCH", guild_id, user_id, action, json={"cash": delta})
+            except OutcomeUnknownError as e:
+                data = await self._reconcile(guild_id, user_id, delta, before, str(e))
+        finally:
+            self._mutating[key] -= 1
+            if not self._mutating[key]:
+                del self._mutating[key]
+                self._contended.discard(key)
+        if data is not None:
+            hot_logger.info('api.update', "Updated cash of user %s in guild %s by %+d, new balance %s",
+                            user_id, guild_id, delta, data.get('cash', 'unknown'),
+                            rate=0.1, guild_id=guild_id, user_id=user_id)
+        return data
+
+    async def _reconcile(self, guild_id: str, user_id: str, delta: int, before: Optional[int],
+                         reason: str) -> Optional[Dict[str, Any]]:
+        """
+        Find out whether a PATCH with an unknown outcome was applied
+
+        Only possible when the cash balance from before the PATCH is known and no
+        other PATCH for the same user overlapped it: the fresh balance then equals
+        either `before` (not applied) or `before + delta` (applied).
+
+        Returns:
+            Optional[Dict[str, Any]]: Fresh balance data if the change was applied, None if it was not
+
+        Raises:
+            OutcomeUnknownError: If neither can be established
+        """
+        key = (guild_id, user_id)
+        if before is None or key in self._contended:
+            why = "no earlier balance is known" if before is None else "another update overlapped it"
+            logger.error(f"Cash change {delta:+} for user {user_id} in guild {guild_id} is unconfirmed "
+                         f"({reason}) and {why}")
+            raise OutcomeUnknownError(reason)
+
+        current = await self._request("GET", guild_id, user_id, "reconcile")
+        cash = current.get('cash') if current else None
+        if cash == before + delta:
+            logger.warning(f"Cash change {delta:+} for user {user_id} was applied despite: {reason}")
+            return current
+        if cash == before:
+            logger.warning(f"Cash change {delta:+} for user {user_id} was not applied: {reason}")
+            return None
+        logger.error(f"Cash change {delta:+} for user {user_id} in guild {guild_id} is unconfirmed "
+                     f"({reason}); balance went from {before} to {cash}")
+        raise OutcomeUnknownError(reason)
+
+    async def _request(self, method: str, guild_id: str, user_id: str, action: str,
+                       json: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """
+        Send a request for a guild user through the rate limiter, retry policy and circuit breaker
+
+        Rate limits are waited out, retryable failures are retried with backoff, and
+        successful responses also refresh the balance cache. None means the request
+        was definitely not applied.
+
+        Args:
+            method (str): HTTP method
+            guild_id (str): Discord guild ID
+            user_id (str): Discord user ID
+            action (str): Name of the public method making the call, used in log messages
+            json (Optional[Dict[str, Any]]): Request body
+
+        Returns:
+            Optional[Dict[str, Any]]: API response data or None if failed
+
+        Raises:
+            OutcomeUnknownError: If a mutation failed after it may have reached the server
+                (timeout, dropped connection, 5xx other than 503)
+        """
+        endpoint = f"{self.base_url}/{self.API_VERSION}/guilds/{guild_id}/users/{user_id}"
+        route = f"{method} /guilds/{guild_id}/users"
+        deadline = time.monotonic() + self.scheduler.deadline
+        attempt = 0
+
+        hot_logger.debug('api.request', "Making API request to endpoint: %s %s", method, endpoint,
+                         rate=0.01, guild_id=guild_id, user_id=user_id)
+
         try:
-            endpoint = f"{self.BASE_URL}/{self.API_VERSION}/guilds/{guild_id}/users/{user_id}"
-
-            logger.info(f"Making API request to endpoint: {endpoint}")
-            logger.info(f"Attempting to add {amount} to user {user_id} in guild {guild_id}")
-
-            async with aiohttp.ClientSession(headers=self.headers) as session:
-                async with session.patch(endpoint, json={"cash": abs(amount)}) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        logger.info(f"Successfully added {amount} to user {user_id}")
-                        logger.info(f"New balance: {data.get('cash', 'unknown')}")
-                        return data
-                    elif response.status == 429:  # Rate limit
-                        retry_after = response.headers.get('Retry-After', 60)
-                        logger.warning(f"Rate limited. Retry after {retry_after} seconds")
-                        return None
-                    elif response.status == 401:
-                        logger.error("Unauthorized. Please check your API token")
-                        return None
-                    elif response.status == 403:
-                        logger.error("Forbidden. Bot lacks necessary permissions")
-                        return None
-                    else:
-                        error_data = await response.text()
-                        logger.error(f"API request failed with status {response.status}: {error_data}")
-                        return None
-
-        except aiohttp.ClientError as e:
-            logger.error(f"Network error in add_money API call: {str(e)}")
+            while True:
+                await self.scheduler.acquire(route, deadline)
+                try:
+                    probe = self.circuit.allow()
+                except CircuitOpenError:
+                    self.scheduler.release(route)
+                    raise
+                attempt += 1
+                status = None
+                connected = True
+                # Whether this attempt may have been applied even though it failed
+                ambiguous = False
+                started = time.perf_counter()
+
+                try:
+                    session = self._get_session()
+                    async with session.request(method, endpoint, json=json) as response:
+                        status = response.status
+                        self.scheduler.update(route, response.headers)
+
+                        if status == 200:
+                            data = await response.json()
+                            self.circuit.record_success()
+                            self.balances.set_balance(guild_id, user_id, data)
+                            return data
+                        elif status == 429:  # Rate limit
+                            self.circuit.record_success()
+                            retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                            self.scheduler.on_rate_limited(route, retry_after)
+                            continue
+                        elif status == 401:
+                            self.circuit.record_success()
+                            logger.error("Unauthorized. Please check your API token")
+                            return None
+                        elif status == 403:
+                            self.circuit.record_success()
+                            logger.error("Forbidden. Bot lacks necessary permissions")
+                            return None
+                        elif status < 500:
+                            self.circuit.record_success()
+                            error_data = await response.text()
+                            logger.error(f"API request failed with status {status}: {error_data}")
+                            return None
+                        else:
+                            self.circuit.record_failure()
+                            ambiguous = status not in RETRYABLE_STATUSES
+                            error_data = await response.text()
+                            logger.error(f"API request failed with status {status}: {error_data}")
+
+                except aiohttp.ClientConnectorError as e:
+                    self.circuit.record_failure()
+                    connected = False
+                    logger.error(f"Could not connect for {action} API call: {str(e)}")
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    self.circuit.record_failure()
+                    ambiguous = True
+                    logger.error(f"Network error in {action} API call: {str(e) or type(e).__name__}")
+                except Exception as e:
+                    # e.g. a 200 whose body isn't JSON; the request itself may well have landed
+                    self.circuit.record_failure()
+                    ambiguous = True
+                    logger.error(f"Unexpected error in {action} API call: {str(e)}")
+                finally:
+                    # A probe cancelled mid-flight must not leave the circuit half-open for good
+                    self.circuit.end_probe(probe)
+                    if status is None:
+                        self.scheduler.update(route, {})
+                    if self.metrics:
+                        self.metrics.observe_economy(method, status, time.perf_counter() - started)
+
+                if ambiguous and method not in IDEMPOTENT_METHODS:
+                    raise OutcomeUnknownError(
+                        f"{action} API call failed with {status or 'no response'} after it may have been applied"
+                    )
+                if not self.retry_policy.should_retry(method, attempt, status, connected):
+                    return None
+                delay = self.retry_policy.backoff(attempt)
+                if time.monotonic() + delay > deadline:
+                    return None
+                logger.warning(f"Retrying {action} API call in {delay:.2f} seconds (attempt {attempt + 1})")
+                await asyncio.sleep(delay)
+
+        except OutcomeUnknownError:
+            raise
+        except CircuitOpenError as e:
+            logger.warning(f"Skipping {action} API call: {str(e)}")
+            return None
+        except RateLimitExceeded as e:
+            logger.error(f"Gave up on {action} API call: {str(e)}")
             return None
         except Exception as e:
-            logger.error(f"Unexpected error in add_money API call: {str(e)}")
-            return None
\ No newline at end of file
+            logger.error(f"Unexpected error in {action} API call: {str(e)}")
+            return None
@@ -0,0 +1,66 @@
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+
+class TTLCache:
+    """Small LRU cache whose entries expire after a fixed time-to-live"""
+
+    def __init__(self, ttl: float = 30.0, max_size: int = 10000):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, max_age: Optional[float] = None) -> Optional[Any]:
+        """Return a cached value, or None if it is missing, expired or older than max_age"""
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        stored_at, value = entry
+        age = time.monotonic() - stored_at
+        if age > self.ttl:
+            del self._data[key]
+            self.misses += 1
+            return None
+        if max_age is not None and age > max_age:
+            self.misses += 1
+            return None
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any):
+        self._data[key] = (time.monotonic(), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+
+    def invalidate(self, key: Hashable):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class BalanceCache(TTLCache):
+    """TTL/LRU cache of UnbelievaBoat balances keyed by (guild_id, user_id)"""
+
+    def get_balance(self, guild_id: str, user_id: str, max_age: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        return self.get((guild_id, user_id), max_age)
+
+    def set_balance(self, guild_id: str, user_id: str, data: Dict[str, Any]):
+        if isinstance(data, dict) and 'cash' in data:
+            self.set((guild_id, user_id), data)
+
+    def cash(self, guild_id: str, user_id: str) -> Optional[int]:
+        """Cached cash balance, or None if unknown; never makes a request"""
+        data = self.get_balance(guild_id, user_id)
+        return data.get('cash') if data else None
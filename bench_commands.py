@@ -0,0 +1,294 @@
+"""
+Load-test harness for the /woozie and /plock handlers
+
+Builds fake Discord interactions, guilds, members and roles, then fires
+concurrent invocations of the command callbacks registered by
+bot_automation.register_commands. The economy is either stubbed in-process
+or served by fake_unbelievaboat.py, and the dramatic sleeps run on a virtual
+clock so they don't dominate the numbers.
+
+    python bench_commands.py --count 2000 --concurrency 200 --members 5000
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import time
+from collections import Counter
+from typing import List, Optional
+
+# Dummy credentials so the bot can be constructed without logging in; the journal
+# is disabled so runs don't write settlements.db, and cooldowns are off so every
+# invocation reaches the handler
+os.environ.setdefault('DISCORD_TOKEN', 'benchmark')
+os.environ.setdefault('UNBELIEVABOAT_API_TOKEN', 'benchmark')
+os.environ.setdefault('JOURNAL_PATH', '')
+os.environ.setdefault('COMMAND_COOLDOWN_LIMIT', '0')
+
+import encounters
+from bot_automation import AutomationBot, register_commands
+from fake_unbelievaboat import FakeUnbelievaBoat
+from narrative import FOLLOWUP, MODES as NARRATIVE_MODES
+
+WEAPON_ROLES = ["Woozie", "Glock", "Shotgun", "Uzi"]
+# Modules whose module-level `asyncio.sleep` calls run on the virtual clock
+CLOCKED_MODULES = [encounters]
+
+_real_sleep = asyncio.sleep
+
+
+class VirtualClock:
+    """Stands in for the `asyncio` module, compressing sleeps by `scale`"""
+
+    def __init__(self, scale: float = 0.0):
+        self.scale = scale
+        self.skipped = 0.0
+
+    async def sleep(self, delay, result=None):
+        self.skipped += delay * (1 - self.scale)
+        return await _real_sleep(delay * self.scale, result)
+
+    def __getattr__(self, name):
+        return getattr(asyncio, name)
+
+
+class Calls:
+    """Counts outbound calls made while handling commands"""
+
+    def __init__(self):
+        self.discord = Counter()
+        self.economy = 0
+
+
+class FakeRole:
+    def __init__(self, role_id: int, name: str):
+        self.id = role_id
+        self.name = name
+
+    def __repr__(self):
+        return f"<FakeRole {self.name}>"
+
+
+class FakePermissions:
+    def __init__(self, administrator: bool = False):
+        self.administrator = administrator
+
+
+class FakeMember:
+    def __init__(self, member_id: int, guild, roles: List[FakeRole], bot: bool = False):
+        self.id = member_id
+        self.guild = guild
+        self.roles = roles
+        self.bot = bot
+        self.name = f"user{member_id}"
+        self.display_name = self.name
+        self.mention = f"<@{member_id}>"
+        self.guild_permissions = FakePermissions()
+
+
+class FakeGuild:
+    def __init__(self, guild_id: int, roles: List[FakeRole]):
+        self.id = guild_id
+        self.roles = roles
+        self.members: List[FakeMember] = []
+        self._by_id = {}
+
+    def add_member(self, member: FakeMember):
+        self.members.append(member)
+        self._by_id[member.id] = member
+
+    def get_member(self, member_id: int) -> Optional[FakeMember]:
+        return self._by_id.get(member_id)
+
+    def get_role(self, role_id: int) -> Optional[FakeRole]:
+        for role in self.roles:
+            if role.id == role_id:
+                return role
+        return None
+
+
+class FakeMessage:
+    def __init__(self, calls: Calls, content: str = None):
+        self.calls = calls
+        self.content = content
+
+    async def edit(self, content: str = None, **kwargs):
+        self.calls.discord['message.edit'] += 1
+        self.content = content
+
+
+class FakeResponse:
+    def __init__(self, calls: Calls):
+        self.calls = calls
+        self._done = False
+
+    def is_done(self) -> bool:
+        return self._done
+
+    async def send_message(self, content: str = None, **kwargs):
+        self.calls.discord['response.send_message'] += 1
+        self._done = True
+
+    async def defer(self, **kwargs):
+        self.calls.discord['response.defer'] += 1
+        self._done = True
+
+
+class FakeFollowup:
+    def __init__(self, calls: Calls):
+        self.calls = calls
+
+    async def send(self, content: str = None, **kwargs):
+        self.calls.discord['followup.send'] += 1
+        return FakeMessage(self.calls, content)
+
+
+class FakeInteraction:
+    def __init__(self, guild: FakeGuild, user: FakeMember, calls: Calls):
+        self.guild = guild
+        self.guild_id = guild.id
+        self.user = user
+        self.response = FakeResponse(calls)
+        self.followup = FakeFollowup(calls)
+        self.calls = calls
+
+    async def original_response(self):
+        self.calls.discord['original_response'] += 1
+        return FakeMessage(self.calls)
+
+    async def edit_original_response(self, content: str = None, **kwargs):
+        self.calls.discord['edit_original_response'] += 1
+
+
+def build_guild(members: int, armed_ratio: float, bot_ratio: float, seed: int) -> FakeGuild:
+    rng = random.Random(seed)
+    roles = [FakeRole(1000 + i, name) for i, name in enumerate(WEAPON_ROLES)]
+    # Pad the role list so role lookups cost what they do in a real guild
+    roles += [FakeRole(2000 + i, f"role-{i}") for i in range(200)]
+    guild = FakeGuild(1, roles)
+    for i in range(members):
+        is_bot = rng.random() < bot_ratio
+        member_roles = []
+        if not is_bot and rng.random() < armed_ratio:
+            member_roles = rng.sample(roles[:len(WEAPON_ROLES)], rng.randint(1, 2))
+        guild.add_member(FakeMember(10_000 + i, guild, member_roles, bot=is_bot))
+    return guild
+
+
+def stub_economy(bot: AutomationBot, calls: Calls, latency: float, starting_cash: int):
+    """Replace the client's HTTP layer with an in-process ledger"""
+    ledger = {}
+
+    async def _request(method, guild_id, user_id, action, json=None):
+        calls.economy += 1
+        if latency:
+            await _real_sleep(latency)
+        cash = ledger.setdefault((guild_id, user_id), starting_cash)
+        if method == "PATCH":
+            cash = ledger[(guild_id, user_id)] = cash + json.get('cash', 0)
+        data = {'user_id': user_id, 'cash': cash, 'bank': 0, 'total': cash}
+        bot.unbelievaboat.balances.set_balance(guild_id, user_id, data)
+        return data
+
+    bot.unbelievaboat._request = _request
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+async def run(args):
+    random.seed(args.seed)
+    bot = AutomationBot()
+    register_commands(bot)
+    bot.encounters.modes.default = args.narrative_mode
+
+    calls = Calls()
+    clock = VirtualClock(args.time_scale)
+    for module in CLOCKED_MODULES:
+        module.asyncio = clock
+
+    fake = None
+    if args.backend == "fake":
+        fake = FakeUnbelievaBoat(latency=args.latency, rate_limit=args.rate_limit)
+        bot.unbelievaboat.base_url = await fake.start(port=args.port)
+    else:
+        stub_economy(bot, calls, args.latency, args.starting_cash)
+
+    guild = build_guild(args.members, args.armed_ratio, args.bot_ratio, args.seed)
+    commands = {name: bot.tree.get_command(name) for name in args.commands}
+    required_role = {"woozie": "Woozie", "plock": "Glock"}
+    invokers = {
+        name: [m for m in guild.members if not m.bot and any(r.name == required_role[name] for r in m.roles)]
+        for name in commands
+    }
+    for name, members in invokers.items():
+        if not members:
+            raise SystemExit(f"No members hold the {required_role[name]} role; raise --armed-ratio or --members")
+
+    latencies: List[float] = []
+    outcomes = Counter()
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def invoke(i: int):
+        name = args.commands[i % len(args.commands)]
+        user = random.choice(invokers[name])
+        interaction = FakeInteraction(guild, user, calls)
+        async with semaphore:
+            started = time.perf_counter()
+            await commands[name].callback(interaction)
+            latencies.append(time.perf_counter() - started)
+        outcomes[name] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(invoke(i) for i in range(args.count)))
+    elapsed = time.perf_counter() - started
+
+    economy_calls = calls.economy
+    if fake:
+        economy_calls = fake.stats['GET'] + fake.stats['PATCH']
+        await fake.stop()
+    await bot.settlement.close()
+    await bot.unbelievaboat.close()
+
+    total = len(latencies)
+    discord_calls = sum(calls.discord.values())
+    print(f"commands:            {total} ({', '.join(f'{k}={v}' for k, v in outcomes.items())})")
+    print(f"members:             {args.members}, concurrency {args.concurrency}, backend {args.backend}, "
+          f"narrative {args.narrative_mode}")
+    print(f"wall time:           {elapsed:.3f}s (virtual sleep skipped: {clock.skipped:.1f}s)")
+    print(f"throughput:          {total / elapsed:.1f} commands/s")
+    print(f"handler latency:     p50 {percentile(latencies, 50) * 1000:.2f}ms  "
+          f"p95 {percentile(latencies, 95) * 1000:.2f}ms  p99 {percentile(latencies, 99) * 1000:.2f}ms  "
+          f"mean {statistics.mean(latencies) * 1000:.2f}ms")
+    print(f"economy calls:       {economy_calls} ({economy_calls / total:.2f} per command)")
+    print(f"discord REST calls:  {discord_calls} ({discord_calls / total:.2f} per command)")
+    for kind, count in sorted(calls.discord.items()):
+        print(f"  {kind:<22} {count} ({count / total:.2f} per command)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the woozie/plock command handlers")
+    parser.add_argument('--commands', default="woozie,plock", type=lambda s: s.split(','))
+    parser.add_argument('--count', type=int, default=1000, help="Total invocations")
+    parser.add_argument('--concurrency', type=int, default=100, help="Invocations in flight at once")
+    parser.add_argument('--members', type=int, default=1000, help="Members in the synthetic guild")
+    parser.add_argument('--armed-ratio', type=float, default=0.3, help="Share of members with weapon roles")
+    parser.add_argument('--bot-ratio', type=float, default=0.01)
+    parser.add_argument('--backend', choices=["stub", "fake"], default="stub")
+    parser.add_argument('--latency', type=float, default=0.05, help="Economy latency per call in seconds")
+    parser.add_argument('--rate-limit', type=int, default=0, help="Fake server rate limit (fake backend)")
+    parser.add_argument('--port', type=int, default=8090, help="Fake server port (fake backend)")
+    parser.add_argument('--starting-cash', type=int, default=100000)
+    parser.add_argument('--time-scale', type=float, default=0.0,
+                        help="Multiplier applied to the handlers' sleeps (0 = skip them)")
+    parser.add_argument('--narrative-mode', choices=list(NARRATIVE_MODES), default=FOLLOWUP)
+    parser.add_argument('--seed', type=int, default=1)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -2,512 +2,465 @@ import discord
 from discord import app_commands
 import asyncio
 import logging
-import random
 import os
+import time
 from discord.ext import commands
 from config import load_config
-from utils import setup_logging
+from utils import setup_logging, memory_usage
 from api_client import UnbelievaBoatAPI
-from keep_alive import start_server
+from rate_limiter import RateLimitScheduler
+from balance_cache import BalanceCache
+from resilience import CircuitBreaker, RetryPolicy
+from settlement import SettlementEngine
+from journal import SettlementJournal
+from member_index import GuildTargetIndex, GuildWeaponIndex, Weapon
+from encounters import EncounterEngine, TRANSFER
+from narrative import MODES as NARRATIVE_MODES, NarrativeModes, parse_overrides
+from role_cache import RoleCache
+from member_locks import LockTimeout, MemberLocks
+from cooldowns import CommandCooldowns
+from command_sync import sync_commands
+from command_metrics import BotMetrics
+from loop_monitor import LoopLagMonitor
+from member_cache import GuildChunker, member_cache_flags
+from health_server import HealthServer, bot_readiness, write_bot_metrics
+import log_sampling
+from log_sampling import HotLogger, Lazy
 
 # Setup logging
 logger = setup_logging()
+hot_logger = HotLogger('BotAutomation')
 
 class AutomationBot(commands.Bot):
-    def __init__(self):
+    def __init__(self, **options):
+        self.started_at = time.perf_counter()
+        self._ready_logged = False
+        self.config = load_config()
+        log_sampling.configure(self.config)
         intents = discord.Intents.default()
-        intents.message_content = True
+        # Only CommandExecutor.wait_for_response reads message content
+        intents.message_content = self.config['MESSAGE_CONTENT_INTENT']
         intents.members = True
         intents.guilds = True
-        super().__init__(command_prefix="!", intents=intents)
-        self.config = load_config()
-        self.unbelievaboat = UnbelievaBoatAPI()
+        super().__init__(
+            command_prefix="!",
+            intents=intents,
+            chunk_guilds_at_startup=self.config['CHUNK_GUILDS_AT_STARTUP'],
+            member_cache_flags=member_cache_flags(self.config['MEMBER_CACHE'], intents),
+            **options
+        )
+        self.chunker = GuildChunker(wait=self.config['CHUNK_WAIT'])
+        self.loop_monitor = LoopLagMonitor(
+            interval=self.config['LOOP_LAG_INTERVAL'],
+            threshold=self.config['LOOP_LAG_THRESHOLD'],
+            window=self.config['LOOP_LAG_WINDOW']
+        ) if self.config['LOOP_LAG_INTERVAL'] > 0 else None
+        self.health_server = HealthServer(
+            lambda: bot_readiness(self),
+            lambda writer: write_bot_metrics(self, writer),
+            host=self.config['HEALTH_HOST'],
+            port=self.config['HEALTH_PORT']
+        ) if self.config['HEALTH_PORT'] else None
+        self.metrics = BotMetrics()
+        self.unbelievaboat = UnbelievaBoatAPI(
+            metrics=self.metrics,
+            base_url=self.config['UNBELIEVABOAT_API_URL'],
+            pool_size=self.config['API_POOL_SIZE'],
+            request_timeout=self.config['API_TIMEOUT'],
+            scheduler=RateLimitScheduler(
+                rate=self.config['API_RATE_LIMIT'],
+                burst=self.config['API_RATE_BURST'],
+                max_queue=self.config['API_QUEUE_SIZE'],
+                deadline=self.config['API_REQUEST_DEADLINE']
+            ),
+            coalesce=self.config['API_COALESCE'],
+            balance_cache=BalanceCache(
+                ttl=self.config['BALANCE_CACHE_TTL'],
+                max_size=self.config['BALANCE_CACHE_SIZE']
+            ),
+            retry_policy=RetryPolicy(
+                max_attempts=self.config['API_RETRY_ATTEMPTS'],
+                base_delay=self.config['API_RETRY_BASE_DELAY'],
+                max_delay=self.config['API_RETRY_MAX_DELAY']
+            ),
+            circuit_breaker=CircuitBreaker(
+                failure_threshold=self.config['CIRCUIT_FAILURE_THRESHOLD'],
+                min_calls=self.config['CIRCUIT_MIN_CALLS'],
+                window=self.config['CIRCUIT_WINDOW'],
+                reset_timeout=self.config['CIRCUIT_RESET_TIMEOUT']
+            )
+        )
+        self.targets = GuildTargetIndex()
+        self.roles = RoleCache()
+        self.weapons = GuildWeaponIndex(self.roles)
+        self.member_locks = MemberLocks(timeout=self.config['MEMBER_LOCK_TIMEOUT'])
+        self.cooldowns = CommandCooldowns(
+            user_limit=self.config['COMMAND_COOLDOWN_LIMIT'],
+            user_window=self.config['COMMAND_COOLDOWN_WINDOW'],
+            guild_limit=self.config['GUILD_COMMAND_LIMIT'],
+            guild_window=self.config['GUILD_COMMAND_WINDOW']
+        )
+        self.settlement = SettlementEngine(
+            self.unbelievaboat,
+            retry_attempts=self.config['SETTLEMENT_RETRY_ATTEMPTS'],
+            retry_delay=self.config['SETTLEMENT_RETRY_DELAY'],
+            journal=SettlementJournal(
+                self.config['JOURNAL_PATH'],
+                batch_interval=self.config['JOURNAL_BATCH_INTERVAL']
+            ) if self.config['JOURNAL_PATH'] else None
+        )
+        self.encounters = EncounterEngine(
+            self.settlement,
+            deadline=self.config['ENCOUNTER_DEADLINE'],
+            modes=NarrativeModes(
+                default=self.config['NARRATIVE_MODE'],
+                overrides=parse_overrides(self.config['NARRATIVE_GUILD_MODES']),
+                lines_per_edit=self.config['NARRATIVE_LINES_PER_EDIT']
+            )
+        )
 
     async def setup_hook(self):
         logger.info("Bot is setting up...")
-        await self.tree.sync()
+        if self.loop_monitor:
+            self.loop_monitor.start()
+        if self.health_server:
+            await self.health_server.start()
+        await self.unbelievaboat.start(warm_connections=self.config['API_POOL_WARMUP'])
+        if self.settlement.journal:
+            await self.settlement.journal.open()
+            await self.settlement.replay()
+        if self.config['COMMAND_SYNC_ENABLED']:
+            await sync_commands(
+                self.tree,
+                self.application_id,
+                self.config['COMMAND_SYNC_STATE'],
+                guild_ids=self.config['COMMAND_SYNC_GUILDS'],
+                force=self.config['COMMAND_SYNC_FORCE']
+            )
+        logger.info(f"Setup finished in {time.perf_counter() - self.started_at:.2f}s")
+
+    async def close(self):
+        # Let running settlements record their outcome before the journal goes away
+        await self.encounters.close()
+        await self.settlement.close()
+        await self.unbelievaboat.close()
+        if self.health_server:
+            await self.health_server.stop()
+        if self.loop_monitor:
+            await self.loop_monitor.stop()
+        await super().close()
 
     async def on_ready(self):
         logger.info(f"Logged in as {self.user}")
-
-async def main():
-    bot = AutomationBot()
-
-    @bot.tree.command(name="woozie", description="Rob someone at gunpoint (requires Woozie role)")
-    @app_commands.describe(target="The user to rob (optional, random if not specified)")
-    async def woozie(interaction: discord.Interaction, target: discord.Member = None):
-        try:
-            # Check if user has the Woozie role
-            woozie_role = discord.utils.get(interaction.guild.roles, name="Woozie")
-            if not woozie_role or woozie_role not in interaction.user.roles:
-                await interaction.response.send_message("❌ You need the Woozie role to use this command!", ephemeral=True)
-                return
-
-            # If no target specified, randomly select one
-            if not target:
-                members = interaction.guild.members
-                valid_targets = [member for member in members if not member.bot and member != interaction.user]
-
-                if not valid_targets:
-                    await interaction.response.send_message("❌ No valid targets found!", ephemeral=True)
-                    return
-
-                target = random.choice(valid_targets)
-            elif target == interaction.user:
-                await interaction.response.send_message("❌ You can't rob yourself!", ephemeral=True)
-                return
-            elif target.bot:
-                await interaction.response.send_message("❌ You can't rob a bot!", ephemeral=True)
-                return
-
-            # Check for roles
-            shotgun_role = discord.utils.find(
-                lambda r: r.name.lower() == "shotgun",
-                interaction.guild.roles
+        if not self._ready_logged:
+            # on_ready fires again after reconnects; only the first one is startup
+            self._ready_logged = True
+            logger.info(f"Startup took {time.perf_counter() - self.started_at:.2f}s")
+            self.log_memory()
+
+    def log_memory(self):
+        """Log resident memory next to the cache sizes it mostly depends on"""
+        rss, peak = memory_usage()
+        current = f"{rss / 2**20:.1f} MiB" if rss is not None else "unknown"
+        members = sum(len(guild.members) for guild in self.guilds)
+        logger.info(
+            f"Memory: RSS {current} (peak {peak / 2**20:.1f} MiB) with {len(self.guilds)} guild(s), "
+            f"{members} cached member(s), member cache '{self.config['MEMBER_CACHE']}', "
+            f"startup chunking {'on' if self.config['CHUNK_GUILDS_AT_STARTUP'] else 'off'}, "
+            f"message content {'on' if self.intents.message_content else 'off'}"
+        )
+
+    async def on_member_join(self, member):
+        self.targets.add_member(member)
+        self.weapons.add_member(member)
+
+    async def on_member_remove(self, member):
+        self.targets.remove_member(member)
+        self.weapons.remove_member(member)
+
+    async def on_member_update(self, before, after):
+        self.targets.update_member(before, after)
+        self.weapons.update_member(before, after)
+
+    async def on_guild_available(self, guild):
+        # Member and role events missed while the guild was unavailable (e.g. a re-identify) are lost
+        self.targets.drop_guild(guild.id)
+        self.roles.invalidate(guild.id)
+        self.weapons.invalidate(guild.id)
+
+    async def on_guild_remove(self, guild):
+        self.chunker.drop_guild(guild.id)
+        self.targets.drop_guild(guild.id)
+        self.roles.invalidate(guild.id)
+        self.weapons.invalidate(guild.id)
+
+    async def on_guild_role_create(self, role):
+        self.roles.invalidate(role.guild.id)
+        self.weapons.invalidate(role.guild.id)
+
+    async def on_guild_role_update(self, before, after):
+        self.roles.invalidate(after.guild.id)
+        self.weapons.invalidate(after.guild.id)
+
+    async def on_guild_role_delete(self, role):
+        self.roles.invalidate(role.guild.id)
+        self.weapons.invalidate(role.guild.id)
+
+class ShardedAutomationBot(AutomationBot, commands.AutoShardedBot):
+    """AutomationBot on AutoShardedBot: one process running several gateway shards"""
+
+    async def on_shard_ready(self, shard_id):
+        logger.info(f"Shard {shard_id} ready")
+
+def create_bot(shard_ids=None, shard_count=None):
+    """
+    Build the bot, sharded if SHARDING_ENABLED is set or shards are passed in
+
+    Args:
+        shard_ids: Shards this process runs (defaults to SHARD_IDS)
+        shard_count: Total shards across every process (defaults to SHARD_COUNT, 0 = ask Discord)
+
+    Returns:
+        AutomationBot: The bot, not yet started
+    """
+    config = load_config()
+    if not config['SHARDING_ENABLED'] and shard_ids is None:
+        return AutomationBot()
+    shard_ids = shard_ids if shard_ids is not None else config['SHARD_IDS']
+    shard_count = shard_count or config['SHARD_COUNT'] or None
+    if shard_ids is not None and shard_count is None:
+        raise ValueError("SHARD_COUNT is required when SHARD_IDS is set")
+    logger.info(f"Sharded mode: shards {shard_ids or 'all'} of {shard_count or 'recommended count'}")
+    return ShardedAutomationBot(shard_ids=shard_ids, shard_count=shard_count)
+
+def pick_random_target(bot, interaction, attempts=5):
+    """Pick a random human member other than the caller, preferring ones not known to be broke"""
+    target = None
+    for _ in range(attempts):
+        target = bot.targets.pick(interaction.guild, exclude_id=interaction.user.id)
+        if target is None or not is_known_broke(bot, interaction, target):
+            break
+    return target
+
+def is_known_broke(bot, interaction, member):
+    """True if the cached balance says the member has no cash; unknown balances count as robbable"""
+    cash = bot.unbelievaboat.cached_cash(str(interaction.guild_id), str(member.id))
+    return cash is not None and cash <= 0
+
+async def defer_before_waiting(interaction):
+    """Acknowledge the interaction before anything that can outlast Discord's 3s response deadline"""
+    if not interaction.response.is_done():
+        await interaction.response.defer(thinking=True)
+
+async def reply(interaction, text, ephemeral=False):
+    """Answer with the initial response, or with a followup once the interaction was deferred"""
+    if interaction.response.is_done():
+        await interaction.followup.send(text, ephemeral=ephemeral)
+    else:
+        await interaction.response.send_message(text, ephemeral=ephemeral)
+
+# Command name -> (weapon needed to use it, role name shown to users, name used in error logs)
+ROBBERY_COMMANDS = {
+    "woozie": (Weapon.WOOZIE, "Woozie", "gunpoint"),
+    "plock": (Weapon.GLOCK, "Glock", "plock"),
+}
+
+# Outcomes of robberies that passed the cooldown check but never went ahead; their use is given back
+REFUNDED_OUTCOMES = frozenset({"economy_down", "no_target", "invalid_target", "broke", "busy"})
+
+async def rob(bot, interaction, target, command):
+    """
+    Shared handler for the robbery commands; the matchup table decides what happens
+
+    Returns:
+        str: The outcome, an encounter name or why the robbery didn't happen
+    """
+    outcome = await attempt_robbery(bot, interaction, target, command)
+    if outcome in REFUNDED_OUTCOMES:
+        bot.cooldowns.refund(command, interaction.guild_id, interaction.user.id)
+    return outcome
+
+async def attempt_robbery(bot, interaction, target, command):
+    weapon, role_name, label = ROBBERY_COMMANDS[command]
+    try:
+        # Check if user has the role for this command, from the interaction's own copy of their roles
+        if not bot.weapons.refresh(interaction.user) & weapon:
+            await interaction.response.send_message(f"❌ You need the {role_name} role to use this command!", ephemeral=True)
+            return "no_role"
+
+        # Reject spam before it costs an economy call or a public message; rob() refunds attempts that stop short
+        wait = bot.cooldowns.check(command, interaction.guild_id, interaction.user.id)
+        if wait:
+            await interaction.response.send_message(
+                f"🕒 Slow down! You can use /{command} again in {bot.cooldowns.format_wait(wait)}.", ephemeral=True
             )
+            return "cooldown"
 
-            # Debug log to help troubleshoot
-            logger.info(f"Checking if {target.display_name} has shotgun/woozie roles")
-            if shotgun_role:
-                logger.info(f"Found shotgun role: {shotgun_role.name}")
-                logger.info(f"Target roles: {[role.name for role in target.roles]}")
-            else:
-                logger.info(f"No shotgun role found in the server")
-
-            # Priority check: if target has Woozie role, always trigger the gunfight scenario
-            # regardless of whether they have a shotgun role
-            if woozie_role in target.roles:
-                # Both have Woozie role, gunfight happens
-                logger.info(f"Gunfight scenario: both {interaction.user.display_name} and {target.display_name} have Woozie role")
-
-                penalty1 = random.randint(5000, 15000)
-                penalty2 = random.randint(5000, 15000)
-
-                # Initial response
-                await interaction.response.send_message(
-                    f"🔫 You try to rob {target.mention}, but they pull out their piece too!"
-                )
-
-                # Dramatic gunfight sequence - randomize some options
-                gunfight_options = [
-                    [
-                        f"💥 **BANG!** {interaction.user.display_name} fires first but misses!",
-                        f"💨 \"LOCK IN BLUD!!\" {target.display_name} yells, returning fire!",
-                        f"💢 {interaction.user.display_name} gets hit! (-${penalty1:,})",
-                        f"💥 Your bullet grazes {target.display_name}! (-${penalty2:,})"
-                    ],
-                    [
-                        f"🔫 **BANG! BANG!** Bullets fly everywhere!",
-                        f"💥 \"ALL I SEE IS GREEN!!!\" {interaction.user.display_name} shouts!",
-                        f"💢 You both get hit in the crossfire! (-${penalty1:,})",
-                        f"🚓 Police sirens in the distance force you both to flee! (-${penalty2:,})"
-                    ],
-                    [
-                        f"🔫 {target.display_name} draws faster than expected!",
-                        f"💥 You trade shots in the street!",
-                        f"💢 Blood spills on both sides! (-${penalty1:,}) (-${penalty2:,})",
-                        f"🏃‍♂️ You both limp away before anyone sees you!"
-                    ]
-                ]
-                gunfight_messages = random.choice(gunfight_options)
-
-                # Send each message with a delay for dramatic effect
-                for i, message in enumerate(gunfight_messages):
-                    if i == 0:  # First message is already sent
-                        await asyncio.sleep(1.5)
-                    else:
-                        await asyncio.sleep(1.5)
-                        await interaction.followup.send(message)
-
-                # Remove money from both participants
-                guild_id = str(interaction.guild_id)
-                robber_user_id = str(interaction.user.id)
-                target_user_id = str(target.id)
-
-                # Remove from robber
-                result1 = await bot.unbelievaboat.remove_money(guild_id, robber_user_id, penalty1)
-                # Remove from target
-                result2 = await bot.unbelievaboat.remove_money(guild_id, target_user_id, penalty2)
-
-                if result1 and result2:
-                    robber_new_balance = result1.get('cash', 'unknown')
-                    target_new_balance = result2.get('cash', 'unknown')
-                    await interaction.followup.send(
-                        f"💸 **Gunfight Aftermath:**\n"
-                        f"{interaction.user.mention}: ${robber_new_balance:,} (-${penalty1:,})\n"
-                        f"{target.mention}: ${target_new_balance:,} (-${penalty2:,})"
-                    )
-
-                return
-
-            # If target only has shotgun role (no Woozie role), trigger the shotgun defense scenario
-            elif shotgun_role and shotgun_role in target.roles:
-                # Target has shotgun role, they defend themselves - attacker loses money
-                penalty = random.randint(10000, 15000)
-                logger.info(f"{target.display_name} has shotgun role, preventing robbery and penalizing robber {penalty}")
-
-                # Initial response
-                await interaction.response.send_message(
-                    f"🔫 You try to rob {target.mention}, but wait... what's that they're reaching for?"
-                )
-
-                # Dramatic shotgun defense sequence - randomize some options
-                shotgun_options = [
-                    [
-                        f"💥 **BOOM!** {target.display_name} pulls out a shotgun!",
-                        f"😱 \"LOCK IN BLUD!!\" {target.display_name} shouts as they fire!",
-                        f"💢 The blast catches you! (-${penalty:,})",
-                        f"🩸 You escape, badly wounded!"
-                    ],
-                    [
-                        f"💥 {target.display_name} reveals a sawed-off shotgun!",
-                        f"😱 You freeze in place seeing the barrel!",
-                        f"💢 The shot rings out! (-${penalty:,})",
-                        f"🏥 You'll need stitches after this one!"
-                    ],
-                    [
-                        f"💥 \"{target.display_name}'s strapped with a shotty!\" someone yells!",
-                        f"😱 You try to escape but stumble!",
-                        f"💢 **BOOM!** You take the blast! (-${penalty:,})",
-                        f"🚑 That's a hospital trip for sure!"
-                    ]
-                ]
-                shotgun_messages = random.choice(shotgun_options)
-
-                # Send each message with a delay for dramatic effect
-                for message in shotgun_messages:
-                    await asyncio.sleep(1.5)
-                    await interaction.followup.send(message)
-
-                # Remove penalty money from robber
-                guild_id = str(interaction.guild_id)
-                robber_user_id = str(interaction.user.id)
-
-                result = await bot.unbelievaboat.remove_money(guild_id, robber_user_id, penalty)
-                if result:
-                    robber_new_balance = result.get('cash', 'unknown')
-                    await interaction.followup.send(
-                        f"💸 **Medical Bill:** ${penalty:,}\n"
-                        f"Your new balance: ${robber_new_balance:,}"
-                    )
-
-                return
-
-            # Send initial response for normal robbery
-            await interaction.response.send_message(f"🔫 You're robbing {target.mention}!")
-
-            # Use UnbelievaBoat API to remove money with random amount between 25k-50k
-            guild_id = str(interaction.guild_id)
-            target_user_id = str(target.id)
-            robber_user_id = str(interaction.user.id)
-            amount = random.randint(25000, 50000)
-
-            logger.info(f"Attempting to remove {amount} from user {target_user_id} in guild {guild_id}")
-
-            # Remove money from target
-            result = await bot.unbelievaboat.remove_money(guild_id, target_user_id, amount)
-
-            if result:
-                target_new_balance = result.get('cash', 'unknown')
-
-                # Add the stolen money to the robber
-                logger.info(f"Attempting to add {amount} to user {robber_user_id} in guild {guild_id}")
-                add_result = await bot.unbelievaboat.add_money(guild_id, robber_user_id, amount)
-
-                if add_result:
-                    robber_new_balance = add_result.get('cash', 'unknown')
-                    await interaction.followup.send(
-                        f"💰 Successfully robbed ${amount:,} from {target.mention}!\n"
-                        f"Their new balance is ${target_new_balance:,}\n"
-                        f"Your new balance is ${robber_new_balance:,}"
-                    )
-                else:
-                    await interaction.followup.send(
-                        f"💰 Successfully robbed ${amount:,} from {target.mention}, but failed to add it to your account.\n"
-                        f"Their new balance is ${target_new_balance:,}"
-                    )
-            else:
-                await interaction.followup.send(
-                    "❌ Failed to rob the target. They might be broke or protected!\n"
-                    "Make sure you have permissions to use economy commands."
-                )
+        # Fail fast while the UnbelievaBoat circuit breaker is open
+        if bot.unbelievaboat.economy_down:
+            await interaction.response.send_message("🏦 The economy is down right now. Try again in a bit!", ephemeral=True)
+            return "economy_down"
 
-        except Exception as e:
-            logger.error(f"Error in gunpoint command: {str(e)}")
-            await interaction.followup.send("❌ An unexpected error occurred while trying to rob the target.")
+        # If no target specified, randomly select one
+        if not target:
+            # Random targeting needs the member list; load it now if startup chunking is off
+            if not getattr(interaction.guild, 'chunked', True):
+                await defer_before_waiting(interaction)
+            await bot.chunker.ensure(interaction.guild)
+            target = pick_random_target(bot, interaction)
 
-    @bot.tree.command(name="plock", description="Rob someone with a pistol (requires Glock role)")
-    @app_commands.describe(target="The user to rob (optional, random if not specified)")
-    async def plock(interaction: discord.Interaction, target: discord.Member = None):
+            if not target:
+                await reply(interaction, "❌ No valid targets found!", ephemeral=True)
+                return "no_target"
+
+        elif target == interaction.user:
+            await interaction.response.send_message("❌ You can't rob yourself!", ephemeral=True)
+            return "invalid_target"
+        elif target.bot:
+            await interaction.response.send_message("❌ You can't rob a bot!", ephemeral=True)
+            return "invalid_target"
+
+        # One settlement per member at a time, so two robberies of the same target can't interleave.
+        # The lock covers the broke check and the money only; the narrative plays after it is released.
+        # Waiting on a busy member can take MEMBER_LOCK_TIMEOUT, so acknowledge the interaction first
+        if bot.member_locks.locked(interaction.guild_id, interaction.user.id) or \
+                bot.member_locks.locked(interaction.guild_id, target.id):
+            await defer_before_waiting(interaction)
         try:
-            # Check if user has the Glock role
-            glock_role = discord.utils.get(interaction.guild.roles, name="Glock")
-            if not glock_role or glock_role not in interaction.user.roles:
-                await interaction.response.send_message("❌ You need the Glock role to use this command!", ephemeral=True)
-                return
+            async with bot.member_locks.hold(interaction.guild_id, interaction.user.id, target.id):
+                # Look up the target's weapons in the index and pick the encounter
+                target_weapons = bot.weapons.flags(target)
+                encounter = bot.encounters.resolve(command, target_weapons)
+
+                # Debug log to help troubleshoot; sampled, and in full for guilds/users under /debuglog
+                hot_logger.info(
+                    'rob.matchup', "%s command: %s has weapons %r, encounter %s",
+                    command, Lazy(lambda: target.display_name), target_weapons, encounter.name,
+                    rate=0.1, guild_id=interaction.guild_id, user_id=interaction.user.id
+                )
 
-            # If no target specified, randomly select one
-            if not target:
-                members = interaction.guild.members
-                valid_targets = [member for member in members if not member.bot and member != interaction.user]
-
-                if not valid_targets:
-                    await interaction.response.send_message("❌ No valid targets found!", ephemeral=True)
-                    return
-
-                target = random.choice(valid_targets)
-            elif target == interaction.user:
-                await interaction.response.send_message("❌ You can't rob yourself!", ephemeral=True)
-                return
-            elif target.bot:
-                await interaction.response.send_message("❌ You can't rob a bot!", ephemeral=True)
-                return
-
-            # Check for roles
-            shotgun_role = discord.utils.find(
-                lambda r: r.name.lower() == "shotgun",
-                interaction.guild.roles
-            )
+                # Skip targets the balance cache already knows are broke
+                if encounter.payout == TRANSFER and is_known_broke(bot, interaction, target):
+                    await reply(interaction, f"❌ {target.display_name} is broke! Find someone else to rob.", ephemeral=True)
+                    return "broke"
 
-            woozie_role = discord.utils.get(interaction.guild.roles, name="Woozie")
-            uzi_role = discord.utils.find(
-                lambda r: r.name.lower() == "uzi",
-                interaction.guild.roles
+                run = await bot.encounters.start(encounter, interaction, target)
+                await run.settled()
+        except LockTimeout:
+            await reply(
+                interaction, f"⏳ You or {target.display_name} are already caught up in a robbery. Try again in a moment!",
+                ephemeral=True
             )
+            return "busy"
 
-            # Debug log to help troubleshoot
-            logger.info(f"Plock command: Checking if {target.display_name} has shotgun/woozie/uzi/plock roles")
-
-            # Check if target has Uzi role
-            if uzi_role and uzi_role in target.roles:
-                # Target has Uzi, they overpower the plock user
-                penalty = random.randint(5000, 10000)
-                logger.info(f"{target.display_name} has Uzi role, overpowering plock user with penalty {penalty}")
-
-                # Random uzi intro messages
-                uzi_intros = [
-                    f"🔫 Your plock is no match for {target.mention}'s UZI!",
-                    f"🔫 {target.mention} pulls out an UZI when you show your plock!",
-                    f"🔫 You brought a plock to an UZI fight with {target.mention}!"
-                ]
-                await interaction.response.send_message(random.choice(uzi_intros))
-
-                # Simplified uzi defense options
-                uzi_options = [
-                    [f"💥 UZI fires!", f"💢 You're hit! (-${penalty:,})"],
-                    [f"💥 \"ALL I SEE IS GREEN!!!\" {target.display_name} yells, firing their UZI!", f"💢 Multiple hits! (-${penalty:,})"],
-                    [f"💥 UZI wins!", f"💢 You're wounded! (-${penalty:,})"]
-                ]
-                uzi_messages = random.choice(uzi_options)
-
-                for message in uzi_messages:
-                    await asyncio.sleep(1.5)
-                    await interaction.followup.send(message)
-
-                # Remove penalty money from robber
-                guild_id = str(interaction.guild_id)
-                robber_user_id = str(interaction.user.id)
-
-                result = await bot.unbelievaboat.remove_money(guild_id, robber_user_id, penalty)
-                if result:
-                    robber_new_balance = result.get('cash', 'unknown')
-                    await interaction.followup.send(
-                        f"💸 **Medical Bill:** ${penalty:,}\n"
-                        f"Your new balance: ${robber_new_balance:,}"
-                    )
-
-                return
-
-            # Check if target has Shotgun role
-            elif shotgun_role and shotgun_role in target.roles:
-                # Target has shotgun role, scares away the plock user
-                logger.info(f"{target.display_name} has shotgun role, scaring away plock user")
-
-                await interaction.response.send_message(
-                    f"🔫 You pull out your pistol to rob {target.mention}, but freeze when you see their shotgun!"
-                )
-
-                # Dramatic shotgun scare sequence - randomize some options
-                shotgun_options = [
-                    [
-                        f"💥 **CLICK!** {target.display_name} cocks their shotgun!",
-                        f"😱 The sight of that barrel makes you freeze!",
-                        f"🏃 You quickly put away your plock...",
-                        f"💨 You back away slowly, grateful to be alive!"
-                    ],
-                    [
-                        f"💥 {target.display_name} reveals a shotgun!",
-                        f"😱 \"You picked the wrong one today!\" they shout!",
-                        f"🏃 Your plock feels useless now...",
-                        f"💨 You decide this isn't worth it and flee!"
-                    ],
-                    [
-                        f"💥 {target.display_name}'s shotgun makes your plock look like a toy!",
-                        f"😱 \"LOCK IN BLUD!!\" they shout, aiming at you!",
-                        f"🏃 That plock won't help you now...",
-                        f"💨 You wisely choose to run away!"
-                    ]
-                ]
-                shotgun_messages = random.choice(shotgun_options)
-
-                for message in shotgun_messages:
-                    await asyncio.sleep(1.5)
-                    await interaction.followup.send(message)
-
-                await interaction.followup.send(
-                    f"😅 You escaped without losing any money, but your pride is severely wounded!"
-                )
+        await run.finish()
+        return encounter.name
 
-                return
+    except Exception as e:
+        logger.error(f"Error in {label} command: {str(e)}")
+        await reply(interaction, "❌ An unexpected error occurred while trying to rob the target.")
+        return "error"
 
-            # Check if target also has Glock role (pistol vs pistol)
-            elif glock_role in target.roles:
-                # Both have Glock role, smaller gunfight happens
-                logger.info(f"Pistol standoff: both {interaction.user.display_name} and {target.display_name} have Glock role")
+def register_commands(bot):
+    """Register the app commands on the bot's command tree"""
 
-                penalty1 = random.randint(1000, 5000)
-                penalty2 = random.randint(1000, 5000)
+    @bot.tree.command(name="woozie", description="Rob someone at gunpoint (requires Woozie role)")
+    @app_commands.describe(target="The user to rob (optional, random if not specified)")
+    async def woozie(interaction: discord.Interaction, target: discord.Member = None):
+        async with bot.metrics.track("woozie", interaction) as tracked:
+            tracked.outcome = await rob(bot, tracked.interaction, target, "woozie")
 
-                # Initial response
-                await interaction.response.send_message(
-                    f"🔫 You pull your pistol on {target.mention}, but they draw their pistol too!"
-                )
+    @bot.tree.command(name="plock", description="Rob someone with a pistol (requires Glock role)")
+    @app_commands.describe(target="The user to rob (optional, random if not specified)")
+    async def plock(interaction: discord.Interaction, target: discord.Member = None):
+        async with bot.metrics.track("plock", interaction) as tracked:
+            tracked.outcome = await rob(bot, tracked.interaction, target, "plock")
 
-                # Pistol standoff sequence - randomize some options
-                standoff_options = [
-                    [
-                        f"🔫 You're both pointing plocks at each other!",
-                        f"😠 \"Drop it!\" you both shout at the same time!",
-                        f"💥 {interaction.user.display_name} takes a graze! (-${penalty1:,})",
-                        f"💢 {target.display_name} gets hit too! (-${penalty2:,})"
-                    ],
-                    [
-                        f"🔫 Two plocks drawn in a standoff!",
-                        f"💥 \"ALL I SEE IS GREEN!!!\" Someone nearby yells!",
-                        f"😠 Shots ring out in the panic! (-${penalty1:,})",
-                        f"💢 Both of you are hit! (-${penalty2:,})"
-                    ],
-                    [
-                        f"🔫 Your plocks are locked on each other!",
-                        f"💥 Fingers twitch and bullets fly!",
-                        f"💢 You both take hits! (-${penalty1:,}) (-${penalty2:,})",
-                        f"🚓 A police siren sends you both running!"
-                    ]
-                ]
-                standoff_messages = random.choice(standoff_options)
-
-                # Send each message with a delay
-                for i, message in enumerate(standoff_messages):
-                    if i == 0:  # First message is already sent
-                        await asyncio.sleep(1.5)
-                    else:
-                        await asyncio.sleep(1.5)
-                        await interaction.followup.send(message)
-
-                # Remove money from both participants
-                guild_id = str(interaction.guild_id)
-                robber_user_id = str(interaction.user.id)
-                target_user_id = str(target.id)
-
-                # Remove from robber
-                result1 = await bot.unbelievaboat.remove_money(guild_id, robber_user_id, penalty1)
-                # Remove from target
-                result2 = await bot.unbelievaboat.remove_money(guild_id, target_user_id, penalty2)
-
-                if result1 and result2:
-                    robber_new_balance = result1.get('cash', 'unknown')
-                    target_new_balance = result2.get('cash', 'unknown')
-                    await interaction.followup.send(
-                        f"💸 **Pistol Fight Aftermath:**\n"
-                        f"{interaction.user.mention}: ${robber_new_balance:,} (-${penalty1:,})\n"
-                        f"{target.mention}: ${target_new_balance:,} (-${penalty2:,})"
-                    )
-
-                return
-
-            # Normal plock robbery (smaller amount than woozie)
-            await interaction.response.send_message(f"🔫 You're robbing {target.mention} with your plock!")
-
-            # Use UnbelievaBoat API to remove money with random amount between 500-10k
-            guild_id = str(interaction.guild_id)
-            target_user_id = str(target.id)
-            robber_user_id = str(interaction.user.id)
-            amount = random.randint(500, 10000)
-
-            logger.info(f"Plock robbery: Attempting to remove {amount} from user {target_user_id} in guild {guild_id}")
-
-            # Remove money from target
-            result = await bot.unbelievaboat.remove_money(guild_id, target_user_id, amount)
-
-            if result:
-                target_new_balance = result.get('cash', 'unknown')
-
-                # Add the stolen money to the robber
-                logger.info(f"Plock robbery: Attempting to add {amount} to user {robber_user_id} in guild {guild_id}")
-                add_result = await bot.unbelievaboat.add_money(guild_id, robber_user_id, amount)
-
-                if add_result:
-                    robber_new_balance = add_result.get('cash', 'unknown')
-                    await interaction.followup.send(
-                        f"💰 Successfully robbed ${amount:,} from {target.mention}!\n"
-                        f"Their new balance is ${target_new_balance:,}\n"
-                        f"Your new balance is ${robber_new_balance:,}"
-                    )
-                else:
-                    await interaction.followup.send(
-                        f"💰 Successfully robbed ${amount:,} from {target.mention}, but failed to add it to your account.\n"
-                        f"Their new balance is ${target_new_balance:,}"
-                    )
-            else:
-                await interaction.followup.send(
-                    "❌ Failed to rob the target. They might be broke or protected!\n"
-                    "Make sure you have permissions to use economy commands."
-                )
+    @bot.tree.command(name="narrative", description="Choose how robbery stories are posted in this server (Admin only)")
+    @app_commands.describe(mode="followup: one message per line, edit: a single message updated in place")
+    @app_commands.choices(mode=[app_commands.Choice(name=name, value=name) for name in NARRATIVE_MODES])
+    @app_commands.check(lambda interaction: interaction.user.guild_permissions.administrator)
+    async def narrative(interaction: discord.Interaction, mode: app_commands.Choice[str]):
+        bot.encounters.modes.set(interaction.guild_id, mode.value)
+        await interaction.response.send_message(f"📝 Robbery stories will now use **{mode.value}** mode.", ephemeral=True)
 
-        except Exception as e:
-            logger.error(f"Error in plock command: {str(e)}")
-            await interaction.followup.send("❌ An unexpected error occurred while trying to rob the target.")
+    @bot.tree.command(name="debuglog", description="Toggle full robbery logging for a member or this server (Admin only)")
+    @app_commands.describe(member="Member to log in full (leave empty for the whole server)")
+    @app_commands.check(lambda interaction: interaction.user.guild_permissions.administrator)
+    async def debuglog(interaction: discord.Interaction, member: discord.Member = None):
+        overrides = log_sampling.POLICY.overrides
+        if member is not None:
+            enabled = overrides.toggle(overrides.users, member.id)
+            subject = member.display_name
+        else:
+            enabled = overrides.toggle(overrides.guilds, interaction.guild_id)
+            subject = "this server"
+        logger.info(f"Debug logging {'enabled' if enabled else 'disabled'} for {subject} by {interaction.user}")
+        await interaction.response.send_message(
+            f"🔍 Full robbery logging is now **{'on' if enabled else 'off'}** for {subject}.", ephemeral=True
+        )
 
     @bot.tree.command(name="geturl", description="Get the bot's Replit URL for uptime monitoring (Admin only)")
     @app_commands.check(lambda interaction: interaction.user.guild_permissions.administrator)
     async def geturl(interaction: discord.Interaction):
-        try:
-            # Check if user is an administrator
-            if not interaction.user.guild_permissions.administrator:
-                await interaction.response.send_message("❌ You need administrator permissions to use this command!", ephemeral=True)
-                return
-
-            repl_slug = os.getenv('REPL_SLUG', 'unknown')
-            repl_owner = os.getenv('REPL_OWNER', 'unknown')
-
-            if repl_slug != 'unknown' and repl_owner != 'unknown':
-                # For Replit deployments
-                deployment_url = f"https://{repl_slug}-{repl_owner}.replit.app"
-                
-                await interaction.response.send_message(
-                    f"🔗 **Bot URL for UptimeRobot:**\n"
-                    f"Use this URL: {deployment_url}\n\n"
-                    f"**Setup Instructions:**\n"
-                    f"1. Make sure you've deployed your bot using Replit's Deployment feature\n"
-                    f"2. Go to UptimeRobot.com and create an account if you don't have one\n"
-                    f"3. Add a new monitor (HTTP(s) type)\n"
-                    f"4. Paste this URL: {deployment_url}\n"
-                    f"5. Set monitoring interval to 5 minutes\n"
-                    f"6. Save and your bot will stay online 24/7",
-                    ephemeral=True
-                )
-            else:
-                await interaction.response.send_message(
-                    "❌ Could not determine the Replit URL. Make sure this is running on Replit.",
-                    ephemeral=True
-                )
+        async with bot.metrics.track("geturl", interaction) as tracked:
+            await send_uptime_url(tracked.interaction)
 
-        except Exception as e:
-            logger.error(f"Error in geturl command: {str(e)}")
+    @bot.tree.command(name="stats", description="Show command latency and outcome statistics (Admin only)")
+    @app_commands.check(lambda interaction: interaction.user.guild_permissions.administrator)
+    async def stats(interaction: discord.Interaction):
+        summary = bot.metrics.summary()
+        if bot.loop_monitor:
+            monitor = bot.loop_monitor
+            summary += (f"\n**Event loop** lag p99 {monitor.percentile(99) * 1000:.0f}ms, "
+                        f"max {monitor.max_lag * 1000:.0f}ms, {monitor.stalls} stall(s)")
+        if len(summary) > 1900:
+            summary = summary[:1900] + "\n…"
+        await interaction.response.send_message(f"📊 **Command stats**\n{summary}", ephemeral=True)
+
+async def send_uptime_url(interaction):
+    """Reply with the deployment URL to give UptimeRobot"""
+    try:
+        # Check if user is an administrator
+        if not interaction.user.guild_permissions.administrator:
+            await interaction.response.send_message("❌ You need administrator permissions to use this command!", ephemeral=True)
+            return
+
+        repl_slug = os.getenv('REPL_SLUG', 'unknown')
+        repl_owner = os.getenv('REPL_OWNER', 'unknown')
+
+        if repl_slug != 'unknown' and repl_owner != 'unknown':
+            # For Replit deployments
+            deployment_url = f"https://{repl_slug}-{repl_owner}.replit.app"
+            
             await interaction.response.send_message(
-                "❌ An error occurred while getting the URL.",
+                f"🔗 **Bot URL for UptimeRobot:**\n"
+                f"Use this URL: {deployment_url}\n\n"
+                f"**Setup Instructions:**\n"
+                f"1. Make sure you've deployed your bot using Replit's Deployment feature\n"
+                f"2. Go to UptimeRobot.com and create an account if you don't have one\n"
+                f"3. Add a new monitor (HTTP(s) type)\n"
+                f"4. Paste this URL: {deployment_url}\n"
+                f"5. Set monitoring interval to 5 minutes\n"
+                f"6. Save and your bot will stay online 24/7",
                 ephemeral=True
             )
+        else:
+            await interaction.response.send_message(
+                "❌ Could not determine the Replit URL. Make sure this is running on Replit.",
+                ephemeral=True
+            )
+
+    except Exception as e:
+        logger.error(f"Error in geturl command: {str(e)}")
+        await interaction.response.send_message(
+            "❌ An error occurred while getting the URL.",
+            ephemeral=True
+        )
+
+async def main():
+    bot = create_bot()
+    register_commands(bot)
 
     try:
         async with bot:
@@ -516,10 +469,6 @@ async def main():
         logger.error(f"Failed to start bot: {str(e)}")
 
 if __name__ == "__main__":
-    # Start Python HTTP server for UptimeRobot in a background thread
-    start_server()
-    logger.info("Started Python HTTP server for UptimeRobot")
-    
-    # Run the Discord bot
+    # The health server for UptimeRobot starts with the bot, on its event loop
     logger.info("Starting Discord bot")
     asyncio.run(main())
\ No newline at end of file
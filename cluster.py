@@ -0,0 +1,311 @@
+"""
+Multi-process launcher for sharded deployments
+
+Splits the shard range into contiguous blocks, runs each block in its own
+worker process as a ShardedAutomationBot, restarts workers that exit with
+exponential backoff, and aggregates the health reports they send back.
+
+    python cluster.py
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+import time
+from typing import Dict, List, Optional, Tuple
+
+import aiohttp
+
+from config import load_config
+from health_server import HealthServer, latency_ms
+from metrics import PrometheusWriter
+from utils import setup_logging
+
+logger = logging.getLogger('BotAutomation.Cluster')
+
+GATEWAY_URL = "https://discord.com/api/v10/gateway/bot"
+# Discord allows max_concurrency IDENTIFYs per 5 seconds
+IDENTIFY_INTERVAL = 5.0
+# A worker that stays up this long has its restart backoff reset
+STABLE_AFTER = 60.0
+
+
+async def fetch_gateway(token: str) -> dict:
+    """Ask Discord for the recommended shard count and identify concurrency"""
+    async with aiohttp.ClientSession() as session:
+        async with session.get(GATEWAY_URL, headers={'Authorization': f"Bot {token}"}) as response:
+            response.raise_for_status()
+            return await response.json()
+
+
+def split_shards(shard_ids: List[int], workers: int) -> List[List[int]]:
+    """Split shard IDs into at most `workers` contiguous, evenly sized blocks"""
+    workers = max(1, min(workers, len(shard_ids)))
+    size, extra = divmod(len(shard_ids), workers)
+    blocks, start = [], 0
+    for i in range(workers):
+        end = start + size + (1 if i < extra else 0)
+        blocks.append(shard_ids[start:end])
+        start = end
+    return blocks
+
+
+async def report_health(bot, cluster_id: int, health_queue, interval: float):
+    """Periodically send this worker's status to the launcher"""
+    while True:
+        try:
+            health_queue.put_nowait({
+                'cluster': cluster_id,
+                'ready': bot.is_ready(),
+                'shards': {shard_id: latency_ms(latency) for shard_id, latency in bot.latencies},
+                'guilds': len(bot.guilds),
+                'circuit': bot.unbelievaboat.circuit.state,
+                'time': time.time(),
+            })
+        except Exception as e:
+            logger.warning(f"Cluster {cluster_id} failed to report health: {str(e)}")
+        await asyncio.sleep(interval)
+
+
+async def run_worker(cluster_id: int, shard_ids: List[int], shard_count: int, health_queue, interval: float):
+    from bot_automation import create_bot, register_commands
+
+    bot = create_bot(shard_ids=shard_ids, shard_count=shard_count)
+    register_commands(bot)
+    async with bot:
+        reporter = asyncio.create_task(report_health(bot, cluster_id, health_queue, interval))
+        try:
+            await bot.start(bot.config['TOKEN'])
+        finally:
+            reporter.cancel()
+
+
+def worker_main(cluster_id: int, shard_ids: List[int], shard_count: int, health_queue, interval: float):
+    """Entry point of a worker process"""
+    # Only the first cluster syncs commands, and each cluster journals its own
+    # settlements so replays never race across processes
+    if cluster_id != 0:
+        os.environ['COMMAND_SYNC_ENABLED'] = 'false'
+    config = load_config()
+    if config['JOURNAL_PATH']:
+        os.environ['JOURNAL_PATH'] = f"{config['JOURNAL_PATH']}.cluster{cluster_id}"
+    # Each worker rotates its own log file
+    log_file = os.getenv('LOG_FILE', 'bot_automation.log')
+    if log_file:
+        root, ext = os.path.splitext(log_file)
+        os.environ['LOG_FILE'] = f"{root}-cluster{cluster_id}{ext}"
+    # The launcher owns HEALTH_PORT; each worker serves its own metrics on the ports after it
+    if config['HEALTH_PORT']:
+        os.environ['HEALTH_PORT'] = str(config['HEALTH_PORT'] + 1 + cluster_id)
+    try:
+        asyncio.run(run_worker(cluster_id, shard_ids, shard_count, health_queue, interval))
+    except KeyboardInterrupt:
+        pass
+
+
+class Worker:
+    """Launcher-side handle on one worker process"""
+
+    def __init__(self, cluster_id: int, shard_ids: List[int]):
+        self.cluster_id = cluster_id
+        self.shard_ids = shard_ids
+        self.process: Optional[multiprocessing.Process] = None
+        self.started_at = 0.0
+        self.restarts = 0
+        self.failures = 0
+        self.restart_at: Optional[float] = None
+        self.health: dict = {}
+
+
+class ClusterLauncher:
+    """
+    Runs the shard blocks in worker processes and keeps them running
+
+    Args:
+        shard_count: Total shards across every worker
+        shard_ids: Shards to run (defaults to all of them)
+        workers: Worker processes to spread the shards over
+        max_concurrency: Identify concurrency from Discord, used to stagger startup
+        health_interval: Seconds between worker health reports
+        restart_delay: Initial restart backoff in seconds
+        max_restart_delay: Restart backoff cap in seconds
+    """
+
+    def __init__(self, shard_count: int, shard_ids: Optional[List[int]] = None, workers: int = 1,
+                 max_concurrency: int = 1, health_interval: float = 10.0,
+                 restart_delay: float = 5.0, max_restart_delay: float = 300.0):
+        self.shard_count = shard_count
+        self.max_concurrency = max(1, max_concurrency)
+        self.health_interval = health_interval
+        self.restart_delay = restart_delay
+        self.max_restart_delay = max_restart_delay
+        self.context = multiprocessing.get_context('spawn')
+        self.health_queue = self.context.Queue()
+        blocks = split_shards(shard_ids or list(range(shard_count)), workers)
+        self.workers = [Worker(i, block) for i, block in enumerate(blocks)]
+        self._stopping = False
+
+    def _spawn(self, worker: Worker):
+        worker.process = self.context.Process(
+            target=worker_main,
+            args=(worker.cluster_id, worker.shard_ids, self.shard_count, self.health_queue, self.health_interval),
+            name=f"cluster-{worker.cluster_id}",
+            daemon=False
+        )
+        worker.process.start()
+        worker.started_at = time.monotonic()
+        worker.restart_at = None
+        worker.health = {}
+        logger.info(f"Started cluster {worker.cluster_id} (pid {worker.process.pid}) with shards "
+                    f"{worker.shard_ids[0]}-{worker.shard_ids[-1]}")
+
+    async def start(self):
+        for worker in self.workers:
+            self._spawn(worker)
+            # Let this block identify before the next one starts
+            if worker is not self.workers[-1]:
+                await asyncio.sleep(IDENTIFY_INTERVAL * len(worker.shard_ids) / self.max_concurrency)
+
+    def _check(self, now: float):
+        for worker in self.workers:
+            process = worker.process
+            if process is None or process.is_alive():
+                if process is not None and worker.failures and now - worker.started_at > STABLE_AFTER:
+                    worker.failures = 0
+                continue
+            if worker.restart_at is None:
+                delay = min(self.max_restart_delay, self.restart_delay * 2 ** worker.failures)
+                worker.failures += 1
+                worker.restart_at = now + delay
+                logger.error(f"Cluster {worker.cluster_id} exited with code {process.exitcode}, "
+                             f"restarting in {delay:.0f}s")
+            elif now >= worker.restart_at:
+                worker.restarts += 1
+                self._spawn(worker)
+
+    def _drain_health(self):
+        while True:
+            try:
+                report = self.health_queue.get_nowait()
+            except queue.Empty:
+                return
+            self.workers[report['cluster']].health = report
+
+    def health(self) -> Dict:
+        """Aggregated status of every worker"""
+        now = time.time()
+        clusters = []
+        for worker in self.workers:
+            report = worker.health
+            alive = worker.process is not None and worker.process.is_alive()
+            fresh = bool(report) and now - report['time'] < self.health_interval * 3
+            clusters.append({
+                'cluster': worker.cluster_id,
+                'shards': worker.shard_ids,
+                'alive': alive,
+                'ready': alive and fresh and report['ready'],
+                'guilds': report.get('guilds', 0),
+                'latency_ms': report.get('shards', {}),
+                'circuit': report.get('circuit'),
+                'restarts': worker.restarts,
+            })
+        return {
+            'ready': all(cluster['ready'] for cluster in clusters),
+            'guilds': sum(cluster['guilds'] for cluster in clusters),
+            'clusters': clusters,
+        }
+
+    def readiness(self) -> Tuple[bool, Dict]:
+        status = self.health()
+        return status['ready'], status
+
+    def write_metrics(self, writer: PrometheusWriter):
+        status = self.health()
+        writer.metric('cluster_ready', 'gauge', "1 if every cluster worker is ready.", int(status['ready']))
+        writer.metric('bot_guilds', 'gauge', "Guilds across every cluster worker.", status['guilds'])
+        for name, help_text, key in (
+            ('cluster_worker_up', "1 if the worker process is alive.", 'alive'),
+            ('cluster_worker_ready', "1 if the worker reported ready recently.", 'ready'),
+            ('cluster_worker_restarts_total', "Times the worker process was restarted.", 'restarts'),
+        ):
+            writer.family(name, 'counter' if name.endswith('_total') else 'gauge', help_text)
+            for cluster in status['clusters']:
+                writer.sample(name, int(cluster[key]), {'cluster': cluster['cluster']})
+        writer.family('bot_gateway_latency_seconds', 'gauge', "Gateway heartbeat latency per shard.")
+        for cluster in status['clusters']:
+            for shard_id, latency in cluster['latency_ms'].items():
+                if latency is not None:
+                    writer.sample('bot_gateway_latency_seconds', latency / 1000,
+                                  {'cluster': cluster['cluster'], 'shard': shard_id})
+
+    async def run(self, health_server: Optional[HealthServer] = None):
+        """Start the workers and supervise them until SIGINT/SIGTERM"""
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sig, self.stop)
+        if health_server:
+            await health_server.start()
+        await self.start()
+        next_summary = time.monotonic() + self.health_interval
+        while not self._stopping:
+            now = time.monotonic()
+            self._drain_health()
+            self._check(now)
+            if now >= next_summary:
+                next_summary = now + self.health_interval
+                status = self.health()
+                ready = sum(cluster['ready'] for cluster in status['clusters'])
+                logger.info(f"Cluster health: {ready}/{len(self.workers)} ready, {status['guilds']} guild(s)")
+            await asyncio.sleep(1.0)
+        if health_server:
+            await health_server.stop()
+        await asyncio.to_thread(self._shutdown)
+
+    def stop(self):
+        self._stopping = True
+
+    def _shutdown(self, timeout: float = 30.0):
+        logger.info("Stopping cluster workers...")
+        for worker in self.workers:
+            if worker.process is not None and worker.process.is_alive():
+                worker.process.terminate()
+        for worker in self.workers:
+            if worker.process is not None:
+                worker.process.join(timeout)
+                if worker.process.is_alive():
+                    worker.process.kill()
+
+
+async def main():
+    setup_logging()
+    config = load_config()
+    shard_count = config['SHARD_COUNT']
+    max_concurrency = 1
+    if not shard_count:
+        gateway = await fetch_gateway(config['TOKEN'])
+        shard_count = gateway['shards']
+        max_concurrency = gateway.get('session_start_limit', {}).get('max_concurrency', 1)
+        logger.info(f"Discord recommends {shard_count} shard(s)")
+    launcher = ClusterLauncher(
+        shard_count,
+        shard_ids=config['SHARD_IDS'],
+        workers=config['CLUSTER_WORKERS'] or os.cpu_count() or 1,
+        max_concurrency=max_concurrency,
+        health_interval=config['CLUSTER_HEALTH_INTERVAL'],
+        restart_delay=config['CLUSTER_RESTART_DELAY'],
+        max_restart_delay=config['CLUSTER_MAX_RESTART_DELAY']
+    )
+    # The launcher serves the aggregated health on HEALTH_PORT for the whole cluster
+    health_server = HealthServer(
+        launcher.readiness,
+        launcher.write_metrics,
+        host=config['HEALTH_HOST'],
+        port=config['HEALTH_PORT']
+    ) if config['HEALTH_PORT'] else None
+    await launcher.run(health_server)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
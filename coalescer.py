@@ -0,0 +1,98 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from log_sampling import HotLogger
+
+logger = logging.getLogger('BotAutomation.Coalescer')
+hot_logger = HotLogger('BotAutomation.Coalescer')
+
+SendFunc = Callable[[str, str, int], Awaitable[Optional[Dict[str, Any]]]]
+
+
+class _PendingDelta:
+    __slots__ = ('delta', 'count', 'future')
+
+    def __init__(self, future: asyncio.Future):
+        self.delta = 0
+        self.count = 0
+        self.future = future
+
+
+class BalanceCoalescer:
+    """
+    Merges cash deltas for the same (guild_id, user_id) into a single PATCH
+
+    A delta for a user with no request in flight is sent straight away, so
+    coalescing never delays anything. Deltas that arrive while a request for
+    that user is in flight are summed into the next one, sent as soon as the
+    current request finishes, and its balance is handed back to all of them.
+    """
+
+    def __init__(self, send: SendFunc, enabled: bool = True):
+        self._send = send
+        self.enabled = enabled
+        self._running: Dict[Tuple[str, str], asyncio.Task] = {}
+        self._queued: Dict[Tuple[str, str], _PendingDelta] = {}
+
+    async def submit(self, guild_id: str, user_id: str, delta: int) -> Optional[Dict[str, Any]]:
+        """
+        Send a cash delta, merged with others for the same user if one is in flight
+
+        Args:
+            guild_id (str): Discord guild ID
+            user_id (str): Discord user ID
+            delta (int): Signed change to the cash balance
+
+        Returns:
+            Optional[Dict[str, Any]]: API response data for the merged request or None if failed
+        """
+        if not self.enabled:
+            return await self._send(guild_id, user_id, delta)
+
+        key = (guild_id, user_id)
+        pending = self._queued.get(key)
+        if pending is None:
+            pending = _PendingDelta(asyncio.get_running_loop().create_future())
+            if key in self._running:
+                self._queued[key] = pending
+            else:
+                task = asyncio.create_task(self._flush(key, pending))
+                self._running[key] = task
+
+        pending.delta += delta
+        pending.count += 1
+
+        # Shield so one caller giving up doesn't cancel the result for the others
+        return await asyncio.shield(pending.future)
+
+    async def _flush(self, key: Tuple[str, str], pending: Optional[_PendingDelta]):
+        guild_id, user_id = key
+        try:
+            while pending is not None:
+                if pending.count > 1:
+                    hot_logger.info('coalesce', "Coalesced %d balance updates for user %s into one request (%+d)",
+                                    pending.count, user_id, pending.delta, rate=0.1, guild_id=guild_id, user_id=user_id)
+                try:
+                    result = await self._send(guild_id, user_id, pending.delta)
+                except Exception as e:
+                    if not pending.future.done():
+                        pending.future.set_exception(e)
+                else:
+                    if not pending.future.done():
+                        pending.future.set_result(result)
+                # Whatever queued up while that request was in flight goes next
+                pending = self._queued.pop(key, None)
+        finally:
+            # Drop the key in the same step that found nothing queued, so no delta is stranded
+            self._running.pop(key, None)
+            # Anything still pending here means the task was cancelled
+            for leftover in (pending, self._queued.pop(key, None)):
+                if leftover is not None and not leftover.future.done():
+                    leftover.future.cancel()
+
+    async def drain(self):
+        """Wait for every in-flight and queued delta to be sent"""
+        tasks = list(self._running.values())
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,161 @@
+import time
+import logging
+from typing import List, Optional
+
+from metrics import Counter, Histogram, PrometheusWriter
+
+logger = logging.getLogger('BotAutomation.CommandMetrics')
+
+
+class BotMetrics:
+    """
+    In-process latency and outcome metrics for the app commands
+
+    Everything is aggregated into fixed-bucket histograms and counters as it
+    happens, and is read back by the /metrics exporter and the /stats command.
+    """
+
+    def __init__(self):
+        self.first_response = Histogram(
+            'command_first_response_seconds',
+            "Time from handler start to the interaction's first response (Discord allows 3s).",
+            ('command',)
+        )
+        self.duration = Histogram('command_duration_seconds', "Total command handler time.", ('command',))
+        self.outcomes = Counter('commands_total', "Commands handled, by outcome.", ('command', 'outcome'))
+        self.economy = Histogram(
+            'unbelievaboat_request_seconds',
+            "UnbelievaBoat HTTP attempts, by method and status ('error' when no response arrived).",
+            ('method', 'status')
+        )
+        self.discord = Histogram('discord_request_seconds', "Discord interaction REST calls.", ('call',))
+
+    def track(self, command: str, interaction) -> 'CommandTracker':
+        """Time a command; use as `async with metrics.track(name, interaction) as tracked`"""
+        return CommandTracker(self, command, interaction)
+
+    def observe_economy(self, method: str, status: Optional[int], seconds: float):
+        self.economy.observe(seconds, method, str(status) if status is not None else 'error')
+
+    def write(self, writer: PrometheusWriter):
+        for metric in (self.first_response, self.duration, self.outcomes, self.economy, self.discord):
+            metric.write(writer)
+
+    def summary(self) -> str:
+        """Human-readable digest for the /stats command"""
+        lines: List[str] = []
+        for (command,) in sorted(self.duration.series()):
+            outcomes = ", ".join(
+                f"{outcome} {int(count)}" for (name, outcome), count in sorted(self.outcomes.items()) if name == command
+            )
+            lines.append(
+                f"**/{command}** {self.duration.count(command)} run(s) · first response "
+                f"{_quantiles(self.first_response, command)} · total {_quantiles(self.duration, command)}\n"
+                f"  {outcomes}"
+            )
+        economy = sorted(self.economy.series())
+        if economy:
+            lines.append("**UnbelievaBoat**")
+            for method, status in economy:
+                lines.append(f"  {method} {status}: {self.economy.count(method, status)} call(s) · "
+                             f"{_quantiles(self.economy, method, status)}")
+        discord = sorted(self.discord.series())
+        if discord:
+            lines.append("**Discord**")
+            for (call,) in discord:
+                lines.append(f"  {call}: {self.discord.count(call)} call(s) · {_quantiles(self.discord, call)}")
+        return "\n".join(lines) or "No commands recorded yet."
+
+
+def _quantiles(histogram: Histogram, *label_values) -> str:
+    p50 = histogram.quantile(0.5, *label_values)
+    p95 = histogram.quantile(0.95, *label_values)
+    if p50 is None:
+        return "n/a"
+    return f"p50 {p50 * 1000:.0f}ms p95 {p95 * 1000:.0f}ms"
+
+
+class CommandTracker:
+    """Records one command's first-response time, total time and outcome"""
+
+    def __init__(self, metrics: BotMetrics, command: str, interaction):
+        self.metrics = metrics
+        self.command = command
+        self.outcome = "ok"
+        self.started = time.perf_counter()
+        self.responded_at: Optional[float] = None
+        self.interaction = TrackedInteraction(interaction, self)
+
+    def responded(self):
+        if self.responded_at is None:
+            self.responded_at = time.perf_counter()
+            self.metrics.first_response.observe(self.responded_at - self.started, self.command)
+
+    async def timed(self, call: str, coro):
+        started = time.perf_counter()
+        try:
+            return await coro
+        finally:
+            self.metrics.discord.observe(time.perf_counter() - started, call)
+
+    async def __aenter__(self) -> 'CommandTracker':
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.outcome = "error"
+        self.metrics.duration.observe(time.perf_counter() - self.started, self.command)
+        self.metrics.outcomes.inc(self.command, self.outcome or "ok")
+        return False
+
+
+class TrackedInteraction:
+    """Stands in for a discord.Interaction, timing the REST calls made through it"""
+
+    def __init__(self, interaction, tracker: CommandTracker):
+        self._interaction = interaction
+        self._tracker = tracker
+        self.response = _TrackedResponse(interaction.response, tracker)
+        self.followup = _TrackedFollowup(interaction.followup, tracker)
+
+    async def edit_original_response(self, **kwargs):
+        return await self._tracker.timed('edit_original_response', self._interaction.edit_original_response(**kwargs))
+
+    async def original_response(self):
+        return await self._tracker.timed('original_response', self._interaction.original_response())
+
+    def __getattr__(self, name):
+        return getattr(self._interaction, name)
+
+
+class _TrackedResponse:
+    def __init__(self, response, tracker: CommandTracker):
+        self._response = response
+        self._tracker = tracker
+
+    async def send_message(self, *args, **kwargs):
+        try:
+            return await self._tracker.timed('response.send_message', self._response.send_message(*args, **kwargs))
+        finally:
+            self._tracker.responded()
+
+    async def defer(self, *args, **kwargs):
+        try:
+            return await self._tracker.timed('response.defer', self._response.defer(*args, **kwargs))
+        finally:
+            self._tracker.responded()
+
+    def __getattr__(self, name):
+        return getattr(self._response, name)
+
+
+class _TrackedFollowup:
+    def __init__(self, followup, tracker: CommandTracker):
+        self._followup = followup
+        self._tracker = tracker
+
+    async def send(self, *args, **kwargs):
+        return await self._tracker.timed('followup.send', self._followup.send(*args, **kwargs))
+
+    def __getattr__(self, name):
+        return getattr(self._followup, name)
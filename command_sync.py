@@ -0,0 +1,95 @@
+import os
+import json
+import time
+import hashlib
+import logging
+from typing import Dict, Iterable, Optional
+
+import discord
+
+logger = logging.getLogger('BotAutomation.CommandSync')
+
+
+def command_signature(tree, guild: Optional[discord.abc.Snowflake] = None) -> str:
+    """
+    Stable hash of the app command payloads Discord would receive for a sync
+
+    Args:
+        tree: The bot's command tree
+        guild: Hash the guild's commands instead of the global ones
+
+    Returns:
+        str: Hex SHA-256 of the sorted command payloads
+    """
+    payload = [command.to_dict(tree) for command in tree.get_commands(guild=guild)]
+    payload.sort(key=lambda command: (command.get('type', 1), command['name']))
+    encoded = json.dumps(payload, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+class CommandSyncState:
+    """Last synced command signature per scope, kept in a small JSON file"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._signatures: Dict[str, str] = self._load()
+
+    def _load(self) -> Dict[str, str]:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable command sync state {self.path}: {str(e)}")
+            return {}
+
+    def get(self, scope: str) -> Optional[str]:
+        return self._signatures.get(scope)
+
+    def set(self, scope: str, signature: str):
+        self._signatures[scope] = signature
+        tmp_path = f"{self.path}.tmp"
+        # Write then rename so a crash mid-write can't leave a truncated file
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._signatures, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+
+async def sync_commands(tree, application_id: int, state_path: str,
+                        guild_ids: Iterable[int] = (), force: bool = False) -> int:
+    """
+    Sync the command tree only where its signature changed since the last sync
+
+    With guild_ids the global commands are copied to those (development) guilds
+    and synced there, which applies instantly; otherwise they are synced globally.
+
+    Args:
+        tree: The bot's command tree
+        application_id: Application the state is recorded for
+        state_path: JSON file holding the last synced signatures
+        guild_ids: Development guilds to sync to instead of globally
+        force: Sync even if the signature is unchanged
+
+    Returns:
+        int: Number of sync requests made
+    """
+    state = CommandSyncState(state_path)
+    guilds = [discord.Object(id=guild_id) for guild_id in guild_ids]
+    for guild in guilds:
+        tree.copy_global_to(guild=guild)
+
+    synced = 0
+    for guild in guilds or [None]:
+        scope = f"{application_id}:{'global' if guild is None else guild.id}"
+        signature = command_signature(tree, guild=guild)
+        if not force and state.get(scope) == signature:
+            logger.info(f"Commands unchanged for {scope}, skipping sync")
+            continue
+
+        started = time.perf_counter()
+        commands = await tree.sync(guild=guild)
+        state.set(scope, signature)
+        synced += 1
+        logger.info(f"Synced {len(commands)} command(s) for {scope} in {time.perf_counter() - started:.2f}s")
+    return synced
@@ -1,6 +1,14 @@
 import os
 from dotenv import load_dotenv
 
+def parse_shard_ids(value):
+    """Parse shard IDs like '0-3' or '0,2,5' (ranges are inclusive); empty means all"""
+    shard_ids = []
+    for part in filter(None, (p.strip() for p in (value or '').split(','))):
+        start, _, end = part.partition('-')
+        shard_ids.extend(range(int(start), int(end or start) + 1))
+    return shard_ids or None
+
 def load_config():
     """Load configuration from environment variables"""
     load_dotenv()
@@ -11,6 +19,61 @@ def load_config():
         'COMMAND_TIMEOUT': int(os.getenv('COMMAND_TIMEOUT', '30')),
         'DEFAULT_DELAY': float(os.getenv('DEFAULT_DELAY', '2.0')),
         'LOG_LEVEL': os.getenv('LOG_LEVEL', 'INFO'),
+        'LOG_SAMPLE_RATES': os.getenv('LOG_SAMPLE_RATES', ''),
+        'LOG_SITE_MAX_PER_SECOND': int(os.getenv('LOG_SITE_MAX_PER_SECOND', '0')),
+        'LOG_DEBUG_GUILDS': os.getenv('LOG_DEBUG_GUILDS', ''),
+        'LOG_DEBUG_USERS': os.getenv('LOG_DEBUG_USERS', ''),
+        'UNBELIEVABOAT_API_URL': os.getenv('UNBELIEVABOAT_API_URL'),
+        'API_POOL_SIZE': int(os.getenv('API_POOL_SIZE', '20')),
+        'API_POOL_WARMUP': int(os.getenv('API_POOL_WARMUP', '2')),
+        'API_TIMEOUT': float(os.getenv('API_TIMEOUT', '10.0')),
+        'API_RATE_LIMIT': float(os.getenv('API_RATE_LIMIT', '0')),
+        'API_RATE_BURST': int(os.getenv('API_RATE_BURST', '10')),
+        'API_QUEUE_SIZE': int(os.getenv('API_QUEUE_SIZE', '100')),
+        'API_REQUEST_DEADLINE': float(os.getenv('API_REQUEST_DEADLINE', '15.0')),
+        'API_COALESCE': os.getenv('API_COALESCE', 'true').lower() == 'true',
+        'API_RETRY_ATTEMPTS': int(os.getenv('API_RETRY_ATTEMPTS', '3')),
+        'API_RETRY_BASE_DELAY': float(os.getenv('API_RETRY_BASE_DELAY', '0.25')),
+        'API_RETRY_MAX_DELAY': float(os.getenv('API_RETRY_MAX_DELAY', '4.0')),
+        'CIRCUIT_FAILURE_THRESHOLD': float(os.getenv('CIRCUIT_FAILURE_THRESHOLD', '0.5')),
+        'CIRCUIT_MIN_CALLS': int(os.getenv('CIRCUIT_MIN_CALLS', '10')),
+        'CIRCUIT_WINDOW': float(os.getenv('CIRCUIT_WINDOW', '30.0')),
+        'CIRCUIT_RESET_TIMEOUT': float(os.getenv('CIRCUIT_RESET_TIMEOUT', '30.0')),
+        'BALANCE_CACHE_TTL': float(os.getenv('BALANCE_CACHE_TTL', '30.0')),
+        'BALANCE_CACHE_SIZE': int(os.getenv('BALANCE_CACHE_SIZE', '10000')),
+        'SETTLEMENT_RETRY_ATTEMPTS': int(os.getenv('SETTLEMENT_RETRY_ATTEMPTS', '3')),
+        'SETTLEMENT_RETRY_DELAY': float(os.getenv('SETTLEMENT_RETRY_DELAY', '5.0')),
+        'ENCOUNTER_DEADLINE': float(os.getenv('ENCOUNTER_DEADLINE', '15.0')),
+        'COMMAND_COOLDOWN_LIMIT': int(os.getenv('COMMAND_COOLDOWN_LIMIT', '3')),
+        'COMMAND_COOLDOWN_WINDOW': float(os.getenv('COMMAND_COOLDOWN_WINDOW', '60.0')),
+        'GUILD_COMMAND_LIMIT': int(os.getenv('GUILD_COMMAND_LIMIT', '0')),
+        'GUILD_COMMAND_WINDOW': float(os.getenv('GUILD_COMMAND_WINDOW', '60.0')),
+        'MEMBER_LOCK_TIMEOUT': float(os.getenv('MEMBER_LOCK_TIMEOUT', '2.0')),
+        'NARRATIVE_MODE': os.getenv('NARRATIVE_MODE', 'followup'),
+        'NARRATIVE_GUILD_MODES': os.getenv('NARRATIVE_GUILD_MODES', ''),
+        'NARRATIVE_LINES_PER_EDIT': int(os.getenv('NARRATIVE_LINES_PER_EDIT', '2')),
+        'JOURNAL_PATH': os.getenv('JOURNAL_PATH', 'settlements.db'),
+        'JOURNAL_BATCH_INTERVAL': float(os.getenv('JOURNAL_BATCH_INTERVAL', '0.01')),
+        'COMMAND_SYNC_ENABLED': os.getenv('COMMAND_SYNC_ENABLED', 'true').lower() == 'true',
+        'COMMAND_SYNC_STATE': os.getenv('COMMAND_SYNC_STATE', '.command_sync.json'),
+        'COMMAND_SYNC_GUILDS': [int(g) for g in os.getenv('COMMAND_SYNC_GUILDS', '').split(',') if g.strip()],
+        'COMMAND_SYNC_FORCE': os.getenv('COMMAND_SYNC_FORCE', 'false').lower() == 'true',
+        'MESSAGE_CONTENT_INTENT': os.getenv('MESSAGE_CONTENT_INTENT', 'true').lower() == 'true',
+        'CHUNK_GUILDS_AT_STARTUP': os.getenv('CHUNK_GUILDS_AT_STARTUP', 'true').lower() == 'true',
+        'CHUNK_WAIT': float(os.getenv('CHUNK_WAIT', '1.0')),
+        'MEMBER_CACHE': os.getenv('MEMBER_CACHE', 'all'),
+        'HEALTH_HOST': os.getenv('HEALTH_HOST', '0.0.0.0'),
+        'HEALTH_PORT': int(os.getenv('HEALTH_PORT', '8080')),
+        'LOOP_LAG_INTERVAL': float(os.getenv('LOOP_LAG_INTERVAL', '0.5')),
+        'LOOP_LAG_THRESHOLD': float(os.getenv('LOOP_LAG_THRESHOLD', '0.25')),
+        'LOOP_LAG_WINDOW': float(os.getenv('LOOP_LAG_WINDOW', '60.0')),
+        'SHARDING_ENABLED': os.getenv('SHARDING_ENABLED', 'false').lower() == 'true',
+        'SHARD_COUNT': int(os.getenv('SHARD_COUNT', '0')),
+        'SHARD_IDS': parse_shard_ids(os.getenv('SHARD_IDS', '')),
+        'CLUSTER_WORKERS': int(os.getenv('CLUSTER_WORKERS', '0')),
+        'CLUSTER_HEALTH_INTERVAL': float(os.getenv('CLUSTER_HEALTH_INTERVAL', '10.0')),
+        'CLUSTER_RESTART_DELAY': float(os.getenv('CLUSTER_RESTART_DELAY', '5.0')),
+        'CLUSTER_MAX_RESTART_DELAY': float(os.getenv('CLUSTER_MAX_RESTART_DELAY', '300.0')),
     }
 
     # Validate required configuration
@@ -0,0 +1,152 @@
+import math
+import time
+import logging
+from typing import Callable, Dict, Hashable, List, Optional
+
+logger = logging.getLogger('BotAutomation.Cooldowns')
+
+
+class _Window:
+    """Hit counts for the current and previous fixed window of one key"""
+    __slots__ = ('index', 'previous', 'current')
+
+    def __init__(self, index: int):
+        self.index = index
+        self.previous = 0
+        self.current = 0
+
+
+class SlidingWindowLimiter:
+    """
+    Approximate sliding-window rate limiter
+
+    Each key stores two counters (this window and the last), and the sliding
+    count is the current hits plus the previous window's hits weighted by how
+    much of it still overlaps. Keys are spread over shards, and every
+    `sweep_every` hits one shard is swept for keys idle for two windows, so
+    memory follows the active users and no single sweep walks every key.
+    """
+
+    def __init__(self, limit: int, window: float, shards: int = 64, sweep_every: int = 256,
+                 clock: Callable[[], float] = time.monotonic):
+        self.limit = limit
+        self.window = window
+        self.clock = clock
+        self.sweep_every = sweep_every
+        self._shards: List[Dict[Hashable, _Window]] = [{} for _ in range(shards)]
+        self._hits = 0
+        self._next_sweep = 0
+
+    def _state(self, key, now: float, create: bool) -> Optional[_Window]:
+        shard = self._shards[hash(key) % len(self._shards)]
+        index = int(now // self.window)
+        state = shard.get(key)
+        if state is None:
+            if not create:
+                return None
+            state = shard[key] = _Window(index)
+        elif state.index != index:
+            # Roll forward; anything older than the previous window no longer counts
+            state.previous = state.current if state.index == index - 1 else 0
+            state.current = 0
+            state.index = index
+        return state
+
+    def retry_after(self, key, now: Optional[float] = None) -> float:
+        """Seconds until `key` may hit again without counting this call, 0 if it may now"""
+        now = self.clock() if now is None else now
+        state = self._state(key, now, create=False)
+        if state is None:
+            return 0.0
+        elapsed = now / self.window - state.index
+        if state.previous * (1 - elapsed) + state.current + 1 <= self.limit:
+            return 0.0
+        if state.current + 1 > self.limit:
+            # Only the next window can make room
+            return (1 - elapsed) * self.window
+        # Wait until enough of the previous window slides out
+        needed = 1 - (self.limit - state.current - 1) / state.previous
+        return max(0.0, (needed - elapsed) * self.window)
+
+    def hit(self, key, now: Optional[float] = None):
+        """Count one hit for `key`"""
+        now = self.clock() if now is None else now
+        self._state(key, now, create=True).current += 1
+        self._hits += 1
+        if self._hits % self.sweep_every == 0:
+            self._sweep(now)
+
+    def refund(self, key, now: Optional[float] = None):
+        """Take back a recent hit for `key`, from the previous window if it has rolled over since"""
+        now = self.clock() if now is None else now
+        state = self._state(key, now, create=False)
+        if state is None:
+            return
+        if state.current:
+            state.current -= 1
+        elif state.previous:
+            state.previous -= 1
+
+    def _sweep(self, now: float):
+        shard = self._shards[self._next_sweep]
+        self._next_sweep = (self._next_sweep + 1) % len(self._shards)
+        expired = int(now // self.window) - 1
+        stale = [key for key, state in shard.items() if state.index < expired]
+        for key in stale:
+            del shard[key]
+
+    def __len__(self) -> int:
+        return sum(len(shard) for shard in self._shards)
+
+
+class CommandCooldowns:
+    """
+    Per-user, per-command limits with an optional cap on each guild's total
+
+    Args:
+        user_limit: Uses allowed per user and command in each `user_window`
+        user_window: Length of the user window in seconds
+        guild_limit: Uses allowed per guild in each `guild_window`; 0 disables the cap
+        guild_window: Length of the guild window in seconds
+    """
+
+    def __init__(self, user_limit: int, user_window: float, guild_limit: int = 0, guild_window: float = 60.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.clock = clock
+        self.users = SlidingWindowLimiter(user_limit, user_window, clock=clock) if user_limit > 0 else None
+        self.guilds = SlidingWindowLimiter(guild_limit, guild_window, clock=clock) if guild_limit > 0 else None
+
+    def check(self, command: str, guild_id: int, user_id: int) -> float:
+        """
+        Count a use of `command` if it is within every limit
+
+        Returns:
+            float: 0 if the use was allowed, otherwise seconds until it would be
+        """
+        now = self.clock()
+        user_key = (command, guild_id, user_id)
+        wait = self.users.retry_after(user_key, now) if self.users is not None else 0.0
+        if not wait and self.guilds is not None:
+            wait = self.guilds.retry_after(guild_id, now)
+        if wait:
+            return wait
+        if self.users is not None:
+            self.users.hit(user_key, now)
+        if self.guilds is not None:
+            self.guilds.hit(guild_id, now)
+        return 0.0
+
+    def refund(self, command: str, guild_id: int, user_id: int):
+        """Give back a use counted by check() for a command that then didn't go ahead"""
+        now = self.clock()
+        if self.users is not None:
+            self.users.refund((command, guild_id, user_id), now)
+        if self.guilds is not None:
+            self.guilds.refund(guild_id, now)
+
+    @staticmethod
+    def format_wait(seconds: float) -> str:
+        seconds = max(1, math.ceil(seconds))
+        if seconds < 60:
+            return f"{seconds}s"
+        return f"{seconds // 60}m {seconds % 60}s"
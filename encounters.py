@@ -0,0 +1,394 @@
+import asyncio
+import logging
+import random
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Tuple
+
+from log_sampling import HotLogger, Lazy
+from member_index import Weapon
+from narrative import NarrativeModes
+
+logger = logging.getLogger('BotAutomation.Encounters')
+hot_logger = HotLogger('BotAutomation.Encounters')
+
+# Pause between narrative messages, in seconds
+NARRATIVE_DELAY = 1.5
+
+# How an encounter moves money
+PENALTY_BOTH = "penalty_both"    # robber and target each pay penalty1/penalty2
+PENALTY_ROBBER = "penalty"       # robber pays penalty
+TRANSFER = "transfer"            # amount moves from target to robber
+NO_PAYOUT = None
+
+
+@dataclass(frozen=True)
+class Encounter:
+    """
+    One row of the matchup table
+
+    Templates are str.format strings rendered with robber, robber_mention,
+    target, target_mention and the rolled amounts (penalty1, penalty2, penalty
+    or amount) plus robber_balance/target_balance for the aftermath.
+    """
+    name: str
+    log: str
+    intros: Tuple[str, ...]
+    narratives: Tuple[Tuple[str, ...], ...] = ()
+    payout: Optional[str] = NO_PAYOUT
+    amounts: Dict[str, Tuple[int, int]] = field(default_factory=dict)
+    success: Optional[str] = None
+    failure: Optional[str] = None
+    # Silent beats before the first narrative message
+    lead_in: int = 0
+
+    def roll(self) -> Dict[str, int]:
+        return {name: random.randint(low, high) for name, (low, high) in self.amounts.items()}
+
+
+GUNFIGHT = Encounter(
+    name="gunfight",
+    log="Gunfight scenario: both {robber} and {target} have Woozie role",
+    intros=("🔫 You try to rob {target_mention}, but they pull out their piece too!",),
+    narratives=(
+        (
+            "💨 \"LOCK IN BLUD!!\" {target} yells, returning fire!",
+            "💢 {robber} gets hit! (-${penalty1:,})",
+            "💥 Your bullet grazes {target}! (-${penalty2:,})"
+        ),
+        (
+            "💥 \"ALL I SEE IS GREEN!!!\" {robber} shouts!",
+            "💢 You both get hit in the crossfire! (-${penalty1:,})",
+            "🚓 Police sirens in the distance force you both to flee! (-${penalty2:,})"
+        ),
+        (
+            "💥 You trade shots in the street!",
+            "💢 Blood spills on both sides! (-${penalty1:,}) (-${penalty2:,})",
+            "🏃‍♂️ You both limp away before anyone sees you!"
+        ),
+    ),
+    payout=PENALTY_BOTH,
+    amounts={"penalty1": (5000, 15000), "penalty2": (5000, 15000)},
+    success=(
+        "💸 **Gunfight Aftermath:**\n"
+        "{robber_mention}: ${robber_balance:,} (-${penalty1:,})\n"
+        "{target_mention}: ${target_balance:,} (-${penalty2:,})"
+    ),
+    lead_in=1,
+)
+
+SHOTGUN_DEFENSE = Encounter(
+    name="shotgun",
+    log="{target} has shotgun role, preventing robbery and penalizing robber {penalty}",
+    intros=("🔫 You try to rob {target_mention}, but wait... what's that they're reaching for?",),
+    narratives=(
+        (
+            "💥 **BOOM!** {target} pulls out a shotgun!",
+            "😱 \"LOCK IN BLUD!!\" {target} shouts as they fire!",
+            "💢 The blast catches you! (-${penalty:,})",
+            "🩸 You escape, badly wounded!"
+        ),
+        (
+            "💥 {target} reveals a sawed-off shotgun!",
+            "😱 You freeze in place seeing the barrel!",
+            "💢 The shot rings out! (-${penalty:,})",
+            "🏥 You'll need stitches after this one!"
+        ),
+        (
+            "💥 \"{target}'s strapped with a shotty!\" someone yells!",
+            "😱 You try to escape but stumble!",
+            "💢 **BOOM!** You take the blast! (-${penalty:,})",
+            "🚑 That's a hospital trip for sure!"
+        ),
+    ),
+    payout=PENALTY_ROBBER,
+    amounts={"penalty": (10000, 15000)},
+    success="💸 **Medical Bill:** ${penalty:,}\nYour new balance: ${robber_balance:,}",
+)
+
+WOOZIE_ROBBERY = Encounter(
+    name="robbery",
+    log="Attempting to move {amount} from user {target_id} to user {robber_id} in guild {guild_id}",
+    intros=("🔫 You're robbing {target_mention}!",),
+    payout=TRANSFER,
+    amounts={"amount": (25000, 50000)},
+    success=(
+        "💰 Successfully robbed ${amount:,} from {target_mention}!\n"
+        "Their new balance is ${target_balance:,}\n"
+        "Your new balance is ${robber_balance:,}"
+    ),
+    failure=(
+        "❌ Failed to rob the target. They might be broke or protected!\n"
+        "Make sure you have permissions to use economy commands."
+    ),
+)
+
+UZI_OVERPOWER = Encounter(
+    name="uzi",
+    log="{target} has Uzi role, overpowering plock user with penalty {penalty}",
+    intros=(
+        "🔫 Your plock is no match for {target_mention}'s UZI!",
+        "🔫 {target_mention} pulls out an UZI when you show your plock!",
+        "🔫 You brought a plock to an UZI fight with {target_mention}!"
+    ),
+    narratives=(
+        ("💥 UZI fires!", "💢 You're hit! (-${penalty:,})"),
+        ("💥 \"ALL I SEE IS GREEN!!!\" {target} yells, firing their UZI!", "💢 Multiple hits! (-${penalty:,})"),
+        ("💥 UZI wins!", "💢 You're wounded! (-${penalty:,})"),
+    ),
+    payout=PENALTY_ROBBER,
+    amounts={"penalty": (5000, 10000)},
+    success="💸 **Medical Bill:** ${penalty:,}\nYour new balance: ${robber_balance:,}",
+)
+
+SHOTGUN_SCARE = Encounter(
+    name="shotgun",
+    log="{target} has shotgun role, scaring away plock user",
+    intros=("🔫 You pull out your pistol to rob {target_mention}, but freeze when you see their shotgun!",),
+    narratives=(
+        (
+            "💥 **CLICK!** {target} cocks their shotgun!",
+            "😱 The sight of that barrel makes you freeze!",
+            "🏃 You quickly put away your plock...",
+            "💨 You back away slowly, grateful to be alive!"
+        ),
+        (
+            "💥 {target} reveals a shotgun!",
+            "😱 \"You picked the wrong one today!\" they shout!",
+            "🏃 Your plock feels useless now...",
+            "💨 You decide this isn't worth it and flee!"
+        ),
+        (
+            "💥 {target}'s shotgun makes your plock look like a toy!",
+            "😱 \"LOCK IN BLUD!!\" they shout, aiming at you!",
+            "🏃 That plock won't help you now...",
+            "💨 You wisely choose to run away!"
+        ),
+    ),
+    success="😅 You escaped without losing any money, but your pride is severely wounded!",
+)
+
+PISTOL_STANDOFF = Encounter(
+    name="standoff",
+    log="Pistol standoff: both {robber} and {target} have Glock role",
+    intros=("🔫 You pull your pistol on {target_mention}, but they draw their pistol too!",),
+    narratives=(
+        (
+            "😠 \"Drop it!\" you both shout at the same time!",
+            "💥 {robber} takes a graze! (-${penalty1:,})",
+            "💢 {target} gets hit too! (-${penalty2:,})"
+        ),
+        (
+            "💥 \"ALL I SEE IS GREEN!!!\" Someone nearby yells!",
+            "😠 Shots ring out in the panic! (-${penalty1:,})",
+            "💢 Both of you are hit! (-${penalty2:,})"
+        ),
+        (
+            "💥 Fingers twitch and bullets fly!",
+            "💢 You both take hits! (-${penalty1:,}) (-${penalty2:,})",
+            "🚓 A police siren sends you both running!"
+        ),
+    ),
+    payout=PENALTY_BOTH,
+    amounts={"penalty1": (1000, 5000), "penalty2": (1000, 5000)},
+    success=(
+        "💸 **Pistol Fight Aftermath:**\n"
+        "{robber_mention}: ${robber_balance:,} (-${penalty1:,})\n"
+        "{target_mention}: ${target_balance:,} (-${penalty2:,})"
+    ),
+    lead_in=1,
+)
+
+PLOCK_ROBBERY = Encounter(
+    name="robbery",
+    log="Plock robbery: Attempting to move {amount} from user {target_id} to user {robber_id} in guild {guild_id}",
+    intros=("🔫 You're robbing {target_mention} with your plock!",),
+    payout=TRANSFER,
+    amounts={"amount": (500, 10000)},
+    success=WOOZIE_ROBBERY.success,
+    failure=WOOZIE_ROBBERY.failure,
+)
+
+# Command -> (defender weapon, encounter) in priority order, then the fallback when
+# the defender holds none of them. The first matching weapon wins.
+MATCHUPS = {
+    "woozie": ((
+        (Weapon.WOOZIE, GUNFIGHT),
+        (Weapon.SHOTGUN, SHOTGUN_DEFENSE),
+    ), WOOZIE_ROBBERY),
+    "plock": ((
+        (Weapon.UZI, UZI_OVERPOWER),
+        (Weapon.SHOTGUN, SHOTGUN_SCARE),
+        (Weapon.GLOCK, PISTOL_STANDOFF),
+    ), PLOCK_ROBBERY),
+}
+
+
+def _build_dispatch(matchups) -> Dict[str, Tuple[Encounter, ...]]:
+    """Expand the priority lists into one encounter per possible defender bitmask"""
+    all_flags = 0
+    for weapon in Weapon:
+        all_flags |= weapon
+    dispatch = {}
+    for command, (rules, fallback) in matchups.items():
+        table = []
+        for flags in range(all_flags + 1):
+            table.append(next((encounter for weapon, encounter in rules if flags & weapon), fallback))
+        dispatch[command] = tuple(table)
+    return dispatch
+
+
+class EncounterEngine:
+    """
+    Resolves a matchup from the table and plays it out
+
+    The narrative and the settlement run side by side; the aftermath posts once
+    both are finished, or when the shared deadline passes. How the messages
+    reach Discord is up to the guild's narrative renderer.
+    """
+
+    def __init__(self, settlement, matchups=MATCHUPS, deadline: float = 15.0,
+                 modes: Optional[NarrativeModes] = None):
+        self.settlement = settlement
+        self.deadline = deadline
+        self.modes = modes or NarrativeModes()
+        self._dispatch = _build_dispatch(matchups)
+        self._background = set()
+
+    async def close(self, timeout: Optional[float] = None):
+        """
+        Wait for settlements still in flight, so they can finish their journal entries
+
+        Call before closing the settlement engine. Settlements still running after
+        `timeout` (defaults to the encounter deadline) are left to the replay on next start.
+        """
+        if not self._background:
+            return
+        timeout = self.deadline if timeout is None else timeout
+        logger.info(f"Waiting up to {timeout:.0f}s for {len(self._background)} settlement(s) to finish")
+        _, pending = await asyncio.wait(set(self._background), timeout=timeout)
+        if pending:
+            logger.warning(f"{len(pending)} settlement(s) still running at shutdown; they will be checked on replay")
+
+    def resolve(self, command: str, defender_weapons: Weapon) -> Encounter:
+        return self._dispatch[command][defender_weapons]
+
+    async def play(self, encounter: Encounter, interaction, target):
+        run = await self.start(encounter, interaction, target)
+        await run.finish()
+
+    async def start(self, encounter: Encounter, interaction, target) -> 'EncounterRun':
+        """
+        Post the intro and set the settlement and the narrative going
+
+        Returns:
+            EncounterRun: Wait on settled() for the money, then finish() for the aftermath
+        """
+        guild_id = str(interaction.guild_id)
+        context = {
+            'robber': interaction.user.display_name,
+            'robber_mention': interaction.user.mention,
+            'robber_id': str(interaction.user.id),
+            'target': target.display_name,
+            'target_mention': target.mention,
+            'target_id': str(target.id),
+            'guild_id': guild_id,
+        }
+        context.update(encounter.roll())
+
+        hot_logger.info('encounter.play', "%s", Lazy(lambda: encounter.log.format(**context)),
+                        guild_id=guild_id, user_id=interaction.user.id)
+        renderer = self.modes.renderer(interaction)
+        await renderer.intro(random.choice(encounter.intros).format(**context))
+
+        # Settle while the narrative plays instead of after it. The event loop only
+        # keeps weak references to tasks, so hold the settlement until it is done
+        settlement = asyncio.create_task(self._settle(encounter, guild_id, context))
+        self._background.add(settlement)
+        settlement.add_done_callback(self._background.discard)
+        narrative = asyncio.create_task(self._narrate(encounter, renderer, context))
+        return EncounterRun(encounter, renderer, context, settlement, narrative, self.deadline)
+
+    async def _narrate(self, encounter: Encounter, renderer, context: dict):
+        """Send each message with a delay for dramatic effect"""
+        if not encounter.narratives:
+            return
+        for _ in range(encounter.lead_in):
+            await asyncio.sleep(NARRATIVE_DELAY)
+        for line in random.choice(encounter.narratives):
+            await asyncio.sleep(NARRATIVE_DELAY)
+            await renderer.line(line.format(**context))
+
+    async def _settle(self, encounter: Encounter, guild_id: str, context: dict):
+        robber_id, target_id = context['robber_id'], context['target_id']
+        if encounter.payout == PENALTY_BOTH:
+            return await self.settlement.settle(
+                guild_id, [(robber_id, -context['penalty1']), (target_id, -context['penalty2'])]
+            )
+        if encounter.payout == PENALTY_ROBBER:
+            return await self.settlement.settle(guild_id, [(robber_id, -context['penalty'])])
+        if encounter.payout == TRANSFER:
+            # Take from the target and pay the robber concurrently; a half-done transfer is reversed
+            return await self.settlement.transfer(guild_id, target_id, robber_id, context['amount'])
+        return None
+
+
+class EncounterRun:
+    """An encounter whose settlement and narrative are under way"""
+
+    def __init__(self, encounter: Encounter, renderer, context: dict, settlement: asyncio.Task,
+                 narrative: asyncio.Task, deadline: float):
+        self.encounter = encounter
+        self.renderer = renderer
+        self.context = context
+        self.settlement = settlement
+        self.narrative = narrative
+        self.deadline = deadline
+        self._deadline_at = asyncio.get_running_loop().time() + deadline
+
+    def _remaining(self) -> float:
+        return max(0.0, self._deadline_at - asyncio.get_running_loop().time())
+
+    async def settled(self):
+        """Wait until the settlement is done or the deadline passes; never cancels it"""
+        await asyncio.wait((self.settlement,), timeout=self._remaining())
+
+    async def finish(self):
+        """Wait for the narrative, then post the aftermath"""
+        encounter, renderer, context = self.encounter, self.renderer, self.context
+        narrative, settlement = self.narrative, self.settlement
+        guild_id = context['guild_id']
+
+        done, _ = await asyncio.wait((narrative, settlement), timeout=self._remaining())
+        if len(done) < 2:
+            logger.warning(f"Encounter {encounter.name} in guild {guild_id} missed its {self.deadline:.0f}s deadline")
+        if narrative not in done:
+            narrative.cancel()
+        elif not narrative.cancelled() and narrative.exception() is not None:
+            # A Discord error mid-story; the settlement carries on and the aftermath is still posted
+            logger.error(f"Narrative of encounter {encounter.name} in guild {guild_id} failed: "
+                         f"{str(narrative.exception())}")
+
+        if not settlement.done():
+            # Never cancel a settlement half way; let it finish in the background
+            if encounter.payout is not NO_PAYOUT:
+                await renderer.finish("⏳ The bank is still processing this one. Balances will update shortly!")
+                return
+            await renderer.finish()
+            return
+
+        result = settlement.result()
+        aftermath = None
+        if result is not None and result.unresolved_legs:
+            aftermath = ("🏦 The bank couldn't confirm this one, so it won't be retried automatically. "
+                         "An admin may need to check balances.")
+        elif result is None or result.ok:
+            if result is not None:
+                context['robber_balance'] = result.leg(context['robber_id']).balance
+                target_leg = result.leg(context['target_id'])
+                if target_leg is not None:
+                    context['target_balance'] = target_leg.balance
+            if encounter.success:
+                aftermath = encounter.success.format(**context)
+        elif encounter.failure:
+            aftermath = encounter.failure.format(**context)
+        await renderer.finish(aftermath)
@@ -0,0 +1,192 @@
+"""
+Local stand-in for the UnbelievaBoat API
+
+Serves GET/PATCH /api/v1/guilds/{guild_id}/users/{user_id} with balances kept
+in memory, plus configurable latency, jitter, 429 bursts and injected errors.
+Point the bot at it with UNBELIEVABOAT_API_URL=http://127.0.0.1:8090/api
+
+    python fake_unbelievaboat.py --port 8090 --latency 0.08 --jitter 0.04 --rate-limit 20
+"""
+import argparse
+import asyncio
+import logging
+import random
+import time
+from collections import Counter
+from typing import Dict, Tuple
+
+from aiohttp import web
+
+logger = logging.getLogger('FakeUnbelievaBoat')
+
+# Typed request keys arrived in aiohttp 3.12; older versions take a plain string
+RATE_LIMIT_HEADERS = (web.RequestKey('rate_limit_headers', Dict[str, str])
+                      if hasattr(web, 'RequestKey') else 'rate_limit_headers')
+
+
+class FakeUnbelievaBoat:
+    def __init__(self, starting_cash: int = 100000, latency: float = 0.0, jitter: float = 0.0,
+                 rate_limit: int = 0, rate_window: float = 1.0, retry_after: float = 1.0,
+                 error_rate: float = 0.0, error_status: int = 500, require_auth: bool = True):
+        """
+        Args:
+            starting_cash (int): Cash every unseen user starts with
+            latency (float): Base response delay in seconds
+            jitter (float): Extra random delay, uniform in [0, jitter] seconds
+            rate_limit (int): Requests allowed per route per window; 0 disables 429s
+            rate_window (float): Rate-limit window in seconds
+            retry_after (float): Retry-After (seconds) sent with 429 responses
+            error_rate (float): Probability that a request fails with error_status
+            error_status (int): Status code used for injected errors
+            require_auth (bool): Reject requests without an Authorization header
+        """
+        self.starting_cash = starting_cash
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+        self.retry_after = retry_after
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.require_auth = require_auth
+
+        self.balances: Dict[Tuple[str, str], Dict[str, int]] = {}
+        self.stats = Counter()
+        self._windows: Dict[str, Tuple[float, int]] = {}
+        self._runner = None
+
+        self.app = web.Application()
+        self.app.router.add_get('/api/v1/guilds/{guild_id}/users/{user_id}', self.get_user)
+        self.app.router.add_patch('/api/v1/guilds/{guild_id}/users/{user_id}', self.patch_user)
+
+    async def start(self, host: str = '127.0.0.1', port: int = 8090) -> str:
+        """Start serving and return the base URL to hand to UnbelievaBoatAPI"""
+        self._runner = web.AppRunner(self.app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        logger.info(f"Fake UnbelievaBoat API listening on http://{host}:{port}/api")
+        return f"http://{host}:{port}/api"
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def _user(self, guild_id: str, user_id: str) -> Dict[str, int]:
+        key = (guild_id, user_id)
+        if key not in self.balances:
+            self.balances[key] = {'cash': self.starting_cash, 'bank': 0}
+        return self.balances[key]
+
+    def _body(self, guild_id: str, user_id: str) -> dict:
+        user = self._user(guild_id, user_id)
+        return {
+            'rank': '1',
+            'user_id': user_id,
+            'cash': user['cash'],
+            'bank': user['bank'],
+            'total': user['cash'] + user['bank']
+        }
+
+    async def _gate(self, request: web.Request):
+        """Apply latency, auth, rate limits and error injection; returns a response to short-circuit with"""
+        route = f"{request.method} {request.match_info['guild_id']}"
+        self.stats[request.method] += 1
+
+        delay = self.latency + (random.uniform(0, self.jitter) if self.jitter else 0)
+        if delay:
+            await asyncio.sleep(delay)
+
+        if self.require_auth and not request.headers.get('Authorization'):
+            self.stats['401'] += 1
+            return web.json_response({'message': '401: Unauthorized'}, status=401)
+
+        headers = {}
+        if self.rate_limit:
+            now = time.monotonic()
+            started, count = self._windows.get(route, (now, 0))
+            if now - started >= self.rate_window:
+                started, count = now, 0
+            count += 1
+            self._windows[route] = (started, count)
+            reset_ms = int((time.time() + self.rate_window - (now - started)) * 1000)
+            headers = {
+                'X-RateLimit-Limit': str(self.rate_limit),
+                'X-RateLimit-Remaining': str(max(0, self.rate_limit - count)),
+                'X-RateLimit-Reset': str(reset_ms)
+            }
+            if count > self.rate_limit:
+                self.stats['429'] += 1
+                headers['Retry-After'] = str(self.retry_after)
+                return web.json_response(
+                    {'message': 'You are being rate limited.', 'retry_after': int(self.retry_after * 1000)},
+                    status=429, headers=headers
+                )
+
+        if self.error_rate and random.random() < self.error_rate:
+            self.stats[str(self.error_status)] += 1
+            return web.json_response({'message': 'Injected error'}, status=self.error_status)
+
+        request[RATE_LIMIT_HEADERS] = headers
+        return None
+
+    async def get_user(self, request: web.Request) -> web.Response:
+        rejected = await self._gate(request)
+        if rejected is not None:
+            return rejected
+        guild_id, user_id = request.match_info['guild_id'], request.match_info['user_id']
+        return web.json_response(self._body(guild_id, user_id), headers=request[RATE_LIMIT_HEADERS])
+
+    async def patch_user(self, request: web.Request) -> web.Response:
+        rejected = await self._gate(request)
+        if rejected is not None:
+            return rejected
+
+        try:
+            payload = await request.json()
+            cash = int(payload.get('cash', 0))
+            bank = int(payload.get('bank', 0))
+        except (ValueError, TypeError, AttributeError):
+            self.stats['400'] += 1
+            return web.json_response({'message': 'Invalid body'}, status=400)
+
+        guild_id, user_id = request.match_info['guild_id'], request.match_info['user_id']
+        user = self._user(guild_id, user_id)
+        user['cash'] += cash
+        user['bank'] += bank
+        self.stats['applied'] += 1
+        return web.json_response(self._body(guild_id, user_id), headers=request[RATE_LIMIT_HEADERS])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local fake UnbelievaBoat API")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8090)
+    parser.add_argument('--starting-cash', type=int, default=100000)
+    parser.add_argument('--latency', type=float, default=0.0, help="Base delay per request in seconds")
+    parser.add_argument('--jitter', type=float, default=0.0, help="Extra random delay in seconds")
+    parser.add_argument('--rate-limit', type=int, default=0, help="Requests per route per window (0 = unlimited)")
+    parser.add_argument('--rate-window', type=float, default=1.0)
+    parser.add_argument('--retry-after', type=float, default=1.0)
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Probability of an injected error")
+    parser.add_argument('--error-status', type=int, default=500)
+    args = parser.parse_args()
+
+    fake = FakeUnbelievaBoat(
+        starting_cash=args.starting_cash,
+        latency=args.latency,
+        jitter=args.jitter,
+        rate_limit=args.rate_limit,
+        rate_window=args.rate_window,
+        retry_after=args.retry_after,
+        error_rate=args.error_rate,
+        error_status=args.error_status
+    )
+    logger.info("Starting standalone fake UnbelievaBoat API")
+    web.run_app(fake.app, host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
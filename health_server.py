@@ -0,0 +1,146 @@
+import json
+import time
+import logging
+from typing import Callable, Dict, Optional, Tuple
+
+from aiohttp import web
+
+from metrics import CONTENT_TYPE, PrometheusWriter
+from utils import memory_usage
+
+logger = logging.getLogger('BotAutomation.HealthServer')
+
+CIRCUIT_STATES = ("closed", "half_open", "open")
+
+
+class HealthServer:
+    """
+    Liveness, readiness and Prometheus endpoints served on the caller's event loop
+
+    Args:
+        readiness: Returns (ready, details) for /readyz
+        metrics: Writes the /metrics families into a PrometheusWriter
+        host: Interface to bind
+        port: Port to bind
+    """
+
+    def __init__(self, readiness: Callable[[], Tuple[bool, Dict]],
+                 metrics: Callable[[PrometheusWriter], None],
+                 host: str = '0.0.0.0', port: int = 8080):
+        self.readiness = readiness
+        self.metrics = metrics
+        self.host = host
+        self.port = port
+        self.started = time.time()
+        self._runner: Optional[web.AppRunner] = None
+
+        self.app = web.Application()
+        self.app.router.add_get('/', self.index)
+        self.app.router.add_get('/healthz', self.healthz)
+        self.app.router.add_get('/readyz', self.readyz)
+        self.app.router.add_get('/metrics', self.serve_metrics)
+
+    async def start(self):
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        logger.info(f"Health server listening on {self.host}:{self.port}")
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def index(self, request):
+        # Uptime monitors ping the root URL; answer truthfully
+        ready, _ = self.readiness()
+        if ready:
+            return web.Response(text="Bot is running!")
+        return web.Response(text="Bot is not ready", status=503)
+
+    async def healthz(self, request):
+        # Answering at all proves the event loop is alive
+        return web.Response(text="ok")
+
+    async def readyz(self, request):
+        ready, details = self.readiness()
+        return web.Response(
+            text=json.dumps({'ready': ready, **details}),
+            content_type='application/json',
+            status=200 if ready else 503
+        )
+
+    async def serve_metrics(self, request):
+        writer = PrometheusWriter()
+        self.metrics(writer)
+        write_process_metrics(writer, self.started)
+        return web.Response(body=writer.render().encode('utf-8'), headers={'Content-Type': CONTENT_TYPE})
+
+
+def write_process_metrics(writer: PrometheusWriter, started: float):
+    rss, _ = memory_usage()
+    if rss is not None:
+        writer.metric('process_resident_memory_bytes', 'gauge', "Resident memory size in bytes.", rss)
+    writer.metric('process_start_time_seconds', 'gauge', "Start time of the process since unix epoch in seconds.", started)
+
+
+def shard_status(bot) -> Dict[int, Dict]:
+    """Per-shard connection state and heartbeat latency"""
+    shards = getattr(bot, 'shards', None)
+    if shards is not None:
+        return {
+            shard_id: {'connected': not shard.is_closed(), 'latency_ms': latency_ms(shard.latency)}
+            for shard_id, shard in shards.items()
+        }
+    return {bot.shard_id or 0: {'connected': bot.ws is not None and not bot.is_closed(),
+                                'latency_ms': latency_ms(bot.latency)}}
+
+
+def latency_ms(latency: float) -> Optional[float]:
+    """Latency in milliseconds, or None before the first heartbeat"""
+    return None if latency != latency or latency == float('inf') else round(latency * 1000, 1)
+
+
+def bot_readiness(bot) -> Tuple[bool, Dict]:
+    """Ready once the gateway is connected and every shard is up; the circuit is reported, not required"""
+    shards = shard_status(bot)
+    gateway = bot.is_ready() and not bot.is_closed()
+    ready = gateway and all(shard['connected'] for shard in shards.values())
+    details = {
+        'gateway': gateway,
+        'shards': shards,
+        'circuit': bot.unbelievaboat.circuit.state,
+        'guilds': len(bot.guilds),
+    }
+    if bot.loop_monitor:
+        details['loop_lag_ms'] = round(bot.loop_monitor.max_lag * 1000, 1)
+    return ready, details
+
+
+def write_bot_metrics(bot, writer: PrometheusWriter):
+    ready, details = bot_readiness(bot)
+    writer.metric('bot_ready', 'gauge', "1 if the gateway is connected and every shard is up.", int(ready))
+    writer.metric('bot_guilds', 'gauge', "Guilds the bot is in.", len(bot.guilds))
+
+    writer.family('bot_shard_connected', 'gauge', "1 if the shard's gateway connection is open.")
+    for shard_id, shard in details['shards'].items():
+        writer.sample('bot_shard_connected', int(shard['connected']), {'shard': shard_id})
+    writer.family('bot_gateway_latency_seconds', 'gauge', "Gateway heartbeat latency per shard.")
+    for shard_id, shard in details['shards'].items():
+        if shard['latency_ms'] is not None:
+            writer.sample('bot_gateway_latency_seconds', shard['latency_ms'] / 1000, {'shard': shard_id})
+
+    api = bot.unbelievaboat
+    writer.family('unbelievaboat_circuit_state', 'gauge', "1 for the circuit breaker's current state.")
+    for state in CIRCUIT_STATES:
+        writer.sample('unbelievaboat_circuit_state', int(details['circuit'] == state), {'state': state})
+    writer.metric('unbelievaboat_requests_queued', 'gauge', "Requests waiting on the rate limiter.",
+                  api.scheduler.queued)
+    writer.metric('balance_cache_entries', 'gauge', "Balances held in the cache.", len(api.balances))
+    writer.metric('balance_cache_hits_total', 'counter', "Balance cache hits.", api.balances.hits)
+    writer.metric('balance_cache_misses_total', 'counter', "Balance cache misses.", api.balances.misses)
+    writer.metric('member_locks_active', 'gauge', "Members with a robbery lock held or awaited.",
+                  len(bot.member_locks))
+    bot.metrics.write(writer)
+    if bot.loop_monitor:
+        bot.loop_monitor.write(writer)
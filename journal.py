@@ -0,0 +1,198 @@
+import asyncio
+import logging
+import sqlite3
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger('BotAutomation.Journal')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS settlement_journal (
+    entry_id TEXT PRIMARY KEY,
+    guild_id TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    delta INTEGER NOT NULL,
+    balance_before INTEGER,
+    status TEXT NOT NULL DEFAULT 'pending',
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_settlement_journal_status ON settlement_journal (status);
+"""
+
+PENDING = 'pending'      # recorded, result not seen yet (or the process died first)
+DONE = 'done'            # applied
+CANCELLED = 'cancelled'  # not applied, and no longer owed
+FAILED = 'failed'        # not applied but still owed; safe to resend
+UNKNOWN = 'unknown'      # may or may not have been applied; reconcile before resending
+# Entries that still need attention on startup
+UNSETTLED = (PENDING, FAILED, UNKNOWN)
+
+
+class SettlementJournal:
+    """
+    Write-ahead journal of balance mutations, stored in SQLite (WAL mode)
+
+    Every mutation is recorded as 'pending' before it is sent to UnbelievaBoat,
+    together with the user's cached cash balance at the time, and is then marked
+    'done' once the API confirms it, 'cancelled' when it was not applied and never
+    will be, 'failed' when it was not applied but is still owed, or 'unknown' when
+    it may or may not have been applied. All SQLite work runs on a single
+    background thread, and writes issued close together share one commit.
+
+    Entries the bot can't reconcile on startup stay 'unknown'. After checking the
+    user's balance, an operator sets them to 'failed' to have the next startup
+    resend them, or to 'done' to drop them.
+    """
+
+    def __init__(self, path: str = 'settlements.db', batch_interval: float = 0.01):
+        self.path = path
+        self.batch_interval = batch_interval
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='settlement-journal')
+        self._conn: Optional[sqlite3.Connection] = None
+        self._statements: List[Tuple[str, Sequence[Any]]] = []
+        self._waiters: List[asyncio.Future] = []
+        self._flush_task: Optional[asyncio.Task] = None
+
+    async def open(self):
+        """Open the database, switch it to WAL mode and create the schema"""
+        await self._run(self._open_sync)
+        logger.info(f"Settlement journal opened at {self.path}")
+
+    def _open_sync(self):
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(settlement_journal)")}
+        if 'balance_before' not in columns:
+            # Journals written before balances were recorded
+            self._conn.execute("ALTER TABLE settlement_journal ADD COLUMN balance_before INTEGER")
+
+    async def close(self):
+        """Commit anything still buffered and close the database"""
+        while (self._flush_task and not self._flush_task.done()) or self._statements:
+            if self._flush_task and not self._flush_task.done():
+                await self._flush_task
+            else:
+                await self._flush()
+        if self._conn:
+            await self._run(self._conn.close)
+            self._conn = None
+        self._executor.shutdown(wait=True)
+
+    async def record(self, guild_id: str, legs: Sequence[Tuple[str, int]],
+                     balances: Optional[Sequence[Optional[int]]] = None) -> List[str]:
+        """
+        Durably record intended mutations before they are sent
+
+        Args:
+            guild_id (str): Discord guild ID
+            legs (Sequence[Tuple[str, int]]): (user_id, signed cash delta) pairs
+            balances (Optional[Sequence[Optional[int]]]): Known cash balance of each leg's user beforehand
+
+        Returns:
+            List[str]: Journal entry IDs, in the same order as legs
+        """
+        now = time.time()
+        balances = balances or [None] * len(legs)
+        entry_ids = []
+        for (user_id, delta), balance in zip(legs, balances):
+            entry_id = uuid.uuid4().hex
+            entry_ids.append(entry_id)
+            self._statements.append((
+                "INSERT INTO settlement_journal "
+                "(entry_id, guild_id, user_id, delta, balance_before, status, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, 'pending', ?, ?)",
+                (entry_id, guild_id, user_id, delta, balance, now, now)
+            ))
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self._schedule_flush()
+        await waiter
+        return entry_ids
+
+    def mark(self, entry_ids: Sequence[str], status: str):
+        """Queue a status change for entries; committed with the next batch"""
+        if not entry_ids:
+            return
+        now = time.time()
+        for entry_id in entry_ids:
+            self._statements.append((
+                "UPDATE settlement_journal SET status = ?, updated_at = ? WHERE entry_id = ?",
+                (status, now, entry_id)
+            ))
+        self._schedule_flush()
+
+    def mark_done(self, entry_ids: Sequence[str]):
+        self.mark(entry_ids, DONE)
+
+    def mark_cancelled(self, entry_ids: Sequence[str]):
+        self.mark(entry_ids, CANCELLED)
+
+    def mark_failed(self, entry_ids: Sequence[str]):
+        self.mark(entry_ids, FAILED)
+
+    def mark_unknown(self, entry_ids: Sequence[str]):
+        self.mark(entry_ids, UNKNOWN)
+
+    async def unsettled(self) -> List[Dict[str, Any]]:
+        """Return every pending, failed or unknown entry, oldest first"""
+        def _query():
+            rows = self._conn.execute(
+                "SELECT entry_id, guild_id, user_id, delta, balance_before, status, created_at "
+                "FROM settlement_journal WHERE status IN (?, ?, ?) ORDER BY created_at",
+                UNSETTLED
+            ).fetchall()
+            return [
+                {'entry_id': row[0], 'guild_id': row[1], 'user_id': row[2], 'delta': row[3],
+                 'balance_before': row[4], 'status': row[5], 'created_at': row[6]}
+                for row in rows
+            ]
+        return await self._run(_query)
+
+    def _schedule_flush(self):
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._delayed_flush())
+
+    async def _delayed_flush(self):
+        await asyncio.sleep(self.batch_interval)
+        await self._flush()
+
+    async def _flush(self):
+        statements, self._statements = self._statements, []
+        waiters, self._waiters = self._waiters, []
+        if not statements:
+            for waiter in waiters:
+                if not waiter.done():
+                    waiter.set_result(None)
+            return
+
+        def _commit():
+            with self._conn:
+                self._conn.execute("BEGIN")
+                for sql, params in statements:
+                    self._conn.execute(sql, params)
+
+        try:
+            await self._run(_commit)
+        except Exception as e:
+            logger.error(f"Failed to commit {len(statements)} journal statement(s): {str(e)}")
+            for waiter in waiters:
+                if not waiter.done():
+                    waiter.set_exception(e)
+            return
+
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+        # Writes that arrived while we were committing go out in the next batch
+        if self._statements:
+            self._flush_task = asyncio.create_task(self._delayed_flush())
+
+    async def _run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
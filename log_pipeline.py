@@ -0,0 +1,122 @@
+import os
+import gzip
+import json
+import queue
+import shutil
+import logging
+import logging.handlers
+from datetime import datetime, timezone
+from typing import List
+
+# Attributes every LogRecord has; anything else was passed through `extra=`
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'taskName'}
+
+
+class LocalQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler for a queue that stays inside this process
+
+    The stock handler formats every record on the calling thread so it can be
+    pickled; nothing is pickled here, so formatting is left to the listener
+    thread and logging from the event loop is just a queue put.
+    """
+
+    def prepare(self, record):
+        return record
+
+    def emit(self, record):
+        try:
+            self.enqueue(record)
+        except Exception:
+            self.handleError(record)
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, with any `extra=` fields included"""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        if record.stack_info:
+            entry['stack'] = self.formatStack(record.stack_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+def _gzip_rotator(source: str, dest: str):
+    with open(source, 'rb') as src, gzip.open(dest, 'wb') as dst:
+        shutil.copyfileobj(src, dst)
+    os.remove(source)
+
+
+class RotatingLogFileHandler(logging.handlers.TimedRotatingFileHandler):
+    """
+    Rotates on a schedule (`when`, e.g. midnight) and whenever the file reaches `max_bytes`
+
+    Rotated files are named with the period's timestamp plus a counter when
+    the size limit rolls the file more than once in a period, optionally
+    gzipped, and only the newest `backup_count` are kept.
+    """
+
+    def __init__(self, filename: str, when: str = 'midnight', max_bytes: int = 0,
+                 backup_count: int = 7, compress: bool = False):
+        super().__init__(filename, when=when or 'midnight', backupCount=backup_count,
+                         encoding='utf-8', delay=True)
+        self.rotate_on_time = bool(when)
+        self.max_bytes = max_bytes
+        self.compress = compress
+        if compress:
+            self.rotator = _gzip_rotator
+
+    def shouldRollover(self, record) -> bool:
+        if self.rotate_on_time and super().shouldRollover(record):
+            return True
+        if self.max_bytes > 0:
+            if self.stream is None:
+                self.stream = self._open()
+            if self.stream.tell() + len(self.format(record)) + 1 >= self.max_bytes:
+                return True
+        return False
+
+    def rotation_filename(self, default_name: str) -> str:
+        name = default_name + ('.gz' if self.compress else '')
+        counter = 1
+        while os.path.exists(name):
+            name = f"{default_name}.{counter}" + ('.gz' if self.compress else '')
+            counter += 1
+        return name
+
+    def getFilesToDelete(self) -> List[str]:
+        directory, base = os.path.split(self.baseFilename)
+        rotated = [
+            os.path.join(directory, name) for name in os.listdir(directory or '.')
+            if name.startswith(base + '.')
+        ]
+        rotated.sort(key=os.path.getmtime)
+        return rotated[:-self.backupCount] if self.backupCount else []
+
+
+def start_pipeline(handlers: List[logging.Handler], level: int) -> logging.handlers.QueueListener:
+    """
+    Route the root logger through an in-process queue to `handlers` on a listener thread
+
+    Returns:
+        logging.handlers.QueueListener: The running listener; stop() flushes it
+    """
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(LocalQueueHandler(log_queue))
+    root.setLevel(level)
+    listener.start()
+    return listener
@@ -0,0 +1,148 @@
+import time
+import logging
+from typing import Any, Callable, Dict, Optional, Set
+
+logger = logging.getLogger('BotAutomation.LogSampling')
+
+
+class Lazy:
+    """A log argument computed only if the record is actually emitted"""
+    __slots__ = ('func',)
+
+    def __init__(self, func: Callable[[], object]):
+        self.func = func
+
+
+class DebugOverrides:
+    """Guilds and users whose hot-path logs are always emitted in full"""
+
+    def __init__(self):
+        self.guilds: Set[int] = set()
+        self.users: Set[int] = set()
+
+    def matches(self, guild_id=None, user_id=None) -> bool:
+        if not self.guilds and not self.users:
+            return False
+        return (guild_id is not None and int(guild_id) in self.guilds) or \
+               (user_id is not None and int(user_id) in self.users)
+
+    def toggle(self, ids: Set[int], value: int) -> bool:
+        """Flip `value` in `ids`; returns True if it is now enabled"""
+        if value in ids:
+            ids.discard(value)
+            return False
+        ids.add(value)
+        return True
+
+
+class SamplingPolicy:
+    """
+    Per-call-site sample rates and per-second caps shared by every HotLogger
+
+    A rate of 0.1 emits every 10th record from that site, counted rather than
+    rolled so the rate is exact and costs no random number per call.
+    """
+
+    def __init__(self, rates: Optional[Dict[str, float]] = None, max_per_second: int = 0):
+        self.rates: Dict[str, float] = dict(rates or {})
+        self.max_per_second = max_per_second
+        self.overrides = DebugOverrides()
+        self._every: Dict[str, int] = {}
+        self._seen: Dict[str, int] = {}
+        self._second: Dict[str, int] = {}
+        self._emitted: Dict[str, int] = {}
+
+    def configure(self, rates: Dict[str, float], max_per_second: int = 0):
+        self.rates.update(rates)
+        self.max_per_second = max_per_second
+        self._every.clear()
+
+    def sample(self, site: str, default_rate: float) -> bool:
+        every = self._every.get(site)
+        if every is None:
+            rate = self.rates.get(site, default_rate)
+            every = self._every[site] = 0 if rate <= 0 else max(1, round(1 / rate))
+        if every == 0:
+            return False
+        seen = self._seen.get(site, 0)
+        self._seen[site] = seen + 1
+        if seen % every:
+            return False
+        if self.max_per_second:
+            second = int(time.monotonic())
+            if self._second.get(site) != second:
+                self._second[site] = second
+                self._emitted[site] = 0
+            if self._emitted[site] >= self.max_per_second:
+                return False
+            self._emitted[site] += 1
+        return True
+
+
+POLICY = SamplingPolicy()
+
+
+def parse_rates(value: str) -> Dict[str, float]:
+    """Parse 'site=rate,site=rate' into a dict"""
+    rates = {}
+    for item in filter(None, (part.strip() for part in (value or '').split(','))):
+        site, _, rate = item.partition('=')
+        rates[site.strip()] = float(rate)
+    return rates
+
+
+def parse_ids(value: str) -> Set[int]:
+    """Parse a comma-separated list of Discord IDs"""
+    return {int(part) for part in (value or '').split(',') if part.strip()}
+
+
+def configure(config: Dict[str, Any]):
+    """
+    Apply the LOG_SAMPLE_* and LOG_DEBUG_* settings to the shared policy
+
+    Args:
+        config (Dict[str, Any]): Configuration from config.load_config()
+    """
+    POLICY.configure(parse_rates(config['LOG_SAMPLE_RATES']), config['LOG_SITE_MAX_PER_SECOND'])
+    POLICY.overrides.guilds.update(parse_ids(config['LOG_DEBUG_GUILDS']))
+    POLICY.overrides.users.update(parse_ids(config['LOG_DEBUG_USERS']))
+    if POLICY.rates:
+        logger.info(f"Hot-path log sampling: {POLICY.rates}")
+
+
+class HotLogger:
+    """
+    Logger for per-command hot paths
+
+    Each call names its call site. Records are dropped before any formatting
+    unless the level is enabled and the site's sample says so; Lazy arguments
+    are only evaluated for records that are kept. Records about a guild or
+    user in the debug overrides skip sampling and level checks entirely.
+    """
+
+    def __init__(self, name: str, policy: SamplingPolicy = POLICY):
+        self.logger = logging.getLogger(name)
+        self.policy = policy
+
+    def log(self, site: str, level: int, msg: str, *args, rate: float = 1.0,
+            guild_id=None, user_id=None, _stacklevel: int = 2):
+        forced = self.policy.overrides.matches(guild_id, user_id)
+        if not forced and not (self.logger.isEnabledFor(level) and self.policy.sample(site, rate)):
+            return
+        args = tuple(arg.func() if isinstance(arg, Lazy) else arg for arg in args)
+        extra = {'site': site}
+        if guild_id is not None:
+            extra['guild_id'] = str(guild_id)
+        if user_id is not None:
+            extra['user_id'] = str(user_id)
+        if forced:
+            extra['debug_override'] = True
+        # _log skips the logger's own level check, so overridden DEBUG detail
+        # still reaches the handlers; stacklevel points the record at our caller
+        self.logger._log(level, msg, args, extra=extra, stacklevel=_stacklevel)
+
+    def info(self, site: str, msg: str, *args, **kwargs):
+        self.log(site, logging.INFO, msg, *args, _stacklevel=3, **kwargs)
+
+    def debug(self, site: str, msg: str, *args, **kwargs):
+        self.log(site, logging.DEBUG, msg, *args, _stacklevel=3, **kwargs)
@@ -0,0 +1,105 @@
+import sys
+import time
+import asyncio
+import logging
+import threading
+import traceback
+from collections import deque
+from typing import Optional
+
+from metrics import Histogram, PrometheusWriter
+
+logger = logging.getLogger('BotAutomation.LoopMonitor')
+
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class LoopLagMonitor:
+    """
+    Measures how late the event loop runs a sleep that should wake every `interval`
+
+    The lag of each tick goes into a histogram and a rolling window of recent
+    samples. A watchdog thread watches the ticks; when the loop has not ticked
+    for `threshold` seconds past its due time it samples the loop thread's
+    stack, which shows the code that is blocking it while it still is.
+
+    Args:
+        interval: Seconds between ticks
+        threshold: Lag in seconds that triggers a stack sample
+        window: Seconds of samples kept for the rolling max and p99
+    """
+
+    def __init__(self, interval: float = 0.5, threshold: float = 0.25, window: float = 60.0):
+        self.interval = interval
+        self.threshold = threshold
+        self.histogram = Histogram('event_loop_lag_seconds', "Event loop scheduling lag per tick.",
+                                   buckets=LAG_BUCKETS)
+        self.recent = deque(maxlen=max(1, int(window / interval)))
+        self.stalls = 0
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+        self._loop_thread_id: Optional[int] = None
+        self._due = 0.0
+        self._sampled_due = None
+
+    def start(self):
+        self._loop_thread_id = threading.get_ident()
+        self._due = time.monotonic() + self.interval
+        self._stopped.clear()
+        self._task = asyncio.create_task(self._tick())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-lag-watchdog", daemon=True)
+        self._watchdog.start()
+        logger.info(f"Loop lag monitor started (interval {self.interval}s, threshold {self.threshold}s)")
+
+    async def stop(self):
+        self._stopped.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _tick(self):
+        while True:
+            self._due = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.monotonic() - self._due)
+            self.histogram.observe(lag)
+            self.recent.append(lag)
+            if lag >= self.threshold:
+                self.stalls += 1
+                logger.warning(f"Event loop lagged {lag * 1000:.0f}ms")
+
+    def _watch(self):
+        while not self._stopped.wait(self.threshold / 2):
+            due = self._due
+            late = time.monotonic() - due
+            if late < self.threshold or self._sampled_due == due:
+                continue
+            # One sample per stall: the loop is stuck on the same tick
+            self._sampled_due = due
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            stack = "".join(traceback.format_stack(frame))
+            logger.warning(f"Event loop blocked for {late * 1000:.0f}ms so far; loop thread stack:\n{stack}")
+
+    @property
+    def max_lag(self) -> float:
+        return max(self.recent, default=0.0)
+
+    def percentile(self, pct: float) -> float:
+        if not self.recent:
+            return 0.0
+        ordered = sorted(self.recent)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+    def write(self, writer: PrometheusWriter):
+        self.histogram.write(writer)
+        writer.metric('event_loop_lag_max_seconds', 'gauge', "Highest lag in the rolling window.", self.max_lag)
+        writer.metric('event_loop_lag_p99_seconds', 'gauge', "99th percentile lag in the rolling window.",
+                      self.percentile(99))
+        writer.metric('event_loop_stalls_total', 'counter', "Ticks that lagged past the threshold.", self.stalls)
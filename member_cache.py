@@ -0,0 +1,74 @@
+import asyncio
+import logging
+import time
+from typing import Dict
+
+import discord
+
+logger = logging.getLogger('BotAutomation.MemberCache')
+
+MEMBER_CACHE_POLICIES = ("all", "joined", "none")
+
+
+def member_cache_flags(policy: str, intents: discord.Intents) -> discord.MemberCacheFlags:
+    """
+    MemberCacheFlags for a cache policy
+
+    Args:
+        policy: "all" keeps discord.py's default for the intents, "joined" only
+            keeps members seen joining or chunked (no voice tracking), "none"
+            keeps only members loaded by an explicit chunk
+        intents: The intents the bot connects with
+
+    Returns:
+        discord.MemberCacheFlags: Flags to pass to the client
+    """
+    if policy == "all":
+        return discord.MemberCacheFlags.from_intents(intents)
+    if policy == "joined":
+        return discord.MemberCacheFlags(voice=False, joined=True)
+    if policy == "none":
+        return discord.MemberCacheFlags.none()
+    raise ValueError(f"Unknown member cache policy: {policy}")
+
+
+class GuildChunker:
+    """
+    Requests a guild's member list the first time it is needed instead of at startup
+
+    Concurrent callers share one chunk request per guild. Callers only wait
+    `wait` seconds so an interaction can still be answered in time; the
+    request keeps running and later calls see the full member list.
+    """
+
+    def __init__(self, wait: float = 1.0):
+        self.wait = wait
+        self._tasks: Dict[int, asyncio.Task] = {}
+
+    async def ensure(self, guild) -> bool:
+        """Start chunking the guild if needed; True if its member list is complete"""
+        if getattr(guild, 'chunked', True):
+            return True
+        task = self._tasks.get(guild.id)
+        if task is None:
+            task = self._tasks[guild.id] = asyncio.create_task(self._chunk(guild))
+        try:
+            await asyncio.wait_for(asyncio.shield(task), self.wait)
+        except asyncio.TimeoutError:
+            logger.info(f"Guild {guild.id} is still chunking, using the {len(guild.members)} cached member(s)")
+        return guild.chunked
+
+    async def _chunk(self, guild):
+        started = time.perf_counter()
+        try:
+            members = await guild.chunk(cache=True)
+            logger.info(f"Chunked {len(members)} member(s) in guild {guild.id} in {time.perf_counter() - started:.2f}s")
+        except Exception as e:
+            logger.warning(f"Failed to chunk guild {guild.id}: {str(e)}")
+        finally:
+            self._tasks.pop(guild.id, None)
+
+    def drop_guild(self, guild_id: int):
+        task = self._tasks.pop(guild_id, None)
+        if task is not None:
+            task.cancel()
@@ -0,0 +1,280 @@
+import enum
+import random
+import logging
+from array import array
+from typing import Dict, List, Optional
+
+logger = logging.getLogger('BotAutomation.MemberIndex')
+
+
+class TargetIndex:
+    """Compact set of member IDs with O(1) add, swap-remove and random sampling"""
+
+    def __init__(self):
+        self._ids = array('Q')
+        self._pos: Dict[int, int] = {}
+
+    def add(self, member_id: int):
+        if member_id in self._pos:
+            return
+        self._pos[member_id] = len(self._ids)
+        self._ids.append(member_id)
+
+    def discard(self, member_id: int):
+        index = self._pos.pop(member_id, None)
+        if index is None:
+            return
+        last = self._ids.pop()
+        if index < len(self._ids):
+            self._ids[index] = last
+            self._pos[last] = index
+
+    def sample(self, exclude: Optional[int] = None, attempts: int = 8) -> Optional[int]:
+        """
+        Pick a random member ID, using rejection sampling to skip `exclude`
+
+        Returns:
+            Optional[int]: A member ID, or None if no other member is indexed
+        """
+        size = len(self._ids)
+        if size == 0 or (size == 1 and self._ids[0] == exclude):
+            return None
+        for _ in range(attempts):
+            member_id = self._ids[random.randrange(size)]
+            if member_id != exclude:
+                return member_id
+        # Only reachable in tiny guilds; fall back to a linear scan
+        for member_id in self._ids:
+            if member_id != exclude:
+                return member_id
+        return None
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, member_id: int) -> bool:
+        return member_id in self._pos
+
+
+class GuildTargetIndex:
+    """
+    Per-guild index of members who can be picked as robbery targets (non-bot humans)
+
+    Each guild's index is built from guild.members the first time it is needed and
+    kept current from member join/remove/update events afterwards.
+    """
+
+    def __init__(self):
+        self._guilds: Dict[int, TargetIndex] = {}
+        self._complete: Dict[int, bool] = {}
+
+    @staticmethod
+    def is_eligible(member) -> bool:
+        return not member.bot
+
+    def for_guild(self, guild) -> TargetIndex:
+        index = self._guilds.get(guild.id)
+        chunked = getattr(guild, 'chunked', True)
+        # Rebuild once if the first build happened before the member list was fully loaded
+        if index is None or (chunked and not self._complete.get(guild.id)):
+            index = TargetIndex()
+            for member in guild.members:
+                if self.is_eligible(member):
+                    index.add(member.id)
+            self._guilds[guild.id] = index
+            self._complete[guild.id] = chunked
+            logger.info(f"Indexed {len(index)} eligible target(s) in guild {guild.id}")
+        return index
+
+    def pick(self, guild, exclude_id: Optional[int] = None):
+        """Return a random eligible member other than exclude_id, or None"""
+        index = self.for_guild(guild)
+        while len(index):
+            member_id = index.sample(exclude=exclude_id)
+            if member_id is None:
+                return None
+            member = guild.get_member(member_id)
+            if member is not None:
+                return member
+            # Member left the cache without us seeing the event
+            index.discard(member_id)
+        return None
+
+    def add_member(self, member):
+        index = self._guilds.get(member.guild.id)
+        if index is not None and self.is_eligible(member):
+            index.add(member.id)
+
+    def remove_member(self, member):
+        index = self._guilds.get(member.guild.id)
+        if index is not None:
+            index.discard(member.id)
+
+    def update_member(self, before, after):
+        index = self._guilds.get(after.guild.id)
+        if index is None:
+            return
+        if self.is_eligible(after):
+            index.add(after.id)
+        else:
+            index.discard(after.id)
+
+    def drop_guild(self, guild_id: int):
+        self._guilds.pop(guild_id, None)
+        self._complete.pop(guild_id, None)
+
+
+class Weapon(enum.IntFlag):
+    NONE = 0
+    WOOZIE = 1
+    GLOCK = 2
+    SHOTGUN = 4
+    UZI = 8
+
+
+# Normalized role name -> weapon flag
+WEAPON_ROLES = {
+    "woozie": Weapon.WOOZIE,
+    "glock": Weapon.GLOCK,
+    "shotgun": Weapon.SHOTGUN,
+    "uzi": Weapon.UZI,
+}
+
+
+class WeaponFlags:
+    """Weapon bitmasks for one guild's members, stored one byte per member in an array"""
+
+    def __init__(self, role_flags: Dict[int, int]):
+        self.role_flags = role_flags
+        self._slots: Dict[int, int] = {}
+        self._flags = array('B')
+        self._free: List[int] = []
+        self._counts = array('I', [0] * len(WEAPON_ROLES))
+        self.armed = 0
+
+    def compute(self, member) -> int:
+        flags = 0
+        for role in member.roles:
+            flags |= self.role_flags.get(role.id, 0)
+        return flags
+
+    def get(self, member_id: int) -> Optional[int]:
+        slot = self._slots.get(member_id)
+        return None if slot is None else self._flags[slot]
+
+    def set(self, member_id: int, flags: int):
+        slot = self._slots.get(member_id)
+        if slot is None:
+            if self._free:
+                slot = self._free.pop()
+                self._flags[slot] = 0
+            else:
+                slot = len(self._flags)
+                self._flags.append(0)
+            self._slots[member_id] = slot
+        self._count(self._flags[slot], -1)
+        self._flags[slot] = flags
+        self._count(flags, 1)
+
+    def remove(self, member_id: int):
+        slot = self._slots.pop(member_id, None)
+        if slot is not None:
+            self._count(self._flags[slot], -1)
+            self._flags[slot] = 0
+            self._free.append(slot)
+
+    def count(self, weapon: Weapon) -> int:
+        return self._counts[weapon.bit_length() - 1]
+
+    def _count(self, flags: int, step: int):
+        if not flags:
+            return
+        self.armed += step
+        for bit in range(len(self._counts)):
+            if flags & (1 << bit):
+                self._counts[bit] += step
+
+
+class GuildWeaponIndex:
+    """
+    Per-guild index of which weapon roles each member holds
+
+    A target's weapons are a bitmask lookup instead of a scan of member.roles,
+    and "how many armed users are there" is a counter read. Role changes in a
+    guild invalidate its index; member events keep it current otherwise. The
+    invoker's own roles are rechecked with refresh(), since a missed event
+    there would let them use a weapon they no longer hold.
+    """
+
+    def __init__(self, roles):
+        self.roles = roles
+        self._guilds: Dict[int, WeaponFlags] = {}
+        self._complete: Dict[int, bool] = {}
+
+    def _role_flags(self, guild) -> Dict[int, int]:
+        role_flags = {}
+        for name, weapon in WEAPON_ROLES.items():
+            role = self.roles.get(guild, name)
+            if role is not None:
+                role_flags[role.id] = int(weapon)
+        return role_flags
+
+    def for_guild(self, guild) -> WeaponFlags:
+        index = self._guilds.get(guild.id)
+        chunked = getattr(guild, 'chunked', True)
+        if index is None or (chunked and not self._complete.get(guild.id)):
+            index = WeaponFlags(self._role_flags(guild))
+            if index.role_flags:
+                for member in guild.members:
+                    flags = index.compute(member)
+                    if flags:
+                        index.set(member.id, flags)
+            self._guilds[guild.id] = index
+            self._complete[guild.id] = chunked
+            logger.info(f"Indexed {index.armed} armed member(s) in guild {guild.id}")
+        return index
+
+    def refresh(self, member) -> Weapon:
+        """
+        Weapon flags recomputed from a member object known to be current, e.g. an interaction's
+
+        The member's entry is updated too, which corrects any role change whose
+        member update event was missed (uncached members, re-identifies).
+        """
+        index = self.for_guild(member.guild)
+        flags = index.compute(member)
+        if index.get(member.id) != flags:
+            index.set(member.id, flags)
+        return Weapon(flags)
+
+    def flags(self, member) -> Weapon:
+        """Weapon flags held by a member, as last indexed"""
+        index = self.for_guild(member.guild)
+        flags = index.get(member.id)
+        if flags is None:
+            flags = index.compute(member)
+            index.set(member.id, flags)
+        return Weapon(flags)
+
+    def armed_count(self, guild, weapon: Optional[Weapon] = None) -> int:
+        """Number of members holding any weapon role, or a specific one"""
+        index = self.for_guild(guild)
+        return index.armed if weapon is None else index.count(weapon)
+
+    def update_member(self, before, after):
+        index = self._guilds.get(after.guild.id)
+        if index is None:
+            return
+        index.set(after.id, index.compute(after))
+
+    def add_member(self, member):
+        self.update_member(None, member)
+
+    def remove_member(self, member):
+        index = self._guilds.get(member.guild.id)
+        if index is not None:
+            index.remove(member.id)
+
+    def invalidate(self, guild_id: int):
+        self._guilds.pop(guild_id, None)
+        self._complete.pop(guild_id, None)
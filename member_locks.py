@@ -0,0 +1,93 @@
+import asyncio
+import logging
+import weakref
+from contextlib import asynccontextmanager
+from typing import Optional
+
+logger = logging.getLogger('BotAutomation.MemberLocks')
+
+
+class LockTimeout(Exception):
+    """Raised when a member's lock could not be taken before the timeout"""
+
+
+class MemberLocks:
+    """
+    Hands out one asyncio.Lock per (guild_id, user_id)
+
+    Locks are kept in a WeakValueDictionary, so a lock disappears as soon as
+    nobody holds or waits on it and memory only grows with the members that
+    are busy right now. Several members are always locked in sorted key order,
+    so two robberies of each other can't deadlock.
+    """
+
+    def __init__(self, timeout: float = 2.0):
+        self.timeout = timeout
+        self._locks = weakref.WeakValueDictionary()
+
+    def _lock(self, key) -> asyncio.Lock:
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._locks[key] = lock
+        return lock
+
+    def locked(self, guild_id, user_id) -> bool:
+        """True if the member's lock is held or already has someone waiting for it"""
+        lock = self._locks.get((int(guild_id), int(user_id)))
+        return lock is not None and _busy(lock)
+
+    @asynccontextmanager
+    async def hold(self, guild_id, *user_ids, timeout: Optional[float] = None):
+        """
+        Hold the locks of every listed member in the guild
+
+        Args:
+            guild_id: Guild the members belong to
+            user_ids: Members to lock; duplicates are ignored
+            timeout: Seconds to wait for all locks (defaults to the manager's timeout)
+
+        Raises:
+            LockTimeout: If the locks could not all be taken in time
+        """
+        keys = sorted({(int(guild_id), int(user_id)) for user_id in user_ids})
+        # Strong references keep the locks alive while we hold or wait on them
+        locks = [self._lock(key) for key in keys]
+        timeout = self.timeout if timeout is None else timeout
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        acquired = []
+        try:
+            for key, lock in zip(keys, locks):
+                if not _busy(lock):
+                    # Free with nobody queued, so this returns without waiting
+                    await lock.acquire()
+                else:
+                    remaining = deadline - loop.time()
+                    try:
+                        if remaining <= 0:
+                            raise asyncio.TimeoutError
+                        await asyncio.wait_for(lock.acquire(), remaining)
+                    except asyncio.TimeoutError:
+                        logger.warning(f"Timed out after {timeout:.1f}s waiting for member {key[1]} in guild {key[0]}")
+                        raise LockTimeout(f"Member {key[1]} is busy") from None
+                acquired.append(lock)
+        except BaseException:
+            for lock in reversed(acquired):
+                lock.release()
+            raise
+
+        try:
+            yield
+        finally:
+            for lock in reversed(acquired):
+                lock.release()
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+
+def _busy(lock: asyncio.Lock) -> bool:
+    # Right after a release the lock reports unlocked while a woken waiter still
+    # owns the next turn; a newcomer would queue behind it with no timeout
+    return lock.locked() or bool(getattr(lock, '_waiters', None))
@@ -0,0 +1,143 @@
+import math
+from bisect import bisect_left
+from typing import Dict, List, Optional, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+# Seconds; covers sub-10ms cache hits up to the 15s encounter deadline
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 3.0, 5.0, 10.0, 15.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def _format_labels(labels: Optional[Dict[str, object]]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+class PrometheusWriter:
+    """Builds a Prometheus text exposition, one metric family at a time"""
+
+    def __init__(self):
+        self._lines: List[str] = []
+
+    def family(self, name: str, kind: str, help_text: str):
+        self._lines.append(f"# HELP {name} {help_text}")
+        self._lines.append(f"# TYPE {name} {kind}")
+
+    def sample(self, name: str, value: float, labels: Optional[Dict[str, object]] = None):
+        self._lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+
+    def metric(self, name: str, kind: str, help_text: str, value: float,
+               labels: Optional[Dict[str, object]] = None):
+        """A family with a single sample"""
+        self.family(name, kind, help_text)
+        self.sample(name, value, labels)
+
+    def render(self) -> str:
+        return "\n".join(self._lines) + "\n"
+
+
+class Counter:
+    """Monotonic counter with one value per label combination"""
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, *label_values, amount: float = 1):
+        self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def value(self, *label_values) -> float:
+        return self._values.get(label_values, 0)
+
+    def items(self):
+        return self._values.items()
+
+    def write(self, writer: PrometheusWriter):
+        writer.family(self.name, 'counter', self.help_text)
+        for label_values, value in sorted(self._values.items(), key=lambda item: item[0]):
+            writer.sample(self.name, value, dict(zip(self.labels, label_values)))
+
+
+class _Buckets:
+    __slots__ = ('counts', 'sum', 'count')
+
+    def __init__(self, size: int):
+        self.counts = [0] * size
+        self.sum = 0.0
+        self.count = 0
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram with one set of buckets per label combination
+
+    An observation is one bisect and three additions; buckets are only made
+    cumulative when exported.
+    """
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.bounds = tuple(sorted(buckets))
+        self._series: Dict[Tuple, _Buckets] = {}
+
+    def observe(self, value: float, *label_values):
+        series = self._series.get(label_values)
+        if series is None:
+            # The last slot counts observations above every bound (+Inf)
+            series = self._series[label_values] = _Buckets(len(self.bounds) + 1)
+        series.counts[bisect_left(self.bounds, value)] += 1
+        series.sum += value
+        series.count += 1
+
+    def series(self):
+        return self._series.keys()
+
+    def count(self, *label_values) -> int:
+        series = self._series.get(label_values)
+        return series.count if series else 0
+
+    def quantile(self, q: float, *label_values) -> Optional[float]:
+        """Estimate a quantile by interpolating inside the bucket it falls in"""
+        series = self._series.get(label_values)
+        if not series or not series.count:
+            return None
+        rank = q * series.count
+        seen = 0
+        for index, count in enumerate(series.counts):
+            if count and seen + count >= rank:
+                if index == len(self.bounds):
+                    return self.bounds[-1]
+                lower = self.bounds[index - 1] if index else 0.0
+                return lower + (self.bounds[index] - lower) * (rank - seen) / count
+            seen += count
+        return self.bounds[-1]
+
+    def write(self, writer: PrometheusWriter):
+        writer.family(self.name, 'histogram', self.help_text)
+        for label_values, series in sorted(self._series.items(), key=lambda item: item[0]):
+            labels = dict(zip(self.labels, label_values))
+            cumulative = 0
+            for bound, count in zip(self.bounds + (math.inf,), series.counts):
+                cumulative += count
+                writer.sample(f"{self.name}_bucket", cumulative, {**labels, 'le': _format_value(bound)})
+            writer.sample(f"{self.name}_sum", series.sum, labels)
+            writer.sample(f"{self.name}_count", series.count, labels)
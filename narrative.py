@@ -0,0 +1,106 @@
+import logging
+from typing import Dict, List, Optional
+
+logger = logging.getLogger('BotAutomation.Narrative')
+
+FOLLOWUP = "followup"
+EDIT = "edit"
+MODES = (FOLLOWUP, EDIT)
+
+
+class FollowupRenderer:
+    """Posts every narrative line and the aftermath as its own followup message"""
+
+    def __init__(self, interaction):
+        self.interaction = interaction
+
+    async def intro(self, text: str):
+        # A deferred interaction (see rob) already has its response; the intro replaces the "thinking" state
+        if self.interaction.response.is_done():
+            await self.interaction.followup.send(text)
+        else:
+            await self.interaction.response.send_message(text)
+
+    async def line(self, text: str):
+        await self.interaction.followup.send(text)
+
+    async def finish(self, text: Optional[str] = None):
+        if text:
+            await self.interaction.followup.send(text)
+
+
+class EditRenderer:
+    """
+    Posts one message and grows it by editing it in place
+
+    Lines are buffered and revealed `lines_per_edit` at a time, and the aftermath
+    is folded into the last edit, so an encounter costs a couple of REST calls
+    instead of one per line.
+    """
+
+    def __init__(self, interaction, lines_per_edit: int = 2):
+        self.interaction = interaction
+        self.lines_per_edit = max(1, lines_per_edit)
+        self._lines: List[str] = []
+        self._pending = 0
+
+    async def intro(self, text: str):
+        self._lines.append(text)
+        if self.interaction.response.is_done():
+            await self.interaction.edit_original_response(content=text)
+        else:
+            await self.interaction.response.send_message(text)
+
+    async def line(self, text: str):
+        self._lines.append(text)
+        self._pending += 1
+        if self._pending >= self.lines_per_edit:
+            await self._flush()
+
+    async def finish(self, text: Optional[str] = None):
+        if text:
+            self._lines.append(text)
+            self._pending += 1
+        if self._pending:
+            await self._flush()
+
+    async def _flush(self):
+        self._pending = 0
+        await self.interaction.edit_original_response(content="\n".join(self._lines))
+
+
+class NarrativeModes:
+    """Which renderer each guild uses, with a global default"""
+
+    def __init__(self, default: str = FOLLOWUP, overrides: Optional[Dict[int, str]] = None,
+                 lines_per_edit: int = 2):
+        if default not in MODES:
+            raise ValueError(f"Unknown narrative mode: {default}")
+        self.default = default
+        self.lines_per_edit = lines_per_edit
+        self._overrides: Dict[int, str] = dict(overrides or {})
+
+    def get(self, guild_id: int) -> str:
+        return self._overrides.get(guild_id, self.default)
+
+    def set(self, guild_id: int, mode: str):
+        if mode not in MODES:
+            raise ValueError(f"Unknown narrative mode: {mode}")
+        self._overrides[guild_id] = mode
+        logger.info(f"Narrative mode for guild {guild_id} set to {mode}")
+
+    def renderer(self, interaction):
+        if self.get(interaction.guild_id) == EDIT:
+            return EditRenderer(interaction, self.lines_per_edit)
+        return FollowupRenderer(interaction)
+
+
+def parse_overrides(value: str) -> Dict[int, str]:
+    """Parse 'guild_id:mode,guild_id:mode' into a dict"""
+    overrides = {}
+    for item in filter(None, (part.strip() for part in (value or "").split(','))):
+        guild_id, _, mode = item.partition(':')
+        if mode not in MODES:
+            raise ValueError(f"Unknown narrative mode for guild {guild_id}: {mode}")
+        overrides[int(guild_id)] = mode
+    return overrides
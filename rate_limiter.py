@@ -0,0 +1,245 @@
+import asyncio
+import time
+import logging
+from typing import Dict, Mapping, Optional
+
+logger = logging.getLogger('BotAutomation.RateLimiter')
+
+
+class RateLimitExceeded(Exception):
+    """Raised when a request cannot be scheduled before its deadline or the queue is full"""
+
+
+class TokenBucket:
+    """Client-side token bucket, used as an optional ceiling below the server's limit"""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        elapsed = now - self.updated
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self.updated = now
+
+    def delay(self, now: float) -> float:
+        """Seconds until a token is available (0 if one can be taken now)"""
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def consume(self):
+        self.tokens -= 1
+
+
+class RouteLimit:
+    """
+    Rate-limit state of one API route, as reported by the server
+
+    Until the first response arrives only that one request is sent, so a burst
+    can't overrun a limit nobody knows yet. After that nothing is throttled
+    until the server says so: X-RateLimit-Limit, -Remaining and -Reset describe
+    the current window, requests sent since the last response are counted
+    against Remaining, and once it reaches zero requests wait for Reset, after
+    which the window refills to Limit. A 429 blocks the route for its Retry-After.
+    """
+
+    def __init__(self, ceiling: Optional[TokenBucket] = None):
+        self.ceiling = ceiling
+        self.limit: Optional[int] = None
+        self.remaining: Optional[int] = None
+        self.reset_at = 0.0
+        self.window = 0.0
+        self.blocked_until = 0.0
+        self.waiting = 0
+        self.lock = asyncio.Lock()
+        self.probing = False
+        self.learned = asyncio.Event()
+
+    def delay(self, now: float) -> float:
+        """Seconds until a request may be sent (0 if it can go now)"""
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        if self.remaining is not None and now >= self.reset_at:
+            # The window has reset; assume the full limit until the next response says otherwise
+            self.remaining = self.limit
+            self.reset_at = now + self.window
+        if self.remaining is not None and self.remaining <= 0:
+            return self.reset_at - now
+        if self.ceiling is not None:
+            return self.ceiling.delay(now)
+        return 0.0
+
+    def consume(self):
+        if not self.learned.is_set():
+            self.probing = True
+        if self.remaining is not None:
+            self.remaining -= 1
+        if self.ceiling is not None:
+            self.ceiling.consume()
+
+    def update(self, limit: Optional[int], remaining: Optional[int], reset_after: Optional[float]):
+        now = time.monotonic()
+        self.learned.set()
+        if limit is not None:
+            self.limit = max(1, limit)
+        if remaining is None or reset_after is None:
+            return
+        reset_at = now + reset_after
+        self.window = max(self.window, reset_after)
+        if self.remaining is None:
+            self.remaining = remaining
+            self.reset_at = reset_at
+        elif reset_at > self.reset_at - self.window / 2:
+            # Requests still in flight are already counted locally, so a response
+            # can lower the count but never raise it; the window is refilled
+            # locally at reset, and the server's reset time replaces our estimate
+            self.remaining = min(self.remaining, remaining)
+            self.reset_at = max(self.reset_at, reset_at)
+        # Anything older is a late response from a window that has already reset
+        if self.limit is None:
+            self.limit = max(1, remaining)
+
+    def release(self):
+        """Give back the slot of a request that was acquired but never sent"""
+        self.learned.set()
+        if self.remaining is not None and self.limit is not None:
+            self.remaining = min(self.limit, self.remaining + 1)
+        if self.ceiling is not None:
+            self.ceiling.tokens = min(self.ceiling.capacity, self.ceiling.tokens + 1)
+
+    def block(self, seconds: float):
+        """Stop sending for the given number of seconds"""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+
+class RateLimitScheduler:
+    """
+    Per-route request scheduler for the UnbelievaBoat API
+
+    Requests go out as fast as they are made until the server's rate-limit
+    headers say a route's window is used up, or a 429 puts it into cooldown;
+    they then wait in a bounded FIFO queue and are released in order as soon
+    as the window opens again. `rate` (requests per second, 0 for none) and
+    `burst` optionally cap each route below the server's limit.
+    """
+
+    def __init__(self, rate: float = 0.0, burst: int = 10, max_queue: int = 100, deadline: float = 15.0):
+        self.rate = rate
+        self.burst = burst
+        self.max_queue = max_queue
+        self.deadline = deadline
+        self._routes: Dict[str, RouteLimit] = {}
+
+    @property
+    def queued(self) -> int:
+        """Requests currently waiting to be sent, across every route"""
+        return sum(route.waiting for route in self._routes.values())
+
+    def _route(self, key: str) -> RouteLimit:
+        route = self._routes.get(key)
+        if route is None:
+            ceiling = TokenBucket(self.rate, max(1, self.burst)) if self.rate > 0 else None
+            route = self._routes[key] = RouteLimit(ceiling)
+        return route
+
+    async def acquire(self, route: str, deadline: Optional[float] = None):
+        """
+        Wait for permission to send one request on a route
+
+        Args:
+            route (str): Rate-limit route key
+            deadline (Optional[float]): Absolute time.monotonic() deadline; defaults to now + self.deadline
+
+        Raises:
+            RateLimitExceeded: If the queue is full or the deadline would pass while waiting
+        """
+        if deadline is None:
+            deadline = time.monotonic() + self.deadline
+
+        limit = self._route(route)
+        if limit.waiting >= self.max_queue:
+            raise RateLimitExceeded(f"Request queue for {route} is full ({self.max_queue} waiting)")
+
+        limit.waiting += 1
+        try:
+            async with limit.lock:
+                while True:
+                    now = time.monotonic()
+                    if limit.probing and not limit.learned.is_set():
+                        try:
+                            await asyncio.wait_for(limit.learned.wait(), deadline - now)
+                        except asyncio.TimeoutError:
+                            raise RateLimitExceeded(f"Deadline reached waiting for the first response on {route}")
+                        continue
+                    delay = limit.delay(now)
+                    if delay <= 0:
+                        limit.consume()
+                        return
+                    if now + delay > deadline:
+                        raise RateLimitExceeded(f"Deadline reached waiting {delay:.2f}s for {route}")
+                    await asyncio.sleep(delay)
+        finally:
+            limit.waiting -= 1
+
+    def update(self, route: str, headers: Mapping[str, str]):
+        """
+        Track a route's window from X-RateLimit-* response headers
+
+        Call it after every attempt; pass empty headers when no response arrived
+        so a failed first request doesn't hold up the route.
+        """
+        try:
+            limit = headers.get('X-RateLimit-Limit')
+            remaining = headers.get('X-RateLimit-Remaining')
+            reset = headers.get('X-RateLimit-Reset')
+            self._route(route).update(
+                int(limit) if limit is not None else None,
+                int(remaining) if remaining is not None else None,
+                _seconds_until(float(reset)) if reset is not None else None
+            )
+        except ValueError:
+            logger.debug(f"Ignoring malformed rate-limit headers for {route}: {dict(headers)}")
+            self._route(route).update(None, None, None)
+
+    def release(self, route: str):
+        """
+        Hand back a request acquire() let through but that was never sent
+
+        Otherwise a first request that never goes out would leave the route
+        waiting for a response that can't arrive.
+        """
+        self._route(route).release()
+
+    def on_rate_limited(self, route: str, retry_after: float):
+        """Put a route into cooldown after a 429 response"""
+        logger.warning(f"Rate limited on {route}. Queuing requests for {retry_after:.2f} seconds")
+        limit = self._route(route)
+        limit.block(retry_after)
+        if limit.remaining is not None:
+            limit.remaining = 0
+
+
+def parse_retry_after(value: Optional[str], default: float = 1.0) -> float:
+    """Parse a Retry-After header value into seconds"""
+    if value is None:
+        return default
+    try:
+        seconds = float(value)
+    except ValueError:
+        return default
+    # UnbelievaBoat reports some delays in milliseconds
+    if seconds > 1000:
+        seconds /= 1000
+    return max(0.0, seconds)
+
+
+def _seconds_until(reset: float) -> float:
+    # X-RateLimit-Reset is an epoch timestamp, in milliseconds on UnbelievaBoat
+    if reset > 1e11:
+        reset /= 1000
+    return max(0.0, reset - time.time())
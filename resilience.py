@@ -0,0 +1,197 @@
+import asyncio
+import random
+import time
+import logging
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from balance_cache import TTLCache
+
+logger = logging.getLogger('BotAutomation.Resilience')
+
+# Statuses where the request was turned away before UnbelievaBoat acted on it. A 502 or 504
+# means a gateway forwarded the request and lost the reply, so those may have been applied
+RETRYABLE_STATUSES = frozenset({503})
+# Methods that are safe to resend even when we can't tell whether the first attempt landed
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD"})
+
+
+class CircuitOpenError(Exception):
+    """Raised when the circuit breaker is rejecting calls to a failing upstream"""
+
+
+class OutcomeUnknownError(Exception):
+    """Raised when a mutation may or may not have been applied (timeout, dropped connection, 5xx)"""
+
+
+class RetryPolicy:
+    """Bounded exponential backoff with full jitter"""
+
+    def __init__(self, max_attempts: int = 3, base_delay: float = 0.25, max_delay: float = 4.0):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def backoff(self, attempt: int) -> float:
+        """Delay before retry number `attempt` (1-based)"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** (attempt - 1))))
+
+    def should_retry(self, method: str, attempt: int, status: Optional[int] = None,
+                     connected: bool = True) -> bool:
+        """
+        Decide whether a failed attempt may be sent again
+
+        Mutations are only retried when the failure proves they were not applied:
+        the connection was never established, or a 503 came back. Anything
+        ambiguous (timeouts, dropped connections, other 5xx) is only retried
+        for idempotent methods; for a mutation the caller gets OutcomeUnknownError
+        and has to find out what happened before sending it again.
+
+        Args:
+            method (str): HTTP method
+            attempt (int): Attempt that just failed (1-based)
+            status (Optional[int]): HTTP status, if a response was received
+            connected (bool): Whether a connection to the server was established
+        """
+        if attempt >= self.max_attempts:
+            return False
+        if method in IDEMPOTENT_METHODS:
+            return status is None or status >= 500
+        if not connected:
+            return True
+        return status in RETRYABLE_STATUSES
+
+
+class CircuitBreaker:
+    """
+    Fails fast once the upstream error rate crosses a threshold
+
+    Closed: calls flow and outcomes are tracked over a rolling window.
+    Open: calls are rejected until reset_timeout passes.
+    Half-open: a single probe call is let through; its outcome closes or re-opens the circuit.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: float = 0.5, min_calls: int = 10, window: float = 30.0,
+                 reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.min_calls = min_calls
+        self.window = window
+        self.reset_timeout = reset_timeout
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._outcomes = deque()  # (timestamp, failed)
+
+    @property
+    def state(self) -> str:
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._state = self.HALF_OPEN
+            self._probe_in_flight = False
+        return self._state
+
+    @property
+    def is_open(self) -> bool:
+        return self.state == self.OPEN
+
+    def allow(self) -> bool:
+        """
+        Check whether a call may go out
+
+        Returns:
+            bool: True if the call is the half-open probe; pass it to end_probe() once the call is over
+
+        Raises:
+            CircuitOpenError: If the circuit is open, or half-open with a probe already in flight
+        """
+        state = self.state
+        if state == self.OPEN:
+            raise CircuitOpenError("UnbelievaBoat API circuit is open")
+        if state == self.HALF_OPEN:
+            if self._probe_in_flight:
+                raise CircuitOpenError("UnbelievaBoat API circuit is half-open, probe in flight")
+            self._probe_in_flight = True
+            return True
+        return False
+
+    def end_probe(self, probe: bool):
+        """
+        Let another probe through if this one ended without recording an outcome
+
+        Args:
+            probe (bool): What allow() returned for the call
+        """
+        if probe and self._state == self.HALF_OPEN:
+            self._probe_in_flight = False
+
+    def record_success(self):
+        if self._state == self.HALF_OPEN:
+            logger.info("UnbelievaBoat API probe succeeded, closing circuit")
+            self._state = self.CLOSED
+            self._outcomes.clear()
+        self._record(False)
+
+    def record_failure(self):
+        if self._state == self.HALF_OPEN:
+            self._open()
+            return
+        self._record(True)
+        failures = sum(1 for _, failed in self._outcomes if failed)
+        if len(self._outcomes) >= self.min_calls and failures / len(self._outcomes) >= self.failure_threshold:
+            self._open()
+
+    def _record(self, failed: bool):
+        now = time.monotonic()
+        self._outcomes.append((now, failed))
+        while self._outcomes and now - self._outcomes[0][0] > self.window:
+            self._outcomes.popleft()
+
+    def _open(self):
+        logger.error(f"UnbelievaBoat API error rate too high, opening circuit for {self.reset_timeout:.0f} seconds")
+        self._state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._probe_in_flight = False
+        self._outcomes.clear()
+
+
+class IdempotencyGuard:
+    """
+    Deduplicates keyed mutations within this process
+
+    A key that already completed returns its stored response without sending
+    anything, and a key that is still in flight shares the original request.
+    Only successes are remembered: a key whose call failed or ended with
+    OutcomeUnknownError can be sent again, so callers must only resend
+    mutations they know were not applied.
+    """
+
+    def __init__(self, ttl: float = 3600.0, max_size: int = 50000):
+        self._completed = TTLCache(ttl=ttl, max_size=max_size)
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    async def run(self, key: Optional[str], func: Callable[[], Awaitable[Any]]) -> Any:
+        if key is None:
+            return await func()
+
+        completed = self._completed.get(key)
+        if completed is not None:
+            logger.info(f"Skipping duplicate mutation {key}, already applied")
+            return completed
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            return await asyncio.shield(inflight)
+
+        task = asyncio.ensure_future(func())
+        self._inflight[key] = task
+        task.add_done_callback(lambda finished: self._finish(key, finished))
+        return await asyncio.shield(task)
+
+    def _finish(self, key: str, task: asyncio.Future):
+        # Runs even if every caller gave up, so a late success is still remembered
+        self._inflight.pop(key, None)
+        if not task.cancelled() and task.exception() is None and task.result() is not None:
+            self._completed.set(key, task.result())
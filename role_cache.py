@@ -0,0 +1,45 @@
+import logging
+from typing import Dict
+
+logger = logging.getLogger('BotAutomation.RoleCache')
+
+
+class RoleCache:
+    """
+    Per-guild map of normalized role names to role IDs
+
+    Built from guild.roles the first time a guild is looked up and thrown away
+    whenever a role in that guild is created, updated or deleted, so each lookup
+    is a dictionary hit instead of a scan over every role.
+    """
+
+    def __init__(self):
+        self._guilds: Dict[int, Dict[str, int]] = {}
+
+    @staticmethod
+    def normalize(name: str) -> str:
+        return name.strip().lower()
+
+    def _names(self, guild) -> Dict[str, int]:
+        names = self._guilds.get(guild.id)
+        if names is None:
+            names = {}
+            for role in guild.roles:
+                # Keep the first match, like discord.utils.get would
+                names.setdefault(self.normalize(role.name), role.id)
+            self._guilds[guild.id] = names
+        return names
+
+    def get(self, guild, name: str):
+        """Return the guild's role with this name (case-insensitive), or None"""
+        role_id = self._names(guild).get(self.normalize(name))
+        if role_id is None:
+            return None
+        role = guild.get_role(role_id)
+        if role is None:
+            # Role vanished without an event reaching us; rebuild on next lookup
+            self.invalidate(guild.id)
+        return role
+
+    def invalidate(self, guild_id: int):
+        self._guilds.pop(guild_id, None)
@@ -0,0 +1,289 @@
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+from journal import FAILED, SettlementJournal
+from resilience import OutcomeUnknownError
+
+logger = logging.getLogger('BotAutomation.Settlement')
+
+
+@dataclass
+class SettlementLeg:
+    """One balance mutation within a settlement"""
+    user_id: str
+    delta: int
+    result: Optional[Dict[str, Any]] = None
+    entry_id: Optional[str] = None
+    # The API call failed in a way that doesn't say whether the change was applied
+    unknown: bool = False
+
+    @property
+    def ok(self) -> bool:
+        return self.result is not None
+
+    @property
+    def balance(self):
+        return self.result.get('cash', 'unknown') if self.result else 'unknown'
+
+
+@dataclass
+class SettlementResult:
+    """Outcome of a multi-party settlement"""
+    guild_id: str
+    legs: List[SettlementLeg]
+    compensated: bool = False
+    retry_queued: bool = False
+    failed_legs: List[SettlementLeg] = field(default_factory=list)
+    unresolved_legs: List[SettlementLeg] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return not self.failed_legs and not self.unresolved_legs
+
+    def leg(self, user_id: str) -> Optional[SettlementLeg]:
+        for leg in self.legs:
+            if leg.user_id == user_id:
+                return leg
+        return None
+
+
+class SettlementEngine:
+    """
+    Applies the balance changes of an encounter concurrently
+
+    Transfers are all-or-nothing: if one leg fails, the legs that went through are
+    reversed. Independent legs (e.g. both sides of a gunfight paying a penalty) are
+    retried in the background instead, so a transient failure doesn't let anyone
+    off the hook. With a journal attached, every leg is recorded before it is sent
+    so that unconfirmed legs survive a restart and can be replayed.
+
+    Only legs known not to have been applied are reversed around or resent. A leg
+    whose outcome is unknown (OutcomeUnknownError, after the API client's own
+    balance check) is never resent or compensated for; it is journaled as
+    'unknown' and the settlement reports it in unresolved_legs.
+    """
+
+    def __init__(self, api, retry_attempts: int = 3, retry_delay: float = 5.0,
+                 journal: Optional[SettlementJournal] = None):
+        self.api = api
+        self.retry_attempts = retry_attempts
+        self.retry_delay = retry_delay
+        self.journal = journal
+        self._retry_tasks: Set[asyncio.Task] = set()
+
+    async def replay(self) -> int:
+        """
+        Settle journal entries left over from an earlier run
+
+        'failed' entries were never applied and are resent. 'pending' entries (the
+        process died before their result came back) and 'unknown' ones may have
+        been applied, so they are only resent once a fresh balance shows they were
+        not: it must equal the balance recorded before the entry, and the entry
+        must be the only unsettled one for its user. Entries that can't be
+        reconciled are left 'unknown' for an operator.
+
+        Returns:
+            int: Number of entries applied
+        """
+        if not self.journal:
+            return 0
+
+        entries = await self.journal.unsettled()
+        if not entries:
+            return 0
+
+        logger.info(f"Settling {len(entries)} unconfirmed settlement leg(s) from the journal")
+        open_per_user: Dict[Tuple[str, str], int] = {}
+        for entry in entries:
+            if entry['status'] != FAILED:
+                key = (entry['guild_id'], entry['user_id'])
+                open_per_user[key] = open_per_user.get(key, 0) + 1
+
+        checks = [entry for entry in entries if entry['status'] != FAILED]
+        outcomes = await asyncio.gather(
+            *(self._check_applied(entry, open_per_user[(entry['guild_id'], entry['user_id'])]) for entry in checks)
+        )
+        already_applied = [entry['entry_id'] for entry, outcome in zip(checks, outcomes) if outcome is True]
+        self.journal.mark_done(already_applied)
+        self.journal.mark_unknown([entry['entry_id'] for entry, outcome in zip(checks, outcomes) if outcome is None])
+
+        resend = [entry for entry in entries if entry['status'] == FAILED]
+        resend += [entry for entry, outcome in zip(checks, outcomes) if outcome is False]
+        results = await asyncio.gather(
+            *(self.api.update_balance(entry['guild_id'], entry['user_id'], entry['delta'], entry['entry_id'])
+              for entry in resend),
+            return_exceptions=True
+        )
+        applied = [entry['entry_id'] for entry, result in zip(resend, results)
+                   if result is not None and not isinstance(result, BaseException)]
+        self.journal.mark_done(applied)
+        self.journal.mark_failed([entry['entry_id'] for entry, result in zip(resend, results) if result is None])
+        self.journal.mark_unknown([entry['entry_id'] for entry, result in zip(resend, results)
+                                   if isinstance(result, BaseException)])
+
+        unresolved = len(entries) - len(already_applied) - len(applied)
+        if unresolved:
+            logger.warning(f"{unresolved} journal entries are still unsettled after replay; "
+                           f"'unknown' ones need an operator to check the balance")
+        return len(already_applied) + len(applied)
+
+    async def _check_applied(self, entry: Dict[str, Any], open_for_user: int) -> Optional[bool]:
+        """True if a journal entry was applied, False if it was not, None if that can't be told"""
+        before = entry['balance_before']
+        if before is None or open_for_user > 1:
+            return None
+        data = await self.api.get_balance(entry['guild_id'], entry['user_id'], max_age=0)
+        cash = data.get('cash') if data else None
+        if cash == before + entry['delta']:
+            return True
+        if cash == before:
+            return False
+        return None
+
+    async def settle(self, guild_id: str, legs: Sequence[Tuple[str, int]], atomic: bool = False) -> SettlementResult:
+        """
+        Apply several balance changes at once
+
+        Args:
+            guild_id (str): Discord guild ID
+            legs (Sequence[Tuple[str, int]]): (user_id, signed cash delta) pairs
+            atomic (bool): Reverse successful legs if any leg fails instead of retrying the failures
+
+        Returns:
+            SettlementResult: Per-leg results plus what was done about failures
+        """
+        settlement = SettlementResult(guild_id, [SettlementLeg(user_id, delta) for user_id, delta in legs])
+        if self.journal:
+            entry_ids = await self.journal.record(guild_id, legs, self._balances(guild_id, legs))
+            for leg, entry_id in zip(settlement.legs, entry_ids):
+                leg.entry_id = entry_id
+
+        results = await asyncio.gather(
+            *(self.api.update_balance(guild_id, leg.user_id, leg.delta, leg.entry_id) for leg in settlement.legs),
+            return_exceptions=True
+        )
+        for leg, result in zip(settlement.legs, results):
+            if isinstance(result, BaseException):
+                # Anything raised leaves the outcome open, not just OutcomeUnknownError
+                if not isinstance(result, OutcomeUnknownError):
+                    logger.error(f"Settlement leg for user {leg.user_id} raised: {str(result)}")
+                leg.unknown = True
+                result = None
+            leg.result = result
+
+        settlement.failed_legs = [leg for leg in settlement.legs if not leg.ok and not leg.unknown]
+        settlement.unresolved_legs = [leg for leg in settlement.legs if leg.unknown]
+        self._mark_done(settlement.legs)
+        if settlement.unresolved_legs:
+            self._mark_unresolved(guild_id, settlement.unresolved_legs)
+        if not settlement.failed_legs:
+            return settlement
+
+        if atomic:
+            self._mark_cancelled(settlement.failed_legs)
+            succeeded = [leg for leg in settlement.legs if leg.ok]
+            if settlement.unresolved_legs:
+                # Reversing is only safe once we know what went through
+                logger.error(f"Settlement in guild {guild_id} partially failed with unconfirmed leg(s); "
+                             f"not reversing {len(succeeded)} applied leg(s)")
+            elif succeeded:
+                logger.warning(f"Settlement in guild {guild_id} partially failed, reversing {len(succeeded)} leg(s)")
+                await self._compensate(guild_id, succeeded)
+                settlement.compensated = True
+        else:
+            for leg in settlement.failed_legs:
+                self._queue_retry(guild_id, leg.user_id, leg.delta, leg.entry_id)
+            settlement.retry_queued = True
+
+        return settlement
+
+    async def transfer(self, guild_id: str, from_user_id: str, to_user_id: str, amount: int) -> SettlementResult:
+        """
+        Move money from one user to another, reversing either side if the other fails
+
+        Args:
+            guild_id (str): Discord guild ID
+            from_user_id (str): User losing the money
+            to_user_id (str): User receiving the money
+            amount (int): Amount to move (positive integer)
+
+        Returns:
+            SettlementResult: Legs in (from, to) order
+        """
+        amount = abs(amount)
+        return await self.settle(guild_id, [(from_user_id, -amount), (to_user_id, amount)], atomic=True)
+
+    async def _compensate(self, guild_id: str, legs: List[SettlementLeg]):
+        reversal_legs = [(leg.user_id, -leg.delta) for leg in legs]
+        entry_ids = [None] * len(legs)
+        if self.journal:
+            entry_ids = await self.journal.record(guild_id, reversal_legs, self._balances(guild_id, reversal_legs))
+
+        reversals = await asyncio.gather(
+            *(self.api.update_balance(guild_id, user_id, delta, entry_id)
+              for (user_id, delta), entry_id in zip(reversal_legs, entry_ids)),
+            return_exceptions=True
+        )
+        for (user_id, delta), entry_id, result in zip(reversal_legs, entry_ids, reversals):
+            if isinstance(result, BaseException):
+                self._mark_unresolved(guild_id, [SettlementLeg(user_id, delta, entry_id=entry_id, unknown=True)])
+            elif result is None:
+                logger.error(f"Failed to apply reversal {delta:+} for user {user_id}, queuing retry")
+                self._queue_retry(guild_id, user_id, delta, entry_id)
+            elif self.journal:
+                self.journal.mark_done([entry_id])
+
+    def _mark_done(self, legs: List[SettlementLeg]):
+        if self.journal:
+            self.journal.mark_done([leg.entry_id for leg in legs if leg.ok and leg.entry_id])
+
+    def _mark_cancelled(self, legs: List[SettlementLeg]):
+        if self.journal:
+            self.journal.mark_cancelled([leg.entry_id for leg in legs if leg.entry_id])
+
+    def _mark_unresolved(self, guild_id: str, legs: List[SettlementLeg]):
+        for leg in legs:
+            logger.error(f"Outcome of {leg.delta:+} for user {leg.user_id} in guild {guild_id} is unknown; "
+                         f"not resending it (journal entry {leg.entry_id})")
+        if self.journal:
+            self.journal.mark_unknown([leg.entry_id for leg in legs if leg.entry_id])
+
+    def _balances(self, guild_id: str, legs: Sequence[Tuple[str, int]]) -> List[Optional[int]]:
+        # Recorded with each entry so a replay can tell whether it was applied
+        return [self.api.cached_cash(guild_id, user_id) for user_id, _ in legs]
+
+    def _queue_retry(self, guild_id: str, user_id: str, delta: int, entry_id: Optional[str] = None):
+        task = asyncio.create_task(self._retry(guild_id, user_id, delta, entry_id))
+        self._retry_tasks.add(task)
+        task.add_done_callback(self._retry_tasks.discard)
+
+    async def _retry(self, guild_id: str, user_id: str, delta: int, entry_id: Optional[str] = None):
+        for attempt in range(1, self.retry_attempts + 1):
+            await asyncio.sleep(self.retry_delay * attempt)
+            try:
+                result = await self.api.update_balance(guild_id, user_id, delta, entry_id)
+            except Exception as e:
+                if not isinstance(e, OutcomeUnknownError):
+                    logger.error(f"Retry {attempt} of {delta:+} for user {user_id} raised: {str(e)}")
+                # It may have gone through this time, so another attempt could apply it twice
+                self._mark_unresolved(guild_id, [SettlementLeg(user_id, delta, entry_id=entry_id, unknown=True)])
+                return
+            if result is not None:
+                logger.info(f"Retry {attempt} applied {delta:+} to user {user_id} in guild {guild_id}")
+                if self.journal and entry_id:
+                    self.journal.mark_done([entry_id])
+                return
+        # Every attempt was turned down, so the next startup can safely resend it
+        logger.error(f"Giving up on {delta:+} for user {user_id} in guild {guild_id} after {self.retry_attempts} retries")
+        if self.journal and entry_id:
+            self.journal.mark_failed([entry_id])
+
+    async def close(self):
+        """Cancel outstanding background retries and close the journal"""
+        for task in list(self._retry_tasks):
+            task.cancel()
+        if self._retry_tasks:
+            await asyncio.gather(*self._retry_tasks, return_exceptions=True)
+        if self.journal:
+            await self.journal.close()
@@ -0,0 +1,160 @@
+import asyncio
+import os
+import socket
+import unittest
+
+os.environ.setdefault('UNBELIEVABOAT_API_TOKEN', 'test-token')
+
+from api_client import UnbelievaBoatAPI
+from fake_unbelievaboat import FakeUnbelievaBoat
+from aiohttp import web
+
+from resilience import CircuitBreaker, OutcomeUnknownError, RetryPolicy
+from settlement import SettlementEngine
+
+
+class SlowPatchFake(FakeUnbelievaBoat):
+    """Applies PATCHes right away but holds the response back for patch_delay seconds, or swaps it for patch_status"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.patch_delay = 0.0
+        self.patch_status = 200
+        self.malformed = False
+
+    async def get_user(self, request):
+        if self.malformed:
+            return web.Response(text="<html>oops</html>", content_type='text/html')
+        return await super().get_user(request)
+
+    async def patch_user(self, request):
+        response = await super().patch_user(request)
+        await asyncio.sleep(self.patch_delay)
+        if self.patch_status != 200:
+            return web.json_response({'message': "Gateway error"}, status=self.patch_status)
+        return response
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class UnknownOutcomeTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.fake = SlowPatchFake()
+        base_url = await self.fake.start(port=free_port())
+        self.api = UnbelievaBoatAPI(base_url=base_url, request_timeout=0.2, coalesce=False,
+                                    retry_policy=RetryPolicy(base_delay=0))
+
+    async def asyncTearDown(self):
+        await self.api.close()
+        await self.fake.stop()
+
+    def cash(self, user_id):
+        return self.fake.balances[('g', user_id)]['cash']
+
+    async def test_timed_out_patch_that_landed_is_reconciled(self):
+        await self.api.get_balance('g', 'robber')
+        self.fake.patch_delay = 0.5
+
+        data = await self.api.update_balance('g', 'robber', 1000)
+
+        self.assertEqual(data['cash'], 101000)
+        self.assertEqual(self.cash('robber'), 101000)
+        self.assertEqual(self.fake.stats['applied'], 1)
+
+    async def test_server_error_before_applying_is_reconciled_as_not_applied(self):
+        await self.api.get_balance('g', 'robber')
+        original_gate = self.fake._gate
+
+        async def gate_patch_only(request):
+            self.fake.error_rate = 1.0 if request.method == 'PATCH' else 0.0
+            return await original_gate(request)
+
+        self.fake._gate = gate_patch_only
+        self.assertIsNone(await self.api.update_balance('g', 'robber', 1000))
+        self.assertEqual(self.cash('robber'), 100000)
+
+    async def test_gateway_timeout_is_reconciled_not_resent(self):
+        await self.api.get_balance('g', 'robber')
+        self.fake.patch_status = 504
+        data = await self.api.update_balance('g', 'robber', 1000)
+
+        self.assertEqual(data['cash'], 101000)
+        self.assertEqual(self.fake.stats['applied'], 1)
+
+    async def test_timed_out_patch_without_known_balance_is_unknown(self):
+        self.fake.patch_delay = 0.5
+
+        with self.assertRaises(OutcomeUnknownError):
+            await self.api.update_balance('g', 'robber', 1000)
+        self.assertEqual(self.fake.stats['applied'], 1)
+
+    async def test_timed_out_transfer_keeps_both_sides(self):
+        self.fake.patch_delay = 0.5
+        engine = SettlementEngine(self.api, retry_delay=0)
+
+        result = await engine.transfer('g', 'target', 'robber', 1000)
+        await asyncio.sleep(0.6)
+        await engine.close()
+
+        self.assertFalse(result.compensated)
+        self.assertEqual(self.cash('target'), 99000)
+        self.assertEqual(self.cash('robber'), 101000)
+
+    async def test_timed_out_penalty_is_charged_once(self):
+        self.fake.patch_delay = 0.5
+        engine = SettlementEngine(self.api, retry_delay=0)
+
+        await engine.settle('g', [('target', -500)])
+        await asyncio.sleep(0.6)
+        await engine.close()
+
+        self.assertEqual(self.cash('target'), 99500)
+
+
+class CircuitProbeTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.fake = SlowPatchFake()
+        base_url = await self.fake.start(port=free_port())
+        self.circuit = CircuitBreaker(min_calls=1, reset_timeout=0)
+        self.api = UnbelievaBoatAPI(base_url=base_url, request_timeout=0.2, coalesce=False,
+                                    retry_policy=RetryPolicy(max_attempts=1), circuit_breaker=self.circuit)
+        self.circuit.record_failure()
+
+    async def asyncTearDown(self):
+        await self.api.close()
+        await self.fake.stop()
+
+    async def test_probe_with_malformed_body_reopens_circuit(self):
+        self.fake.malformed = True
+        self.assertIsNone(await self.api.get_balance('g', 'robber'))
+        self.assertEqual(self.circuit.state, CircuitBreaker.HALF_OPEN)
+        self.assertTrue(self.circuit.allow())
+
+    async def test_cancelled_probe_lets_the_next_one_through(self):
+        self.fake.latency = 0.5
+        probe = asyncio.ensure_future(self.api.get_balance('g', 'robber'))
+        await asyncio.sleep(0.05)
+        probe.cancel()
+        await asyncio.gather(probe, return_exceptions=True)
+
+        self.assertEqual(self.circuit.state, CircuitBreaker.HALF_OPEN)
+        self.assertTrue(self.circuit.allow())
+
+    async def test_request_refused_by_open_circuit_does_not_hold_up_the_route(self):
+        self.circuit = CircuitBreaker(min_calls=1, reset_timeout=0.2)
+        self.api.circuit = self.circuit
+        self.circuit.record_failure()
+
+        self.assertIsNone(await self.api.get_balance('g', 'robber'))
+        await asyncio.sleep(0.25)
+
+        data = await asyncio.wait_for(self.api.get_balance('g', 'robber'), 1.0)
+        self.assertEqual(data['cash'], 100000)
+
+
+if __name__ == '__main__':
+    unittest.main()
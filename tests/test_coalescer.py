@@ -0,0 +1,57 @@
+import asyncio
+import unittest
+
+from coalescer import BalanceCoalescer
+
+
+class RecordingSend:
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.calls = []
+        self.cash = 0
+
+    async def __call__(self, guild_id, user_id, delta):
+        self.calls.append((user_id, delta, asyncio.get_running_loop().time()))
+        await asyncio.sleep(self.delay)
+        self.cash += delta
+        return {'cash': self.cash}
+
+
+class CoalescerTests(unittest.IsolatedAsyncioTestCase):
+    async def test_first_delta_is_sent_immediately(self):
+        send = RecordingSend()
+        coalescer = BalanceCoalescer(send)
+        started = asyncio.get_running_loop().time()
+
+        await coalescer.submit("1", "2", 100)
+
+        self.assertLess(send.calls[0][2] - started, 0.01)
+
+    async def test_deltas_queued_behind_an_in_flight_request_are_merged(self):
+        send = RecordingSend()
+        coalescer = BalanceCoalescer(send)
+
+        first = asyncio.create_task(coalescer.submit("1", "2", 100))
+        await asyncio.sleep(0)
+        results = await asyncio.gather(first, coalescer.submit("1", "2", -30), coalescer.submit("1", "2", -20))
+
+        self.assertEqual([delta for _, delta, _ in send.calls], [100, -50])
+        self.assertEqual(results, [{'cash': 100}, {'cash': 50}, {'cash': 50}])
+        self.assertFalse(coalescer._running)
+
+    async def test_drain_waits_for_queued_deltas(self):
+        send = RecordingSend()
+        coalescer = BalanceCoalescer(send)
+
+        first = asyncio.create_task(coalescer.submit("1", "2", 100))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(coalescer.submit("1", "2", 5))
+        await asyncio.sleep(0)
+        await coalescer.drain()
+
+        self.assertTrue(first.done() and second.done())
+        self.assertEqual(send.cash, 105)
+
+
+if __name__ == '__main__':
+    unittest.main()
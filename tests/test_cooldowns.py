@@ -0,0 +1,39 @@
+import unittest
+
+from cooldowns import CommandCooldowns
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class RefundTests(unittest.TestCase):
+    def test_refunded_uses_do_not_count(self):
+        clock = Clock()
+        cooldowns = CommandCooldowns(3, 60.0, guild_limit=3, guild_window=60.0, clock=clock)
+
+        for _ in range(5):
+            self.assertEqual(cooldowns.check("woozie", 1, 2), 0.0)
+            cooldowns.refund("woozie", 1, 2)
+        for _ in range(3):
+            self.assertEqual(cooldowns.check("woozie", 1, 2), 0.0)
+        self.assertGreater(cooldowns.check("woozie", 1, 2), 0.0)
+        self.assertGreater(cooldowns.check("plock", 1, 3), 0.0)
+
+    def test_refund_after_the_window_rolls_over(self):
+        clock = Clock()
+        cooldowns = CommandCooldowns(1, 60.0, clock=clock)
+        clock.now = 1019.0
+        self.assertEqual(cooldowns.check("woozie", 1, 2), 0.0)
+        clock.now = 1021.0
+        cooldowns.refund("woozie", 1, 2)
+
+        self.assertEqual(cooldowns.check("woozie", 1, 2), 0.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
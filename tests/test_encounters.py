@@ -0,0 +1,99 @@
+import asyncio
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+import encounters
+from encounters import TRANSFER, Encounter, EncounterEngine
+from settlement import SettlementLeg, SettlementResult
+
+STANDOFF = Encounter(
+    name="standoff",
+    log="Standoff between {robber_id} and {target_id}",
+    intros=("{robber} draws on {target}",),
+    narratives=(("Shots fired!", "Someone runs"),),
+    payout=TRANSFER,
+    amounts={"amount": (100, 100)},
+    success="Took ${amount}",
+)
+
+
+class SlowSettlement:
+    def __init__(self):
+        self.finished = asyncio.Event()
+
+    async def transfer(self, guild_id, from_user_id, to_user_id, amount):
+        await asyncio.sleep(0.05)
+        self.finished.set()
+        legs = [SettlementLeg(from_user_id, -amount, {'cash': 0}), SettlementLeg(to_user_id, amount, {'cash': 0})]
+        return SettlementResult(guild_id, legs)
+
+
+class Channel:
+    def __init__(self, fail_lines=0):
+        self.sent = []
+        self.fail_lines = fail_lines
+
+    def is_done(self):
+        return bool(self.sent)
+
+    async def send_message(self, text):
+        self.sent.append(text)
+
+    async def send(self, text):
+        if self.fail_lines:
+            self.fail_lines -= 1
+            raise RuntimeError("404 Unknown interaction")
+        self.sent.append(text)
+
+
+def interaction(channel):
+    user = SimpleNamespace(id=1, display_name="robber", mention="@robber")
+    return SimpleNamespace(guild_id=7, user=user, response=channel, followup=channel)
+
+
+class PlayTests(unittest.IsolatedAsyncioTestCase):
+    async def test_failed_narrative_still_settles_and_posts_aftermath(self):
+        settlement = SlowSettlement()
+        engine = EncounterEngine(settlement)
+        channel = Channel(fail_lines=1)
+        target = SimpleNamespace(id=2, display_name="target", mention="@target")
+
+        with mock.patch.object(encounters, 'NARRATIVE_DELAY', 0):
+            await engine.play(STANDOFF, interaction(channel), target)
+
+        self.assertTrue(settlement.finished.is_set())
+        self.assertEqual(channel.sent[-1], "Took $100")
+        self.assertFalse(engine._background)
+
+    async def test_settled_returns_before_the_narrative_ends(self):
+        settlement = SlowSettlement()
+        engine = EncounterEngine(settlement)
+        channel = Channel()
+        target = SimpleNamespace(id=2, display_name="target", mention="@target")
+
+        with mock.patch.object(encounters, 'NARRATIVE_DELAY', 0.2):
+            run = await engine.start(STANDOFF, interaction(channel), target)
+            await run.settled()
+            self.assertTrue(run.settlement.done())
+            self.assertFalse(run.narrative.done())
+            await run.finish()
+
+        self.assertEqual(channel.sent[-1], "Took $100")
+
+    async def test_close_waits_for_settlements_in_flight(self):
+        settlement = SlowSettlement()
+        engine = EncounterEngine(settlement)
+        target = SimpleNamespace(id=2, display_name="target", mention="@target")
+
+        with mock.patch.object(encounters, 'NARRATIVE_DELAY', 0):
+            run = await engine.start(STANDOFF, interaction(Channel()), target)
+            run.narrative.cancel()
+            await engine.close()
+
+        self.assertTrue(settlement.finished.is_set())
+        self.assertFalse(engine._background)
+
+
+if __name__ == '__main__':
+    unittest.main()
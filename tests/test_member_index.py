@@ -0,0 +1,47 @@
+import unittest
+from types import SimpleNamespace
+
+from member_index import GuildWeaponIndex, Weapon
+from role_cache import RoleCache
+
+
+class FakeGuild:
+    def __init__(self, roles, members=()):
+        self.id = 1
+        self.roles = roles
+        self.members = list(members)
+        self.chunked = True
+
+    def get_role(self, role_id):
+        return next((role for role in self.roles if role.id == role_id), None)
+
+
+def member(member_id, guild, *roles):
+    return SimpleNamespace(id=member_id, guild=guild, roles=list(roles))
+
+
+class WeaponIndexTests(unittest.TestCase):
+    def setUp(self):
+        self.woozie = SimpleNamespace(id=10, name="Woozie")
+        self.guild = FakeGuild([self.woozie])
+        self.index = GuildWeaponIndex(RoleCache())
+
+    def test_refresh_drops_a_role_removed_without_an_event(self):
+        self.guild.members = [member(5, self.guild, self.woozie)]
+        self.assertEqual(self.index.flags(self.guild.members[0]), Weapon.WOOZIE)
+
+        fresh = member(5, self.guild)
+        self.assertEqual(self.index.refresh(fresh), Weapon.NONE)
+        self.assertEqual(self.index.flags(fresh), Weapon.NONE)
+        self.assertEqual(self.index.armed_count(self.guild), 0)
+
+    def test_refresh_picks_up_a_role_added_without_an_event(self):
+        self.guild.members = [member(5, self.guild)]
+        self.assertEqual(self.index.armed_count(self.guild), 0)
+
+        self.assertEqual(self.index.refresh(member(5, self.guild, self.woozie)), Weapon.WOOZIE)
+        self.assertEqual(self.index.armed_count(self.guild, Weapon.WOOZIE), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
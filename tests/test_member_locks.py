@@ -0,0 +1,44 @@
+import asyncio
+import time
+import unittest
+
+from member_locks import LockTimeout, MemberLocks
+
+
+class HoldTests(unittest.IsolatedAsyncioTestCase):
+    async def test_newcomer_right_after_a_release_still_times_out(self):
+        locks = MemberLocks(timeout=0.2)
+
+        async def next_in_line():
+            async with locks.hold(1, 2):
+                await asyncio.sleep(1.0)
+
+        first = locks.hold(1, 2)
+        await first.__aenter__()
+        waiter = asyncio.create_task(next_in_line())
+        await asyncio.sleep(0.01)
+        await first.__aexit__(None, None, None)
+
+        # The woken waiter owns the next turn even though the lock reads as free
+        self.assertTrue(locks.locked(1, 2))
+        started = time.monotonic()
+        with self.assertRaises(LockTimeout):
+            async with locks.hold(1, 2):
+                pass
+        self.assertLess(time.monotonic() - started, 0.5)
+
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+
+    async def test_members_are_locked_together(self):
+        locks = MemberLocks(timeout=0.05)
+        async with locks.hold(1, 2, 3):
+            self.assertTrue(locks.locked(1, 3))
+            with self.assertRaises(LockTimeout):
+                async with locks.hold(1, 3, 4):
+                    pass
+        self.assertFalse(locks.locked(1, 4))
+
+
+if __name__ == '__main__':
+    unittest.main()
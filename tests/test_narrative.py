@@ -0,0 +1,58 @@
+import unittest
+from types import SimpleNamespace
+
+from narrative import EditRenderer, FollowupRenderer
+
+
+class Response:
+    def __init__(self, calls, done):
+        self.calls = calls
+        self.done = done
+
+    def is_done(self):
+        return self.done
+
+    async def send_message(self, text):
+        self.calls.append(('response', text))
+        self.done = True
+
+
+class Followup:
+    def __init__(self, calls):
+        self.calls = calls
+
+    async def send(self, text):
+        self.calls.append(('followup', text))
+
+
+def interaction(deferred):
+    calls = []
+
+    async def edit_original_response(content):
+        calls.append(('edit', content))
+
+    return calls, SimpleNamespace(response=Response(calls, deferred), followup=Followup(calls),
+                                  edit_original_response=edit_original_response)
+
+
+class IntroTests(unittest.IsolatedAsyncioTestCase):
+    async def test_intro_is_the_initial_response(self):
+        for renderer in (FollowupRenderer, EditRenderer):
+            calls, inter = interaction(deferred=False)
+            await renderer(inter).intro("hands up")
+            self.assertEqual(calls, [('response', "hands up")])
+
+    async def test_intro_after_a_defer_replaces_the_thinking_message(self):
+        calls, inter = interaction(deferred=True)
+        await FollowupRenderer(inter).intro("hands up")
+        self.assertEqual(calls, [('followup', "hands up")])
+
+        calls, inter = interaction(deferred=True)
+        renderer = EditRenderer(inter, lines_per_edit=1)
+        await renderer.intro("hands up")
+        await renderer.line("bang")
+        self.assertEqual(calls, [('edit', "hands up"), ('edit', "hands up\nbang")])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import asyncio
+import time
+import unittest
+
+from rate_limiter import RateLimitExceeded, RateLimitScheduler
+
+ROUTE = "GET /guilds/g/users"
+
+
+def headers(limit, remaining, reset_after):
+    return {
+        'X-RateLimit-Limit': str(limit),
+        'X-RateLimit-Remaining': str(remaining),
+        'X-RateLimit-Reset': str((time.time() + reset_after) * 1000),
+    }
+
+
+class SchedulerTests(unittest.IsolatedAsyncioTestCase):
+    async def test_only_the_first_request_goes_until_a_response_arrives(self):
+        scheduler = RateLimitScheduler()
+        await scheduler.acquire(ROUTE)
+
+        second = asyncio.create_task(scheduler.acquire(ROUTE))
+        await asyncio.sleep(0.05)
+        self.assertFalse(second.done())
+
+        scheduler.update(ROUTE, headers(5, 4, 1))
+        await asyncio.wait_for(second, 0.1)
+
+    async def test_released_first_request_unblocks_the_route(self):
+        scheduler = RateLimitScheduler()
+        await scheduler.acquire(ROUTE)
+        scheduler.release(ROUTE)
+
+        await asyncio.wait_for(scheduler.acquire(ROUTE), 0.1)
+
+    async def test_unreleased_first_request_holds_the_route_until_the_deadline(self):
+        scheduler = RateLimitScheduler()
+        await scheduler.acquire(ROUTE)
+
+        with self.assertRaises(RateLimitExceeded):
+            await scheduler.acquire(ROUTE, time.monotonic() + 0.05)
+
+    async def test_waits_for_reset_once_the_window_is_used_up(self):
+        scheduler = RateLimitScheduler()
+        await scheduler.acquire(ROUTE)
+        scheduler.update(ROUTE, headers(2, 1, 0.2))
+        await scheduler.acquire(ROUTE)
+
+        started = time.monotonic()
+        await scheduler.acquire(ROUTE)
+        self.assertGreater(time.monotonic() - started, 0.1)
+
+    async def test_release_gives_the_slot_back(self):
+        scheduler = RateLimitScheduler()
+        await scheduler.acquire(ROUTE)
+        scheduler.update(ROUTE, headers(2, 1, 10))
+        await scheduler.acquire(ROUTE)
+        scheduler.release(ROUTE)
+
+        await asyncio.wait_for(scheduler.acquire(ROUTE), 0.1)
+        with self.assertRaises(RateLimitExceeded):
+            await scheduler.acquire(ROUTE, time.monotonic() + 0.05)
+
+
+if __name__ == '__main__':
+    unittest.main()
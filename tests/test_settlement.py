@@ -0,0 +1,177 @@
+import asyncio
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from journal import SettlementJournal
+from resilience import OutcomeUnknownError
+from settlement import SettlementEngine
+
+
+class ScriptedAPI:
+    """Stands in for UnbelievaBoatAPI; each user's calls play back a list of outcomes"""
+
+    def __init__(self, **outcomes):
+        self.outcomes = {user_id: list(script) for user_id, script in outcomes.items()}
+        self.calls = []
+        self.cash = {}
+
+    def cached_cash(self, guild_id, user_id):
+        return self.cash.get(user_id)
+
+    async def get_balance(self, guild_id, user_id, max_age=None):
+        return {'user_id': user_id, 'cash': self.cash[user_id]} if user_id in self.cash else None
+
+    async def update_balance(self, guild_id, user_id, delta, idempotency_key=None):
+        self.calls.append((user_id, delta))
+        script = self.outcomes.get(user_id)
+        outcome = script.pop(0) if script else "ok"
+        if outcome == "unknown":
+            raise OutcomeUnknownError("timed out")
+        if outcome == "fail":
+            return None
+        return {'user_id': user_id, 'cash': 1000 + delta}
+
+
+class SettlementTests(unittest.IsolatedAsyncioTestCase):
+    def engine(self, api):
+        return SettlementEngine(api, retry_attempts=3, retry_delay=0)
+
+    async def drain(self, engine):
+        while engine._retry_tasks:
+            await asyncio.gather(*engine._retry_tasks)
+
+    async def test_transfer_reverses_applied_leg_when_other_fails(self):
+        api = ScriptedAPI(robber=["fail"])
+        result = await self.engine(api).transfer('g', 'target', 'robber', 100)
+
+        self.assertFalse(result.ok)
+        self.assertTrue(result.compensated)
+        self.assertEqual(api.calls, [('target', -100), ('robber', 100), ('target', 100)])
+
+    async def test_transfer_does_not_reverse_around_unknown_leg(self):
+        api = ScriptedAPI(robber=["unknown"])
+        result = await self.engine(api).transfer('g', 'target', 'robber', 100)
+
+        self.assertFalse(result.ok)
+        self.assertFalse(result.compensated)
+        self.assertEqual([leg.user_id for leg in result.unresolved_legs], ['robber'])
+        self.assertEqual(api.calls, [('target', -100), ('robber', 100)])
+
+    async def test_failed_reversal_is_retried(self):
+        api = ScriptedAPI(target=["ok", "fail"], robber=["fail"])
+        engine = self.engine(api)
+        await engine.transfer('g', 'target', 'robber', 100)
+        await self.drain(engine)
+
+        self.assertEqual(api.calls[2:], [('target', 100), ('target', 100)])
+
+    async def test_unknown_reversal_is_not_retried(self):
+        api = ScriptedAPI(target=["ok", "unknown"], robber=["fail"])
+        engine = self.engine(api)
+        await engine.transfer('g', 'target', 'robber', 100)
+        await self.drain(engine)
+
+        self.assertEqual(api.calls[2:], [('target', 100)])
+
+    async def test_failed_penalty_is_retried_until_applied(self):
+        api = ScriptedAPI(target=["fail", "fail", "ok"])
+        engine = self.engine(api)
+        result = await engine.settle('g', [('target', -500)])
+        await self.drain(engine)
+
+        self.assertTrue(result.retry_queued)
+        self.assertEqual(api.calls, [('target', -500)] * 3)
+
+    async def test_unknown_penalty_is_charged_once(self):
+        api = ScriptedAPI(target=["unknown"])
+        engine = self.engine(api)
+        result = await engine.settle('g', [('target', -500)])
+        await self.drain(engine)
+
+        self.assertFalse(result.retry_queued)
+        self.assertEqual(len(result.unresolved_legs), 1)
+        self.assertEqual(api.calls, [('target', -500)])
+
+    async def test_retry_stops_when_outcome_becomes_unknown(self):
+        api = ScriptedAPI(target=["fail", "unknown"])
+        engine = self.engine(api)
+        await engine.settle('g', [('target', -500)])
+        await self.drain(engine)
+
+        self.assertEqual(api.calls, [('target', -500)] * 2)
+
+
+class ReplayTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        directory = tempfile.mkdtemp()
+        self.path = os.path.join(directory, 'journal.db')
+        self.journal = SettlementJournal(self.path, batch_interval=0)
+        await self.journal.open()
+
+    async def asyncTearDown(self):
+        await self.journal.close()
+
+    async def statuses(self):
+        # Status changes are committed in batches
+        await asyncio.sleep(0.05)
+        with sqlite3.connect(self.path) as conn:
+            return dict(conn.execute("SELECT user_id, status FROM settlement_journal"))
+
+    async def restart(self, api):
+        await self.journal.close()
+        self.journal = SettlementJournal(self.path, batch_interval=0)
+        await self.journal.open()
+        return await SettlementEngine(api, journal=self.journal).replay()
+
+    async def test_given_up_leg_is_resent_on_startup(self):
+        engine = SettlementEngine(ScriptedAPI(target=["fail"] * 3), retry_attempts=2, retry_delay=0,
+                                  journal=self.journal)
+        await engine.settle('g', [('target', -500)])
+        while engine._retry_tasks:
+            await asyncio.gather(*engine._retry_tasks)
+        self.assertEqual(await self.statuses(), {'target': 'failed'})
+
+        api = ScriptedAPI()
+        self.assertEqual(await self.restart(api), 1)
+        self.assertEqual(api.calls, [('target', -500)])
+        self.assertEqual(await self.statuses(), {'target': 'done'})
+
+    async def unknown_leg(self, cash_before):
+        api = ScriptedAPI(target=["unknown"])
+        if cash_before is not None:
+            api.cash['target'] = cash_before
+        await SettlementEngine(api, journal=self.journal).settle('g', [('target', -500)])
+        self.assertEqual(await self.statuses(), {'target': 'unknown'})
+
+    async def test_unknown_leg_that_landed_is_not_resent(self):
+        await self.unknown_leg(1000)
+        api = ScriptedAPI()
+        api.cash['target'] = 500
+
+        self.assertEqual(await self.restart(api), 1)
+        self.assertEqual(api.calls, [])
+        self.assertEqual(await self.statuses(), {'target': 'done'})
+
+    async def test_unknown_leg_that_did_not_land_is_resent(self):
+        await self.unknown_leg(1000)
+        api = ScriptedAPI()
+        api.cash['target'] = 1000
+
+        self.assertEqual(await self.restart(api), 1)
+        self.assertEqual(api.calls, [('target', -500)])
+        self.assertEqual(await self.statuses(), {'target': 'done'})
+
+    async def test_unknown_leg_without_earlier_balance_waits_for_operator(self):
+        await self.unknown_leg(None)
+        api = ScriptedAPI()
+        api.cash['target'] = 1000
+
+        self.assertEqual(await self.restart(api), 0)
+        self.assertEqual(api.calls, [])
+        self.assertEqual(await self.statuses(), {'target': 'unknown'})
+
+
+if __name__ == '__main__':
+    unittest.main()
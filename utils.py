@@ -1,22 +1,74 @@
+import atexit
 import logging
 import asyncio
+import os
 import random
-from datetime import datetime
+import resource
+import sys
 import discord
 from discord import app_commands
+from dotenv import load_dotenv
+from log_pipeline import JsonFormatter, RotatingLogFileHandler, start_pipeline
+
+_listener = None
 
 def setup_logging():
-    """Setup logging configuration"""
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.StreamHandler(),
-            logging.FileHandler(f'bot_automation_{datetime.now().strftime("%Y%m%d")}.log')
-        ]
-    )
+    """
+    Setup logging configuration
+
+    Records go through an in-process queue to a listener thread that writes the
+    console and a rotating log file, so a slow disk never stalls the event loop.
+    Settings come from the LOG_* environment variables (see .env.example).
+    """
+    global _listener
+    if _listener is not None:
+        return logging.getLogger('BotAutomation')
+    load_dotenv()
+
+    level = logging.getLevelName(os.getenv('LOG_LEVEL', 'INFO').upper())
+    if not isinstance(level, int):
+        level = logging.INFO
+    if os.getenv('LOG_FORMAT', 'text').lower() == 'json':
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    handlers = [logging.StreamHandler()]
+    log_file = os.getenv('LOG_FILE', 'bot_automation.log')
+    if log_file:
+        handlers.append(RotatingLogFileHandler(
+            log_file,
+            when=os.getenv('LOG_ROTATE_WHEN', 'midnight'),
+            max_bytes=int(os.getenv('LOG_MAX_BYTES', str(10 * 1024 * 1024))),
+            backup_count=int(os.getenv('LOG_BACKUP_COUNT', '7')),
+            compress=os.getenv('LOG_COMPRESS', 'false').lower() == 'true'
+        ))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    _listener = start_pipeline(handlers, level)
+    # Flush whatever is still queued on exit
+    atexit.register(_listener.stop)
     return logging.getLogger('BotAutomation')
 
+def memory_usage():
+    """
+    Resident set size of this process
+
+    Returns:
+        tuple: (current RSS in bytes or None where /proc is unavailable, peak RSS in bytes)
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    if sys.platform != 'darwin':
+        peak *= 1024
+    try:
+        with open('/proc/self/statm') as f:
+            rss = int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        rss = None
+    return rss, peak
+
 class CommandExecutor:
     def __init__(self, bot):
         self.bot = bot